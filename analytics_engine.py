@@ -0,0 +1,254 @@
+"""
+Columnar analytics for Expense Tracker
+Loads a user's daily rollup rows and raw amounts into NumPy arrays and
+computes distributions, percentiles and rolling spend in batch
+
+NumPy is optional: without it available() is False and the app serves only
+the rollup-based analytics.
+"""
+
+import sys
+
+from database_sqlite import get_db_connection
+from money import MINOR_UNITS, average_minor, to_major
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only where NumPy is missing
+    np = None
+
+PERCENTILES = (10, 25, 50, 75, 90, 95, 99)
+ROLLING_WINDOWS = (30, 90)
+ROLLING_DAYS = 180  # rolling_spend covers the days up to the latest expense
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+
+def available():
+    return np is not None
+
+
+class Columns:
+    """One user's spending per (day, category) as parallel arrays, plus every amount
+
+    days are day numbers since 1970-01-01, codes index into categories, totals
+    and counts sum the expenses of each day and category. amounts holds each
+    expense's integer minor units, in no particular order, for the percentiles.
+    """
+
+    def __init__(self, days, codes, totals, counts, amounts, categories):
+        self.days = days
+        self.codes = codes
+        self.totals = totals
+        self.counts = counts
+        self.amounts = amounts
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.amounts)
+
+    @classmethod
+    def from_daily(cls, daily, amounts):
+        """Build columns from (date, category, total, count) rollup rows and an amounts array"""
+        count = len(daily)
+        index = {}
+        days = np.array([row[0] for row in daily], dtype='datetime64[D]').astype(np.int64)
+        codes = np.fromiter((index.setdefault(row[1], len(index)) for row in daily), dtype=np.int64, count=count)
+        totals = np.fromiter((row[2] for row in daily), dtype=np.int64, count=count)
+        counts = np.fromiter((row[3] for row in daily), dtype=np.int64, count=count)
+        return cls(days, codes, totals, counts, np.asarray(amounts, dtype=np.int64), list(index))
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build columns from (date, category, amount_minor) expense tuples"""
+        daily = {}
+        for date, category, amount_minor in rows:
+            entry = daily.setdefault((date, category), [0, 0])
+            entry[0] += amount_minor
+            entry[1] += 1
+        return cls.from_daily([(*key, total, count) for key, (total, count) in daily.items()],
+                              [row[2] for row in rows])
+
+
+def load_columns(user_id):
+    """Fetch a user's daily rollup and amounts from one snapshot of the database
+
+    The rollup has at most one row per day and category. The amounts come back
+    as a single group_concat string, which NumPy parses in C: fetching one row
+    per expense costs several times more than everything else put together.
+    """
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    # Plain tuples: building sqlite3.Row objects would double the cost of the fetch
+    cursor.row_factory = None
+    try:
+        # Both reads must see the same writes, or counts and amounts could disagree
+        cursor.execute('BEGIN')
+        cursor.execute('SELECT date, category, total, count FROM expense_daily_rollup WHERE user_id = ?',
+                       (user_id,))
+        daily = cursor.fetchall()
+        cursor.execute('SELECT group_concat(amount_minor) FROM expenses WHERE user_id = ?', (user_id,))
+        amounts = cursor.fetchone()[0]
+        connection.commit()
+    finally:
+        cursor.close()
+        connection.close()
+    amounts = np.fromstring(amounts, dtype=np.int64, sep=',') if amounts else np.zeros(0, dtype=np.int64)
+    return Columns.from_daily(daily, amounts)
+
+
+def _sums(values):
+    """Exact integer sums out of bincount's float64 output"""
+    return np.rint(values).astype(np.int64)
+
+
+def _whole(values):
+    """Round fractional paise (from interpolated percentiles) half up"""
+    return np.floor(np.asarray(values) + 0.5).astype(np.int64)
+
+
+def _major(values):
+    """Paise to JSON-ready rupees, exact to the paisa like money.to_major"""
+    return (np.asarray(values) / MINOR_UNITS).tolist()
+
+
+def _month_label(month_number):
+    return f'{1970 + month_number // 12:04d}-{month_number % 12 + 1:02d}'
+
+
+def compute(columns):
+    """All statistics for a user's columns, as a JSON-ready dict
+
+    Includes the keys of money.analytics_json(Expense.get_analytics(...)), so
+    it can stand in for it.
+    """
+    if not len(columns):
+        return {
+            'total_spending': 0,
+            'expense_count': 0,
+            'category_totals': {},
+            'monthly_totals': {},
+            'average_expense': 0,
+            'median_expense': 0,
+            'percentiles': {},
+            'weekday_totals': {},
+            'day_of_month_totals': {},
+            'rolling_spend': {},
+            'month_over_month': {},
+            'category_month_matrix': {'categories': [], 'months': [], 'totals': []},
+        }
+
+    days, codes, amounts = columns.days, columns.codes, columns.amounts
+    count = len(amounts)
+    total = int(columns.totals.sum())
+    first_day = int(days.min())
+    day_offsets = days - first_day
+    span = int(day_offsets.max()) + 1
+    category_count = len(columns.categories)
+
+    # The percentiles are the only pass over every expense: everything else is
+    # derived from per-day sums, which are at most a few thousand columns wide.
+    # bincount adds in float64, which is exact for integer paise below 2**53.
+    by_category_day = _sums(np.bincount(codes * span + day_offsets, weights=columns.totals,
+                                        minlength=category_count * span)).reshape(category_count, span)
+    day_counts = _sums(np.bincount(day_offsets, weights=columns.counts, minlength=span))
+    percentile_values = _whole(np.percentile(amounts, PERCENTILES))
+    daily = by_category_day.sum(axis=0)
+    category_totals = by_category_day.sum(axis=1)
+
+    # Calendar fields of each day in the span; 1970-01-01 was a Thursday
+    dates = np.arange(first_day, first_day + span).astype('datetime64[D]')
+    month_starts = dates.astype('datetime64[M]')
+    month_numbers = month_starts.astype(np.int64)
+    weekdays = (np.arange(first_day, first_day + span) + 3) % 7
+    days_of_month = (dates - month_starts.astype('datetime64[D]')).astype(np.int64)
+
+    # Months are contiguous runs of days, so they are summed with reduceat
+    boundaries = np.flatnonzero(np.diff(month_numbers, prepend=month_numbers[0] - 1))
+    matrix = np.add.reduceat(by_category_day, boundaries, axis=1)
+    monthly = matrix.sum(axis=0)
+    monthly_counts = np.add.reduceat(day_counts, boundaries)
+    months = [_month_label(int(number)) for number in month_numbers[boundaries]]
+
+    weekday_sums = _sums(np.bincount(weekdays, weights=daily, minlength=7))
+    weekday_counts = _sums(np.bincount(weekdays, weights=day_counts, minlength=7))
+    day_sums = _sums(np.bincount(days_of_month, weights=daily, minlength=31))
+    day_of_month_counts = _sums(np.bincount(days_of_month, weights=day_counts, minlength=31))
+    # Same rounding as money.average_minor
+    weekday_averages = (2 * weekday_sums + weekday_counts) // np.maximum(2 * weekday_counts, 1)
+
+    # Trailing-window spend for each of the last ROLLING_DAYS days up to the latest expense
+    cumulative = np.concatenate(([0], np.cumsum(daily)))
+    ends = np.arange(max(1, span - ROLLING_DAYS + 1), span + 1)
+    rolling = {f'{window}_days': _major(cumulative[ends] - cumulative[np.maximum(ends - window, 0)])
+               for window in ROLLING_WINDOWS}
+
+    changes = np.diff(monthly)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change_percent = np.where(monthly[:-1] > 0, changes / monthly[:-1] * 100, np.nan)
+    order = np.argsort(-category_totals, kind='stable')
+
+    return {
+        'total_spending': to_major(total),
+        'expense_count': count,
+        'category_totals': dict(zip(columns.categories, _major(category_totals))),
+        'monthly_totals': {month: value for month, value, month_total in
+                           zip(months, _major(monthly), monthly_counts) if month_total},
+        'average_expense': to_major(average_minor(total, count)),
+        'median_expense': to_major(int(percentile_values[PERCENTILES.index(50)])),
+        'percentiles': {f'p{p}': value for p, value in zip(PERCENTILES, _major(percentile_values))},
+        'weekday_totals': {
+            name: {'total': total_, 'count': int(count_), 'average': average}
+            for name, total_, count_, average in
+            zip(WEEKDAYS, _major(weekday_sums), weekday_counts, _major(weekday_averages))
+        },
+        'day_of_month_totals': {
+            str(day): {'total': total_, 'count': int(count_)}
+            for day, total_, count_ in zip(range(1, 32), _major(day_sums), day_of_month_counts)
+        },
+        'rolling_spend': {
+            'start': str(dates[ends[0] - 1]),
+            'end': str(dates[-1]),
+            **rolling,
+        },
+        'month_over_month': {
+            month: {
+                'total': month_total,
+                'change': None if index == 0 else change,
+                'change_percent': None if index == 0 or np.isnan(percent) else round(float(percent), 2),
+            }
+            for index, (month, month_total, change, percent) in
+            enumerate(zip(months, _major(monthly), [None] + _major(changes), [np.nan, *change_percent]))
+        },
+        'category_month_matrix': {
+            'categories': [columns.categories[code] for code in order],
+            'months': months,
+            'totals': _major(matrix[order]),
+        },
+    }
+
+
+def get_detailed_analytics(user_id):
+    return compute(load_columns(user_id))
+
+
+def main(argv=None):
+    """Time loading and computing a user's analytics: python analytics_engine.py USER_ID"""
+    import time
+
+    argv = sys.argv[1:] if argv is None else argv
+    if not available():
+        print("❌ NumPy is not installed (pip install numpy)")
+        return 1
+    user_id = int(argv[0]) if argv else 1
+    started = time.perf_counter()
+    columns = load_columns(user_id)
+    loaded = time.perf_counter()
+    result = compute(columns)
+    computed = time.perf_counter()
+    print(f"✅ {result['expense_count']} expenses: loaded in {(loaded - started) * 1000:.1f} ms, "
+          f"computed in {(computed - loaded) * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,14 +3,31 @@ Main Flask application for Expense Tracker
 Handles all routes and web interface
 """
 
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, make_response, Response
 from config import config
 from database_sqlite import init_database, test_connection
-from models import Expense
+from models import Expense, CATEGORIES, SyncTokenExpired
 import os
+import time
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from auth_models import User
 from database_auth import init_auth_database
+from importer import import_csv
+from batch import apply_batch
+import analytics_engine
+from timeseries import BUCKETS, get_timeseries
+from money import analytics_json, average_minor, expense_json, format_amount, to_minor
+import io
+import db_pool
+import write_queue
+import profiling
+import metrics
+import slow_queries
+from cache import VersionedCache, make_backend
+from hashing import HashingOverloaded, hashing_pool
 
 # Create Flask app
 app = Flask(__name__)
@@ -19,6 +36,41 @@ app = Flask(__name__)
 env = os.getenv('FLASK_ENV', 'development')
 app.config.from_object(config[env])
 
+# Per-request database connections come from a per-worker pool
+db_pool.init_app(app)
+write_queue.init_app(app)
+
+# Opt-in request timing (PROFILING_ENABLED)
+profiling.init_app(app)
+
+# If SLOW_QUERY_LOG is set, statements over SLOW_QUERY_MS go there with their query plans
+slow_queries.init_app(app)
+
+# Amounts are stored in paise; templates show them with {{ amount_minor|money }}
+app.add_template_filter(format_amount, 'money')
+
+# Analytics results, invalidated by the per-user data version
+analytics_cache = VersionedCache(make_backend(app.config))
+
+# Prometheus /metrics (METRICS_ENABLED), summed across workers via METRICS_DIR
+metrics.init_app(app)
+metrics.watch_cache('analytics', analytics_cache)
+
+# Deletes stay visible to delta sync for TOMBSTONE_RETENTION_DAYS; each worker
+# prunes older tombstones after a write request, at most once per interval
+_next_tombstone_prune = 0.0
+
+@app.after_request
+def prune_expired_tombstones(response):
+    global _next_tombstone_prune
+    if request.method != 'GET' and time.monotonic() >= _next_tombstone_prune:
+        _next_tombstone_prune = time.monotonic() + app.config['TOMBSTONE_PRUNE_INTERVAL']
+        try:
+            Expense.prune_tombstones(app.config['TOMBSTONE_RETENTION_DAYS'])
+        except Exception:
+            app.logger.exception('Pruning expired tombstones failed')
+    return response
+
 # Initialize Flask-Login
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -29,19 +81,63 @@ login_manager.login_message = 'Please log in to access this page.'
 def load_user(user_id):
     return User.get_by_id(int(user_id))
 
-# Predefined expense categories
-CATEGORIES = [
-    'Food & Dining',
-    'Transportation',
-    'Shopping',
-    'Entertainment',
-    'Healthcare',
-    'Utilities',
-    'Rent',
-    'Education',
-    'Travel',
-    'Other'
-]
+def data_version_etag(user_id, version, full_path):
+    """Strong ETag for one user's view of a URL at a given data version"""
+    variant = hashlib.sha1(full_path.encode()).hexdigest()[:12]
+    return f'{user_id}-{version}-{variant}'
+
+def settled_last_modified(last_modified):
+    """last_modified if it can serve as a validator yet, else None
+    
+    updated_at has one-second resolution: until its second is over, another
+    write can land with the same timestamp, so a Last-Modified from the
+    current second could vouch for data that is about to change. Such
+    responses rely on the ETag alone.
+    """
+    if last_modified is not None and last_modified < datetime.now(timezone.utc).replace(microsecond=0):
+        return last_modified
+    return None
+
+def page_size(requested=None):
+    """Clamp a requested page size to the configured bounds"""
+    if requested is None:
+        return app.config['EXPENSES_PAGE_SIZE']
+    return max(1, min(requested, app.config['EXPENSES_MAX_PAGE_SIZE']))
+
+def conditional_on_data_version(view):
+    """Answer conditional GETs from the user's data version before running the view
+    
+    The strong ETag covers the user, their data version and the request URL,
+    so a matching If-None-Match (or a fresh If-Modified-Since) returns 304
+    without querying expenses or serializing anything.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version, last_modified = Expense.get_data_state(current_user.id)
+        last_modified = settled_last_modified(last_modified)
+        etag = data_version_etag(current_user.id, version, request.full_path)
+        
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains(etag)
+        else:
+            not_modified = (request.if_modified_since is not None and last_modified is not None
+                            and last_modified <= request.if_modified_since)
+        
+        if not_modified:
+            response = app.response_class(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        
+        response.set_etag(etag)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        response.vary.add('Cookie')
+        return response
+    return wrapper
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -109,21 +205,27 @@ def logout():
 @app.route('/')
 @login_required
 def index():
-    """Home page - displays all expenses"""
+    """Home page - displays one page of expenses, newest first"""
+    cursor = request.args.get('cursor')
     try:
-        expenses = Expense.get_all(user_id=current_user.id)
-        total_expenses = len(expenses)
-        total_amount = sum(float(exp['amount']) for exp in expenses)
+        expenses, next_cursor = Expense.get_page(current_user.id,
+                                                 limit=app.config['EXPENSES_PAGE_SIZE'],
+                                                 cursor=cursor)
+        totals = get_cached_analytics(current_user.id)
         
         return render_template('index.html', 
                              expenses=expenses,
-                             total_expenses=total_expenses,
-                             total_amount=total_amount,
+                             next_cursor=next_cursor,
+                             is_first_page=not cursor,
+                             total_expenses=totals['expense_count'],
+                             total_amount=totals['total_spending'],
                              categories=CATEGORIES)
     except Exception as e:
         flash(f'Error loading expenses: {str(e)}', 'error')
         return render_template('index.html', 
                              expenses=[],
+                             next_cursor=None,
+                             is_first_page=True,
                              total_expenses=0,
                              total_amount=0,
                              categories=CATEGORIES)
@@ -207,39 +309,253 @@ def delete_expense(expense_id):
 def analytics():
     """Analytics page - displays spending analysis and charts"""
     try:
-        expenses = Expense.get_all(user_id=current_user.id)
-        analytics_data = calculate_analytics(expenses)
+        analytics_data = get_cached_analytics(current_user.id)
         
-        return render_template('analytics.html', 
-                             analytics=analytics_data,
-                             expenses=expenses)
+        return render_template('analytics.html', analytics=analytics_data)
     except Exception as e:
         flash(f'Error loading analytics: {str(e)}', 'error')
         return redirect(url_for('index'))
 
 @app.route('/api/expenses')
 @login_required
+@conditional_on_data_version
 def api_expenses():
-    """API endpoint to get expenses as JSON"""
+    """API endpoint to get a page of expenses as JSON
+    
+    Pass the returned next_cursor back as ?cursor= to fetch the following page.
+    """
+    try:
+        limit = page_size(request.args.get('limit', type=int))
+        expenses, next_cursor = Expense.get_page(current_user.id, limit=limit,
+                                                 cursor=request.args.get('cursor'))
+        return jsonify({'expenses': [expense_json(expense) for expense in expenses],
+                        'next_cursor': next_cursor})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/expenses/changes')
+@login_required
+@conditional_on_data_version
+def expense_changes():
+    """API endpoint for delta sync: expenses changed or deleted since a token
+    
+    Start with no since (or since=0), apply 'changed' and 'deleted' in order, then
+    call again with since=next_since; repeat while has_more is true. A since older
+    than the retained deletes gets 410 with resync: true; start over without since.
+    """
+    try:
+        limit = page_size(request.args.get('limit', type=int))
+        changed, deleted, next_since, has_more = Expense.get_changes(
+            current_user.id, since=request.args.get('since'), limit=limit)
+        return jsonify({'changed': [expense_json(expense) for expense in changed], 'deleted': deleted,
+                        'next_since': next_since, 'has_more': has_more})
+    except SyncTokenExpired as e:
+        return jsonify({'error': str(e), 'resync': True}), 410
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/expenses/search')
+@login_required
+@conditional_on_data_version
+def search_expenses():
+    """API endpoint to search expenses
+    
+    q matches words in descriptions and categories (ranked by relevance); optional
+    start_date / end_date (YYYY-MM-DD) and min_amount / max_amount narrow the results.
+    Page with limit and offset.
+    """
+    args = request.args
+    try:
+        for value in (args.get('start_date'), args.get('end_date')):
+            if value:
+                datetime.strptime(value, '%Y-%m-%d')
+        min_amount, max_amount = (to_minor(args[name]) if args.get(name) else None
+                                  for name in ('min_amount', 'max_amount'))
+        offset = max(0, args.get('offset', 0, type=int))
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD and amounts numeric'}), 400
+    
+    try:
+        limit = page_size(args.get('limit', type=int))
+        expenses, has_more = Expense.search(current_user.id, args.get('q'),
+                                            start_date=args.get('start_date'), end_date=args.get('end_date'),
+                                            min_amount_minor=min_amount, max_amount_minor=max_amount,
+                                            limit=limit, offset=offset)
+        return jsonify({'expenses': [expense_json(expense) for expense in expenses],
+                        'next_offset': offset + len(expenses) if has_more else None})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/expenses/export')
+@login_required
+def export_expenses():
+    """Stream all of the user's expenses as a JSON array or NDJSON
+    
+    Optional start_date / end_date (YYYY-MM-DD, inclusive) narrow the range.
+    Rows are encoded batch by batch, so memory use does not grow with the account.
+    """
+    export_format = request.args.get('format', 'json')
+    if export_format not in ('json', 'ndjson'):
+        return jsonify({'error': "format must be 'json' or 'ndjson'"}), 400
+    
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    try:
+        for value in (start_date, end_date):
+            if value:
+                datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        return jsonify({'error': 'Dates must be in YYYY-MM-DD format'}), 400
+    
+    batches = Expense.iter_batches(current_user.id, start_date, end_date,
+                                   batch_size=app.config['EXPORT_BATCH_SIZE'])
+    dumps = app.json.dumps
+    
+    def generate_ndjson():
+        for batch in batches:
+            yield ''.join(dumps(expense_json(expense)) + '\n' for expense in batch)
+    
+    def generate_json():
+        yield '['
+        separator = ''
+        for batch in batches:
+            yield separator + ','.join(dumps(expense_json(expense)) for expense in batch)
+            separator = ','
+        yield ']'
+    
+    if export_format == 'ndjson':
+        response = Response(generate_ndjson(), mimetype='application/x-ndjson')
+    else:
+        response = Response(generate_json(), mimetype='application/json')
+    response.headers['Content-Disposition'] = f'attachment; filename=expenses.{export_format}'
+    return response
+
+@app.route('/api/expenses/import', methods=['POST'])
+@login_required
+def import_expenses():
+    """Bulk import expenses from an uploaded CSV file (form field 'file')
+    
+    Returns counts and a per-row error report; valid rows are kept even if others fail.
+    """
+    upload = request.files.get('file')
+    if upload is None:
+        return jsonify({'error': "Upload a CSV file in the 'file' field"}), 400
+    
+    try:
+        lines = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+        report = import_csv(lines, current_user.id, chunk_size=app.config['IMPORT_CHUNK_SIZE'])
+        return jsonify(report)
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/expenses/batch', methods=['POST'])
+@login_required
+def batch_expenses():
+    """Apply a JSON list of create/update/delete operations in one transaction
+    
+    Body: {"operations": [...], "atomic": false}. Returns one result per operation;
+    see batch.py for the operation format.
+    """
+    payload = request.get_json(silent=True)
+    operations = payload.get('operations') if isinstance(payload, dict) else None
+    if not isinstance(operations, list):
+        return jsonify({'error': "Send a JSON object with an 'operations' list"}), 400
+    if len(operations) > app.config['BATCH_MAX_OPERATIONS']:
+        return jsonify({'error': f"At most {app.config['BATCH_MAX_OPERATIONS']} operations per batch"}), 413
+    
     try:
-        expenses = Expense.get_all(user_id=current_user.id)
-        return jsonify(expenses)
+        results = apply_batch(current_user.id, operations, atomic=bool(payload.get('atomic')))
+        applied = sum(1 for result in results if result['status'] not in ('error', 'rolled_back'))
+        return jsonify({'results': results, 'applied': applied, 'failed': len(results) - applied})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/analytics')
 @login_required
+@conditional_on_data_version
 def api_analytics():
-    """API endpoint to get analytics data as JSON"""
+    """API endpoint to get analytics data as JSON
+    
+    detail=full adds percentiles, weekday and day-of-month distributions,
+    rolling 30/90-day spend over the last 180 days, month-over-month changes
+    and a category x month matrix (requires NumPy).
+    """
+    detail = request.args.get('detail', 'basic')
+    if detail not in ('basic', 'full'):
+        return jsonify({'error': "detail must be 'basic' or 'full'"}), 400
+    if detail == 'full' and not analytics_engine.available():
+        return jsonify({'error': 'Detailed analytics require NumPy, which is not installed'}), 501
+    
+    try:
+        return jsonify(get_analytics_json(current_user.id, detail))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/analytics/timeseries')
+@login_required
+@conditional_on_data_version
+def analytics_timeseries():
+    """API endpoint for chart data: spending per day, week, month or year
+    
+    Optional start_date / end_date (YYYY-MM-DD) narrow the range; by_category=1
+    adds a series per category. max_points caps the number of points by summing
+    neighbouring buckets (group_size in the response says how many).
+    """
+    args = request.args
+    bucket = args.get('bucket', 'month')
+    if bucket not in BUCKETS:
+        return jsonify({'error': f"bucket must be one of {', '.join(BUCKETS)}"}), 400
     try:
-        expenses = Expense.get_all(user_id=current_user.id)
-        analytics_data = calculate_analytics(expenses)
-        return jsonify(analytics_data)
+        for value in (args.get('start_date'), args.get('end_date')):
+            if value:
+                datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        return jsonify({'error': 'Dates must be in YYYY-MM-DD format'}), 400
+    
+    limit = app.config['TIMESERIES_MAX_POINTS']
+    max_points = max(1, min(args.get('max_points', limit, type=int), limit))
+    by_category = args.get('by_category', '').lower() in ('1', 'true', 'yes')
+    try:
+        version = Expense.get_data_version(current_user.id)
+        key = ('timeseries', current_user.id, bucket, args.get('start_date'), args.get('end_date'),
+               by_category, max_points)
+        series = analytics_cache.get_or_compute(key, version, lambda: get_timeseries(
+            current_user.id, bucket, start_date=args.get('start_date'), end_date=args.get('end_date'),
+            by_category=by_category, max_points=max_points))
+        return jsonify(series)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def get_cached_analytics(user_id, detail='basic'):
+    """Analytics for a user, recomputed only when their data version changes
+    
+    The basic analytics are in minor units like Expense.get_analytics; the
+    detailed ones come from the engine ready for JSON.
+    """
+    version = Expense.get_data_version(user_id)
+    if detail == 'full':
+        return analytics_cache.get_or_compute(('analytics_detail', user_id), version,
+                                              lambda: analytics_engine.get_detailed_analytics(user_id))
+    return analytics_cache.get_or_compute(('analytics', user_id), version,
+                                          lambda: Expense.get_analytics(user_id))
+
+def get_analytics_json(user_id, detail='basic'):
+    """Cached analytics for a user as the /api/analytics response body"""
+    analytics_data = get_cached_analytics(user_id, detail)
+    return analytics_data if detail == 'full' else analytics_json(analytics_data)
+
 def calculate_analytics(expenses):
-    """Calculate analytics from expenses data"""
+    """Calculate analytics from a list of expense dicts
+    
+    Routes use Expense.get_analytics, which returns the same structure
+    computed with SQL aggregation instead of loading every row.
+    """
     if not expenses:
         return {
             'total_spending': 0,
@@ -249,42 +565,46 @@ def calculate_analytics(expenses):
             'average_expense': 0
         }
     
-    total_spending = sum(float(exp['amount']) for exp in expenses)
+    total_spending = sum(exp['amount_minor'] for exp in expenses)
     expense_count = len(expenses)
-    average_expense = total_spending / expense_count if expense_count > 0 else 0
     
     category_totals = {}
     for expense in expenses:
         category = expense['category']
-        amount = float(expense['amount'])
-        category_totals[category] = category_totals.get(category, 0) + amount
+        category_totals[category] = category_totals.get(category, 0) + expense['amount_minor']
     
     monthly_totals = {}
     for expense in expenses:
-        date_str = expense['date']
-        month = date_str[:7]
-        amount = float(expense['amount'])
-        monthly_totals[month] = monthly_totals.get(month, 0) + amount
+        month = expense['date'][:7]
+        monthly_totals[month] = monthly_totals.get(month, 0) + expense['amount_minor']
     
     return {
-        'total_spending': round(total_spending, 2),
+        'total_spending': total_spending,
         'expense_count': expense_count,
-        'category_totals': {k: round(v, 2) for k, v in category_totals.items()},
-        'monthly_totals': {k: round(v, 2) for k, v in sorted(monthly_totals.items())},
-        'average_expense': round(average_expense, 2)
+        'category_totals': category_totals,
+        'monthly_totals': dict(sorted(monthly_totals.items())),
+        'average_expense': average_minor(total_spending, expense_count)
     }
 
 @app.route('/health')
 def health_check():
     """Health check endpoint for monitoring"""
     try:
-        if test_connection():
-            return jsonify({'status': 'healthy', 'database': 'connected'}), 200
+        if test_connection(verbose=False):
+            return jsonify({'status': 'healthy', 'database': 'connected',
+                            'pool': db_pool.get_pool().stats(),
+                            'analytics_cache': analytics_cache.stats(),
+                            'password_hashing': hashing_pool.stats()}), 200
         else:
             return jsonify({'status': 'unhealthy', 'database': 'disconnected'}), 503
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.errorhandler(HashingOverloaded)
+def hashing_overloaded(error):
+    """Shed login/signup load instead of queueing it behind page views"""
+    return render_template('503.html'), 503, {'Retry-After': str(error.retry_after)}
+
 @app.errorhandler(404)
 def not_found(error):
     """Handle 404 errors"""
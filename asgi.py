@@ -0,0 +1,191 @@
+"""
+ASGI entry point for Expense Tracker
+Run with: uvicorn asgi:application --host 0.0.0.0 --port 5000
+
+The JSON endpoints clients poll (/api/expenses, /api/expenses/changes,
+/api/analytics) are served natively: requests wait on the database thread
+pool instead of holding a worker, so one process can keep many pollers open. Every other
+route, and any request without a valid session, goes through the same
+Flask app via asgiref's WSGI adapter, on a thread pool the size of the
+database connection pool. Procfile's app:app (gunicorn) stays the default
+WSGI entry point.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgiInstance
+from werkzeug.datastructures import Headers
+from werkzeug.http import http_date, parse_cookie, parse_date, parse_etags, quote_etag
+
+import analytics_engine
+from app import app, data_version_etag, get_analytics_json, page_size, settled_last_modified
+from async_db import AsyncExpense, AsyncUser, db_executor
+from models import SyncTokenExpired
+from money import expense_json
+
+
+class PooledWsgiToAsgi:
+    """asgiref's WsgiToAsgi, but running requests on an executor
+
+    asgiref runs every WSGI request on one shared thread, so a single slow
+    page (an export, a login hashing a password) would hold up all the others.
+    """
+
+    def __init__(self, wsgi_application, executor):
+        self.wsgi_application = wsgi_application
+        self.executor = executor
+
+    async def __call__(self, scope, receive, send):
+        await _PooledWsgiInstance(self.wsgi_application, self.executor)(scope, receive, send)
+
+
+class _PooledWsgiInstance(WsgiToAsgiInstance):
+    def __init__(self, wsgi_application, executor):
+        super().__init__(wsgi_application)
+        self.executor = executor
+
+    async def run_wsgi_app(self, body):
+        run = WsgiToAsgiInstance.run_wsgi_app.__wrapped__
+        await sync_to_async(run, thread_sensitive=False, executor=self.executor)(self, body)
+
+
+class ExpenseTrackerASGI:
+    """ASGI app that serves hot JSON routes natively and everything else via Flask"""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        # Each Flask request holds a pooled connection, so more threads would only queue for one
+        self.wsgi_executor = ThreadPoolExecutor(max_workers=flask_app.config.get('DB_POOL_SIZE', 5),
+                                                thread_name_prefix='wsgi')
+        self.wsgi = PooledWsgiToAsgi(flask_app, self.wsgi_executor)
+        self.session_serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+        self.routes = {
+            '/api/expenses': self.api_expenses,
+            '/api/expenses/changes': self.expense_changes,
+            '/api/analytics': self.api_analytics,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+
+        handler = self.routes.get(scope.get('path'))
+        if handler is not None and scope['method'] == 'GET':
+            headers = Headers([(key.decode('latin-1'), value.decode('latin-1'))
+                               for key, value in scope['headers']])
+            user = await self.authenticate(headers)
+            if user is not None:
+                return await self.respond_conditionally(scope, headers, user, handler, send)
+
+        await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                db_executor.shutdown()
+                self.wsgi_executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def authenticate(self, headers):
+        """Resolve the logged-in user from the Flask session cookie, or None"""
+        cookies = parse_cookie(headers.get('Cookie', ''))
+        cookie = cookies.get(self.flask_app.config['SESSION_COOKIE_NAME'])
+        if not cookie or self.session_serializer is None:
+            return None
+        try:
+            max_age = int(self.flask_app.permanent_session_lifetime.total_seconds())
+            session = self.session_serializer.loads(cookie, max_age=max_age)
+            user_id = int(session['_user_id'])
+        except Exception:
+            return None
+        return await AsyncUser.get_by_id(user_id)
+
+    async def respond_conditionally(self, scope, headers, user, handler, send):
+        """Same ETag / Last-Modified rules as app.conditional_on_data_version"""
+        version, last_modified = await AsyncExpense.get_data_state(user.id)
+        last_modified = settled_last_modified(last_modified)
+        full_path = f"{scope['path']}?{scope['query_string'].decode('latin-1')}"
+        etag = data_version_etag(user.id, version, full_path)
+
+        if headers.get('If-None-Match'):
+            not_modified = parse_etags(headers['If-None-Match']).contains(etag)
+        else:
+            if_modified_since = parse_date(headers.get('If-Modified-Since'))
+            not_modified = (if_modified_since is not None and last_modified is not None
+                            and last_modified <= if_modified_since)
+
+        cache_headers = [
+            ('ETag', quote_etag(etag)),
+            ('Cache-Control', 'private, no-cache'),
+            ('Vary', 'Cookie'),
+        ]
+        if last_modified is not None:
+            cache_headers.append(('Last-Modified', http_date(last_modified)))
+
+        if not_modified:
+            return await self.send_response(send, 304, b'', cache_headers)
+
+        args = {key: values[0] for key, values in parse_qs(scope['query_string'].decode('latin-1')).items()}
+        try:
+            payload = await handler(user, args)
+            status = 200
+            # Handlers return (payload, status) for errors, like Flask views
+            if isinstance(payload, tuple):
+                payload, status = payload
+                cache_headers = []
+        except ValueError as e:
+            payload, status, cache_headers = {'error': str(e)}, 400, []
+        except Exception as e:
+            payload, status, cache_headers = {'error': str(e)}, 500, []
+
+        body = (self.flask_app.json.dumps(payload) + '\n').encode()
+        await self.send_response(send, status, body,
+                                 [('Content-Type', 'application/json')] + cache_headers)
+
+    async def send_response(self, send, status, body, headers):
+        headers = headers + [('Content-Length', str(len(body)))]
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(key.lower().encode('latin-1'), value.encode('latin-1')) for key, value in headers],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def api_expenses(self, user, args):
+        try:
+            requested = int(args['limit'])
+        except (KeyError, ValueError):
+            requested = None
+        expenses, next_cursor = await AsyncExpense.get_page(user.id, limit=page_size(requested),
+                                                            cursor=args.get('cursor'))
+        return {'expenses': [expense_json(expense) for expense in expenses], 'next_cursor': next_cursor}
+
+    async def expense_changes(self, user, args):
+        try:
+            requested = int(args['limit'])
+        except (KeyError, ValueError):
+            requested = None
+        try:
+            changed, deleted, next_since, has_more = await AsyncExpense.get_changes(
+                user.id, since=args.get('since'), limit=page_size(requested))
+        except SyncTokenExpired as e:
+            return {'error': str(e), 'resync': True}, 410
+        return {'changed': [expense_json(expense) for expense in changed], 'deleted': deleted,
+                'next_since': next_since, 'has_more': has_more}
+
+    async def api_analytics(self, user, args):
+        detail = args.get('detail', 'basic')
+        if detail not in ('basic', 'full'):
+            raise ValueError("detail must be 'basic' or 'full'")
+        if detail == 'full' and not analytics_engine.available():
+            return {'error': 'Detailed analytics require NumPy, which is not installed'}, 501
+        return await db_executor.run(get_analytics_json, user.id, detail)
+
+
+application = ExpenseTrackerASGI(app)
@@ -0,0 +1,69 @@
+"""
+Async data access for Expense Tracker
+Awaitable versions of the Expense and User methods; the blocking SQLite
+calls run on a dedicated pool of database threads so the event loop never waits
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from auth_models import User
+from config import Config
+from models import Expense
+
+
+class DatabaseExecutor:
+    """Dedicated threads for database work, each drawing connections from the pool"""
+
+    def __init__(self, threads=4):
+        self.threads = threads
+        self._executor = None
+
+    async def run(self, func, *args, **kwargs):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='db')
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+db_executor = DatabaseExecutor(threads=Config.ASYNC_DB_THREADS)
+
+
+def _awaitable(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await db_executor.run(func, *args, **kwargs)
+    return staticmethod(wrapper)
+
+
+class AsyncExpense:
+    """Awaitable counterparts of the Expense data-access methods"""
+
+    get_all = _awaitable(Expense.get_all)
+    get_page = _awaitable(Expense.get_page)
+    get_changes = _awaitable(Expense.get_changes)
+    get_by_id = _awaitable(Expense.get_by_id)
+    get_by_date_range = _awaitable(Expense.get_by_date_range)
+    get_analytics = _awaitable(Expense.get_analytics)
+    get_data_state = _awaitable(Expense.get_data_state)
+    get_data_version = _awaitable(Expense.get_data_version)
+    delete = _awaitable(Expense.delete)
+
+    @staticmethod
+    async def save(expense, user_id):
+        """Save an Expense; user_id is required since there is no Flask request here"""
+        return await db_executor.run(expense.save, user_id)
+
+
+class AsyncUser:
+    """Awaitable counterparts of the User data-access methods"""
+
+    get_by_id = _awaitable(User.get_by_id)
+    get_by_email = _awaitable(User.get_by_email)
+    create_user = _awaitable(User.create_user)
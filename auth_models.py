@@ -2,22 +2,50 @@
 User authentication models
 """
 
-from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 import sqlite3
+from cache import MemoryBackend
+from config import Config
+from database_sqlite import get_db_connection
+from hashing import generate_password_hash, check_password_hash
 
-def get_db_connection():
-    connection = sqlite3.connect('expense_tracker.db')
-    connection.row_factory = sqlite3.Row
-    return connection
+# Users loaded by id, so Flask-Login's user_loader skips SQLite on most requests.
+# Per worker; the TTL bounds how long another worker's change can go unseen.
+_user_cache = MemoryBackend(max_entries=Config.USER_CACHE_SIZE, ttl=Config.USER_CACHE_TTL)
 
-class User(UserMixin):
+class User:
+    """Authenticated user, with the attributes and methods Flask-Login expects
+    
+    Defined with __slots__ (instead of inheriting UserMixin, which has none)
+    to keep the cached instances compact.
+    """
+    __slots__ = ('id', 'username', 'email', 'password_hash')
+    
+    is_active = True
+    is_authenticated = True
+    is_anonymous = False
+    
     def __init__(self, id, username, email, password_hash):
         self.id = id
         self.username = username
         self.email = email
         self.password_hash = password_hash
     
+    def get_id(self):
+        return str(self.id)
+    
+    def __eq__(self, other):
+        if isinstance(other, User):
+            return self.id == other.id
+        return NotImplemented
+    
+    def __hash__(self):
+        return hash(self.id)
+    
+    @staticmethod
+    def invalidate(user_id):
+        """Drop a cached user; call whenever a user row is created or changed"""
+        _user_cache.delete(user_id)
+    
     @staticmethod
     def create_user(username, email, password):
         """Create a new user"""
@@ -35,6 +63,7 @@ class User(UserMixin):
             user_id = cursor.lastrowid
             cursor.close()
             connection.close()
+            User.invalidate(user_id)
             return User(user_id, username, email, password_hash)
         except sqlite3.IntegrityError:
             cursor.close()
@@ -59,7 +88,11 @@ class User(UserMixin):
     
     @staticmethod
     def get_by_id(user_id):
-        """Get user by ID"""
+        """Get user by ID, served from the in-process cache when possible"""
+        user = _user_cache.get(user_id)
+        if user is not None:
+            return user
+        
         connection = get_db_connection()
         cursor = connection.cursor()
         
@@ -70,7 +103,9 @@ class User(UserMixin):
         connection.close()
         
         if row:
-            return User(row['id'], row['username'], row['email'], row['password_hash'])
+            user = User(row['id'], row['username'], row['email'], row['password_hash'])
+            _user_cache.set(user_id, user)
+            return user
         return None
     
     def check_password(self, password):
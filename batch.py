@@ -0,0 +1,113 @@
+"""
+Batch mutations for Expense Tracker
+Applies a list of create/update/delete operations for one user in a single
+write transaction, with one rollup update and one data-version bump per batch
+
+Operation format (JSON objects):
+    {"op": "create", "amount": 12.5, "category": "Travel", "date": "2025-01-03", "description": "..."}
+    {"op": "update", "id": 42, "amount": 15}          (omitted fields keep their value)
+    {"op": "delete", "id": 42}
+"""
+
+from importer import parse_row
+from models import Expense, bump_data_version
+from money import format_amount
+from rollups import RollupDelta
+from write_queue import run_write
+
+OPERATIONS = ('create', 'update', 'delete')
+FIELDS = ('amount', 'category', 'date', 'description')
+COLUMNS = {field: index for index, field in enumerate(FIELDS)}
+
+
+class BatchRolledBack(Exception):
+    """Raised inside the write to undo an atomic batch that had a failing operation"""
+
+    def __init__(self, results, total):
+        super().__init__('Batch rolled back')
+        self.results = [
+            result if result['status'] == 'error' else {'index': result['index'], 'status': 'rolled_back'}
+            for result in results
+        ] + [{'index': index, 'status': 'rolled_back'} for index in range(len(results), total)]
+
+
+def validate(operation, current=None):
+    """Build an Expense from an operation's fields, falling back to the current row"""
+    values = []
+    for field in FIELDS:
+        value = operation.get(field)
+        if value is None and current is not None:
+            value = format_amount(current['amount_minor']) if field == 'amount' else current[field]
+        values.append('' if value is None else str(value))
+    amount_minor, category, date, description = parse_row(values, COLUMNS)
+    return Expense.from_minor(amount_minor, category, date, description,
+                              current['id'] if current is not None else None)
+
+
+def _apply_one(cursor, user_id, operation, delta):
+    """Apply one operation; returns the result entry or raises ValueError"""
+    if not isinstance(operation, dict) or operation.get('op') not in OPERATIONS:
+        raise ValueError(f"op must be one of {', '.join(OPERATIONS)}")
+    kind = operation['op']
+
+    if kind == 'create':
+        expense = validate(operation)
+        expense._write(cursor, user_id, delta)
+        return {'status': 'created', 'id': expense.id}
+
+    try:
+        expense_id = int(operation['id'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f'{kind} needs an integer id')
+    cursor.execute('SELECT * FROM expenses WHERE id = ? AND user_id = ?', (expense_id, user_id))
+    current = cursor.fetchone()
+    if current is None:
+        raise ValueError(f'Expense {expense_id} not found')
+
+    if kind == 'update':
+        validate(operation, current)._write(cursor, user_id, delta)
+        return {'status': 'updated', 'id': expense_id}
+
+    Expense._delete(cursor, expense_id, delta)
+    return {'status': 'deleted', 'id': expense_id}
+
+
+def apply_batch(user_id, operations, atomic=False):
+    """Apply operations for a user in one transaction; returns one result per operation
+
+    Each operation runs in its own SAVEPOINT, so a failing one is undone on its
+    own and reported as {'status': 'error', 'error': ...} while the rest commit.
+    With atomic=True any failure rolls back the whole batch and the remaining
+    results are reported as 'rolled_back'. Statements repeat verbatim, so
+    sqlite3's per-connection statement cache prepares each one only once.
+    """
+    def write(cursor):
+        delta = RollupDelta()
+        results = []
+        for index, operation in enumerate(operations):
+            cursor.execute('SAVEPOINT batch_operation')
+            operation_delta = RollupDelta()
+            try:
+                result = _apply_one(cursor, user_id, operation, operation_delta)
+                cursor.execute('RELEASE batch_operation')
+            except ValueError as e:
+                cursor.execute('ROLLBACK TO batch_operation')
+                cursor.execute('RELEASE batch_operation')
+                results.append({'index': index, 'status': 'error', 'error': str(e)})
+                if atomic:
+                    break
+                continue
+            delta.merge(operation_delta)
+            results.append({'index': index, **result})
+
+        if atomic and any(result['status'] == 'error' for result in results):
+            raise BatchRolledBack(results, len(operations))
+        if any(result['status'] != 'error' for result in results):
+            delta.apply(cursor)
+            bump_data_version(cursor, user_id)
+        return results
+
+    try:
+        return run_write(write)
+    except BatchRolledBack as e:
+        return e.results
@@ -0,0 +1,5 @@
+"""
+Benchmarks for Expense Tracker
+Seeded synthetic data (datagen) and a timing suite with baseline comparison
+Run with: python -m benchmarks --help
+"""
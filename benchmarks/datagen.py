@@ -0,0 +1,125 @@
+"""
+Seeded synthetic data for Expense Tracker benchmarks
+Creates users with expenses whose categories, amounts and dates follow
+realistic shapes; the same seed always produces the same rows
+
+Usage: python -m benchmarks.datagen bench.db --users 5 --expenses 10000 --seed 42
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+# (weight, median amount, descriptions) per category
+PROFILES = {
+    'Food & Dining': (30, 14.0, ['Lunch', 'Groceries', 'Coffee', 'Dinner out', 'Bakery', 'Takeaway pizza']),
+    'Transportation': (15, 9.0, ['Bus ticket', 'Taxi', 'Fuel', 'Train pass', 'Parking']),
+    'Shopping': (12, 38.0, ['Clothes', 'Shoes', 'Electronics', 'Home supplies', 'Gift']),
+    'Entertainment': (8, 22.0, ['Cinema', 'Concert', 'Streaming subscription', 'Books', 'Games']),
+    'Healthcare': (5, 45.0, ['Pharmacy', 'Doctor visit', 'Dentist', 'Vitamins']),
+    'Utilities': (8, 70.0, ['Electricity bill', 'Water bill', 'Internet', 'Phone bill', 'Gas bill']),
+    'Rent': (4, 1100.0, ['Monthly rent']),
+    'Education': (3, 120.0, ['Course fee', 'Textbooks', 'Workshop']),
+    'Travel': (5, 240.0, ['Flight', 'Hotel', 'Airbnb', 'Travel insurance']),
+    'Other': (10, 18.0, ['Miscellaneous', 'Donation', 'Haircut', 'Laundry']),
+}
+# Weekend days see more dining and entertainment
+WEEKEND_BOOST = {'Food & Dining': 1.6, 'Entertainment': 2.0, 'Shopping': 1.4}
+# Every account logs in as bench<N>@example.com with this password
+PASSWORD = 'benchmark'
+
+
+def generate_expenses(rng, count, end=date(2025, 6, 30), days=730):
+    """Yield (amount_minor, category, date, description) tuples for one user"""
+    categories = list(PROFILES)
+    weekday_weights = [PROFILES[name][0] for name in categories]
+    weekend_weights = [PROFILES[name][0] * WEEKEND_BOOST.get(name, 1.0) for name in categories]
+    start = end - timedelta(days=days - 1)
+    for _ in range(count):
+        # Recent months are busier: skew offsets towards the end of the range
+        day = start + timedelta(days=int(days * math.sqrt(rng.random())))
+        weights = weekend_weights if day.weekday() >= 5 else weekday_weights
+        category = rng.choices(categories, weights)[0]
+        _, median, descriptions = PROFILES[category]
+        amount_minor = round(median * rng.lognormvariate(0, 0.6) * 100)
+        yield amount_minor, category, day.isoformat(), rng.choice(descriptions)
+
+
+def populate(connection, users=5, expenses_per_user=10000, seed=42):
+    """Fill an initialized database with users 1..N and their expenses; returns the user ids"""
+    from werkzeug.security import generate_password_hash
+
+    from models import next_change_seq
+    from rollups import rebuild_rollups
+
+    rng = random.Random(seed)
+    # Hashed once and shared, so creating many users costs no extra hashing
+    password_hash = generate_password_hash(PASSWORD)
+    cursor = connection.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        # Index search once at the end instead of with a trigger per row
+        cursor.execute('INSERT INTO expenses_fts_deferred DEFAULT VALUES')
+        user_ids = []
+        for number in range(1, users + 1):
+            cursor.execute('INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
+                           (f'bench{number}', f'bench{number}@example.com', password_hash))
+            user_id = cursor.lastrowid
+            user_ids.append(user_id)
+            change_seq = next_change_seq(cursor, user_id)
+            rows = sorted(generate_expenses(rng, expenses_per_user), key=lambda row: row[2])
+            cursor.executemany(
+                'INSERT INTO expenses (user_id, amount_minor, category, date, description, change_seq) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [(user_id, *row, change_seq) for row in rows])
+            cursor.execute('INSERT INTO user_data_versions (user_id, version) VALUES (?, ?)',
+                           (user_id, change_seq))
+        cursor.execute('DELETE FROM expenses_fts_deferred')
+        cursor.execute("INSERT INTO expenses_fts (expenses_fts) VALUES ('rebuild')")
+        rebuild_rollups(cursor)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    connection.execute('ANALYZE')
+    return user_ids
+
+
+def create_database(path, users=5, expenses_per_user=10000, seed=42):
+    """Point the connection pool at a new database file, migrate it and populate it"""
+    import db_pool
+    from database_sqlite import get_dedicated_connection
+    from migrations import migrate
+
+    db_pool.configure_pool(database=path)
+    connection = get_dedicated_connection()
+    try:
+        migrate(connection)
+        return populate(connection, users, expenses_per_user, seed)
+    finally:
+        connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a seeded benchmark database')
+    parser.add_argument('path', help='SQLite file to create (must not exist)')
+    parser.add_argument('--users', type=int, default=5)
+    parser.add_argument('--expenses', type=int, default=10000, help='Expenses per user')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+    if os.path.exists(args.path):
+        print(f"❌ {args.path} already exists")
+        return 1
+
+    user_ids = create_database(args.path, args.users, args.expenses, args.seed)
+    print(f"✅ Created {len(user_ids)} users x {args.expenses} expenses in {args.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+"""
+Load test for Expense Tracker
+Logs in many synthetic users and replays a weighted mix of page, API and
+write requests at an open-loop (Poisson) arrival rate, then reports
+throughput, error rate and p50/p95/p99 latency per route
+
+Latency is measured from each request's scheduled start, so a stalled server
+shows up as queueing delay instead of silently lowering the offered load.
+"database is locked" failures are counted separately, including the ones the
+app only reports as a flashed message behind a redirect.
+
+Usage: python -m benchmarks.loadtest --start --workers 2 --rate 100 --duration 30
+       python -m benchmarks.loadtest --url http://localhost:5000 --users 20
+"""
+
+import argparse
+import base64
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from benchmarks.datagen import PASSWORD
+
+DEFAULT_MIX = 'index=30,api_expenses=30,api_analytics=20,add=10,edit=10'
+CATEGORIES = ['Food & Dining', 'Transportation', 'Shopping', 'Entertainment', 'Other']
+LOCKED = 'database is locked'
+
+
+class Client:
+    """Keep-alive HTTP connections, one per worker thread"""
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def request(self, method, path, cookie=None, form=None):
+        """Returns (status, headers, body); retries once on a dropped keep-alive connection"""
+        headers = {'Cookie': cookie} if cookie else {}
+        body = None
+        if form is not None:
+            body = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        for attempt in (1, 2):
+            connection = getattr(self._local, 'connection', None)
+            if connection is None:
+                connection = self._local.connection = http.client.HTTPConnection(
+                    self.host, self.port, timeout=self.timeout)
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                return response.status, response.headers, response.read()
+            except (http.client.HTTPException, ConnectionError):
+                connection.close()
+                self._local.connection = None
+                if attempt == 2:
+                    raise
+
+
+def session_cookie(headers):
+    """The value of the Flask session cookie set by a response, or None"""
+    for header in headers.get_all('Set-Cookie') or []:
+        cookie = SimpleCookie(header)
+        if 'session' in cookie:
+            return cookie['session'].value
+    return None
+
+
+def session_data(cookie_value):
+    """Decode an (unverified) Flask session cookie: [.]payload.timestamp.signature"""
+    try:
+        compressed = cookie_value.startswith('.')
+        payload = cookie_value.lstrip('.').split('.')[0]
+        data = base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4))
+        return json.loads(zlib.decompress(data) if compressed else data)
+    except (ValueError, zlib.error):
+        return {}
+
+
+def flashed_messages(cookie_value):
+    """(category, message) pairs flashed into a session cookie; Flask tags tuples as {' t': [...]}"""
+    flashes = session_data(cookie_value).get('_flashes', [])
+    return [tuple(flash[' t'] if isinstance(flash, dict) else flash) for flash in flashes]
+
+
+def login(client, email):
+    """Log in, retrying while password hashing sheds load; returns (cookie, expense ids)"""
+    for _ in range(20):
+        status, headers, _ = client.request('POST', '/login', form={'email': email, 'password': PASSWORD})
+        if status == 503:
+            time.sleep(float(headers.get('Retry-After', 1)))
+            continue
+        cookie = session_cookie(headers)
+        if status != 302 or cookie is None or '_user_id' not in session_data(cookie):
+            raise RuntimeError(f'Login failed for {email} (HTTP {status})')
+        cookie = f'session={cookie}'
+        # Consume the welcome flash so it is not re-rendered on every page view
+        _, headers, _ = client.request('GET', '/', cookie=cookie)
+        cookie = f'session={session_cookie(headers) or cookie[8:]}'
+        _, _, body = client.request('GET', '/api/expenses?limit=200', cookie=cookie)
+        return cookie, [expense['id'] for expense in json.loads(body)['expenses']]
+    raise RuntimeError(f'Login for {email} kept getting 503')
+
+
+def make_request(kind, rng, expense_ids):
+    """(route label, method, path, form, expected statuses) for one request of the mix"""
+    if kind == 'index':
+        return 'GET /', 'GET', '/', None, (200,)
+    if kind == 'api_expenses':
+        return 'GET /api/expenses', 'GET', '/api/expenses', None, (200,)
+    if kind == 'api_analytics':
+        return 'GET /api/analytics', 'GET', '/api/analytics', None, (200,)
+    form = {
+        'amount': f'{rng.lognormvariate(3, 0.8):.2f}',
+        'category': rng.choice(CATEGORIES),
+        'date': f'2025-{rng.randint(1, 6):02d}-{rng.randint(1, 28):02d}',
+        'description': 'Load test',
+    }
+    if kind == 'edit' and expense_ids:
+        return 'POST /edit/<id>', 'POST', f'/edit/{rng.choice(expense_ids)}', form, (302,)
+    return 'POST /add', 'POST', '/add', form, (302,)
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in ('index', 'api_expenses', 'api_analytics', 'add', 'edit'):
+            raise ValueError(f'Unknown request type {name!r}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def summarize(samples, elapsed):
+    """Per-route and overall throughput, error rate and latency percentiles"""
+    routes = {}
+    for sample in samples:
+        routes.setdefault(sample['route'], []).append(sample)
+    routes['ALL'] = samples
+
+    report = {}
+    for route, entries in routes.items():
+        latencies = sorted(entry['latency'] * 1000 for entry in entries)
+        errors = sum(1 for entry in entries if entry['error'])
+        report[route] = {
+            'requests': len(entries),
+            'throughput_rps': round(len(entries) / elapsed, 2) if elapsed else 0.0,
+            'errors': errors,
+            'error_rate': round(errors / len(entries), 4) if entries else 0.0,
+            'database_locked': sum(1 for entry in entries if entry['locked']),
+            'p50_ms': round(percentile(latencies, 0.50), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'max_ms': round(latencies[-1], 2) if latencies else 0.0,
+        }
+    return report
+
+
+def run_load(client, sessions, mix, rate, duration, concurrency=64, seed=1):
+    """Offer rate requests/second for duration seconds; returns the per-request samples"""
+    rng = random.Random(seed)
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    samples = []
+    samples_lock = threading.Lock()
+
+    def send(scheduled, route, method, path, form, expected, cookie):
+        error = None
+        locked = False
+        try:
+            status, headers, body = client.request(method, path, cookie=cookie, form=form)
+            text = body.decode('utf-8', 'replace')
+            flashes = flashed_messages(session_cookie(headers) or '')
+            locked = LOCKED in text or any(LOCKED in message for _, message in flashes)
+            if status not in expected:
+                error = f'HTTP {status}'
+            else:
+                error = next((message for category, message in flashes if category == 'error'), None)
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+            locked = LOCKED in str(e)
+        sample = {'route': route, 'latency': time.perf_counter() - scheduled,
+                  'error': error, 'locked': locked or bool(error and LOCKED in error)}
+        with samples_lock:
+            samples.append(sample)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        started = time.perf_counter()
+        scheduled = started
+        while scheduled - started < duration:
+            scheduled += rng.expovariate(rate)
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            cookie, expense_ids = rng.choice(sessions)
+            request = make_request(rng.choices(kinds, weights)[0], rng, expense_ids)
+            executor.submit(send, scheduled, *request, cookie)
+    return samples, time.perf_counter() - started
+
+
+def start_server(workers, port, users, expenses, seed):
+    """Generate a database and start gunicorn on it the way the Dockerfile does"""
+    from benchmarks.datagen import create_database
+
+    workdir = tempfile.mkdtemp(prefix='expense-load-')
+    database = os.path.join(workdir, 'expense_tracker.db')
+    create_database(database, users, expenses, seed)
+    env = dict(os.environ, DATABASE_PATH=database, FLASK_ENV='production',
+               METRICS_DIR=os.path.join(workdir, 'metrics'),
+               SLOW_QUERY_LOG=os.path.join(workdir, 'slow_queries.log'))
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+         '--timeout', '120', 'app:app'],
+        cwd=root, env=env, stdout=subprocess.DEVNULL, stderr=open(os.path.join(workdir, 'gunicorn.log'), 'w'))
+    client = Client(f'http://127.0.0.1:{port}')
+    for _ in range(100):
+        try:
+            if client.request('GET', '/health')[0] == 200:
+                return server, workdir
+        except OSError:
+            pass
+        if server.poll() is not None:
+            break
+        time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError(f'gunicorn did not come up; see {workdir}/gunicorn.log')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Open-loop load test for Expense Tracker')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--url', help='Server to test; its users must come from benchmarks.datagen')
+    target.add_argument('--start', action='store_true', help='Generate data and start gunicorn locally')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers (with --start)')
+    parser.add_argument('--port', type=int, default=5055, help='Port for --start')
+    parser.add_argument('--users', type=int, default=20, help='Synthetic users to log in')
+    parser.add_argument('--expenses', type=int, default=2000, help='Expenses per user (with --start)')
+    parser.add_argument('--rate', type=float, default=50, help='Requests per second offered')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds of load')
+    parser.add_argument('--concurrency', type=int, default=64, help='Maximum requests in flight')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Weighted request mix (default {DEFAULT_MIX})')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Write the report as JSON here')
+    args = parser.parse_args(argv)
+    mix = parse_mix(args.mix)
+
+    server = None
+    url = args.url
+    if args.start:
+        server, workdir = start_server(args.workers, args.port, args.users, args.expenses, args.seed)
+        url = f'http://127.0.0.1:{args.port}'
+        print(f"🚀 gunicorn with {args.workers} workers on {url} (data in {workdir})")
+    try:
+        client = Client(url)
+        sessions = [login(client, f'bench{number}@example.com') for number in range(1, args.users + 1)]
+        print(f"🔑 Logged in {len(sessions)} users; offering {args.rate:g} req/s for {args.duration:g}s")
+        samples, elapsed = run_load(client, sessions, mix, args.rate, args.duration, args.concurrency, args.seed)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    report = summarize(samples, elapsed)
+    print(f"{'route':<20} {'req':>7} {'rps':>8} {'err%':>6} {'locked':>6} "
+          f"{'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}  (ms)")
+    for route, stats in sorted(report.items(), key=lambda item: item[0] == 'ALL'):
+        print(f"{route:<20} {stats['requests']:>7} {stats['throughput_rps']:>8} "
+              f"{stats['error_rate'] * 100:>6.2f} {stats['database_locked']:>6} "
+              f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8} {stats['max_ms']:>8}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'settings': vars(args), 'elapsed_seconds': round(elapsed, 3), 'routes': report}, f, indent=2)
+    if report['ALL']['database_locked']:
+        print(f"❌ {report['ALL']['database_locked']} requests failed with '{LOCKED}'")
+    return 1 if report['ALL']['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""
+Timing suite for Expense Tracker
+Times model calls and routes at several data sizes on seeded temporary
+databases, writes the results as JSON and flags regressions against a baseline.
+Also fails when CSV import throughput drops below --min-import-rate rows/s.
+
+Usage: python -m benchmarks --sizes 1000,10000,50000 --output results.json
+       python -m benchmarks --compare baseline.json   (exit status 1 on regression)
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+
+def time_call(func, repeat=20, warmup=2):
+    """Run func warmup + repeat times; returns latency statistics in milliseconds"""
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        'runs': repeat,
+        'median_ms': round(statistics.median(timings), 4),
+        'mean_ms': round(statistics.fmean(timings), 4),
+        'min_ms': round(timings[0], 4),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 4),
+    }
+
+
+def logged_in_client(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+def get_ok(client, path):
+    def call():
+        response = client.get(path)
+        if response.status_code != 200:
+            raise RuntimeError(f'GET {path} returned {response.status_code}')
+    return call
+
+
+def run_size(workdir, expenses, users=5, seed=42, repeat=20):
+    """Benchmark one data size (expenses per user); returns {benchmark: stats}"""
+    import analytics_engine
+    import auth_models
+    from app import analytics_cache, app, calculate_analytics
+    from benchmarks.datagen import create_database
+    from models import Expense
+
+    user_id = create_database(os.path.join(workdir, f'bench-{expenses}.db'), users, expenses, seed)[0]
+    auth_models._user_cache.clear()
+    analytics_cache.backend.clear()
+    client = logged_in_client(app, user_id)
+    rows = Expense.get_all(user_id=user_id)
+    doomed = [Expense(12.5, 'Other', '2025-06-01', 'Benchmark').save(user_id) for _ in range(repeat + 2)]
+
+    benchmarks = {
+        'Expense.get_all': lambda: Expense.get_all(user_id=user_id),
+        'calculate_analytics': lambda: calculate_analytics(rows),
+        'Expense.get_analytics': lambda: Expense.get_analytics(user_id),
+        'Expense.get_page': lambda: Expense.get_page(user_id),
+        'Expense.save': lambda: Expense(12.5, 'Food & Dining', '2025-06-01', 'Benchmark').save(user_id),
+        'Expense.delete': lambda: Expense.delete(doomed.pop()),
+        'GET /': get_ok(client, '/'),
+        'GET /api/expenses': get_ok(client, '/api/expenses'),
+        'GET /api/analytics': get_ok(client, '/api/analytics'),
+        'GET /analytics': get_ok(client, '/analytics'),
+    }
+    if analytics_engine.available():
+        columns = analytics_engine.load_columns(user_id)
+        benchmarks['analytics_engine.load_columns'] = lambda: analytics_engine.load_columns(user_id)
+        benchmarks['analytics_engine.compute'] = lambda: analytics_engine.compute(columns)
+    return {name: time_call(func, repeat) for name, func in benchmarks.items()}
+
+
+def import_throughput(workdir, rows=50000, repeat=3, seed=42):
+    """Best rate (rows/s) of repeat CSV imports of rows generated expenses, each into an empty database"""
+    import random
+
+    from benchmarks.datagen import create_database, generate_expenses
+    from importer import import_csv
+    from money import format_amount
+
+    lines = ['amount,category,date,description'] + [
+        f'{format_amount(amount_minor)},{category},{date},{description}'
+        for amount_minor, category, date, description in generate_expenses(random.Random(seed), rows)]
+    rates = []
+    for run in range(repeat):
+        user_id = create_database(os.path.join(workdir, f'import-{run}.db'), users=1, expenses_per_user=0)[0]
+        started = time.perf_counter()
+        report = import_csv(lines, user_id)
+        rates.append(report['imported'] / (time.perf_counter() - started))
+    return round(max(rates))
+
+
+def compare(results, baseline, tolerance=0.2, min_delta_ms=0.05):
+    """Compare medians with a baseline; returns (rows, regressions)
+
+    A benchmark regresses when its median grows by more than tolerance (a
+    fraction) and by at least min_delta_ms, so microsecond noise is ignored.
+    """
+    rows = []
+    regressions = []
+    for size, benchmarks in results['results'].items():
+        for name, stats in benchmarks.items():
+            before = baseline.get('results', {}).get(size, {}).get(name)
+            if before is None:
+                continue
+            ratio = stats['median_ms'] / before['median_ms'] if before['median_ms'] else float('inf')
+            row = {'size': size, 'benchmark': name, 'baseline_ms': before['median_ms'],
+                   'current_ms': stats['median_ms'], 'ratio': round(ratio, 3)}
+            rows.append(row)
+            if ratio > 1 + tolerance and stats['median_ms'] - before['median_ms'] >= min_delta_ms:
+                regressions.append(row)
+    return rows, regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the Expense Tracker benchmark suite')
+    parser.add_argument('--sizes', default='1000,10000,50000', help='Comma-separated expenses per user')
+    parser.add_argument('--users', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=20, help='Timed runs per benchmark')
+    parser.add_argument('--output', help='Write results JSON here (use it later as a baseline)')
+    parser.add_argument('--compare', help='Baseline results JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed slowdown, 0.2 = 20%%')
+    parser.add_argument('--min-import-rate', type=int, default=50000,
+                        help='Required CSV import throughput in rows/s (0 skips the check)')
+    args = parser.parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    workdir = tempfile.mkdtemp(prefix='expense-bench-')
+    # The app sets up its database at import time: keep it, and its logs, out of the working copy
+    os.environ['DATABASE_PATH'] = os.path.join(workdir, 'app.db')
+    os.environ.setdefault('HASH_WORKERS', '0')
+    os.environ.setdefault('METRICS_DIR', '')
+
+    results = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'users': args.users,
+            'seed': args.seed,
+            'repeat': args.repeat,
+        },
+        'results': {},
+    }
+    for size in sizes:
+        print(f"⏱️  {args.users} users x {size} expenses...")
+        results['results'][str(size)] = run_size(workdir, size, args.users, args.seed, args.repeat)
+        for name, stats in results['results'][str(size)].items():
+            print(f"   {name:<30} median {stats['median_ms']:>9.3f} ms   p95 {stats['p95_ms']:>9.3f} ms")
+
+    failed = False
+    if args.min_import_rate:
+        results['import_rows_per_second'] = import_throughput(workdir, seed=args.seed)
+        rate = results['import_rows_per_second']
+        if rate < args.min_import_rate:
+            print(f"❌ CSV import {rate:,} rows/s, below the required {args.min_import_rate:,}")
+            failed = True
+        else:
+            print(f"✅ CSV import {rate:,} rows/s")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for key in ('users', 'seed', 'sqlite', 'python'):
+            if baseline.get('meta', {}).get(key) != results['meta'][key]:
+                print(f"⚠️  Baseline differs in {key}: {baseline.get('meta', {}).get(key)} vs {results['meta'][key]}")
+        rows, regressions = compare(results, baseline, args.tolerance)
+        for row in rows:
+            flag = '❌' if row in regressions else '  '
+            print(f"{flag} {row['size']:>7} {row['benchmark']:<30} {row['baseline_ms']:>9.3f} -> "
+                  f"{row['current_ms']:>9.3f} ms  x{row['ratio']}")
+        if regressions:
+            print(f"❌ {len(regressions)} benchmark(s) slower than baseline by more than {args.tolerance:.0%}")
+            return 1
+        print("✅ No regressions against baseline")
+    return 1 if failed else 0
@@ -0,0 +1,170 @@
+"""
+Result caching for Expense Tracker
+Bounded LRU/TTL backends plus a cache whose entries are tagged with the
+per-user data version, so a write anywhere invalidates exactly that user
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryBackend:
+    """In-process LRU cache with TTL expiry (private to one worker)"""
+
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FileBackend:
+    """LRU/TTL cache stored as JSON files in a directory shared by all workers
+
+    Point it at a tmpfs such as /dev/shm to keep entries in shared memory.
+    Access time is tracked through file mtimes; values must be JSON-serializable.
+    """
+
+    def __init__(self, directory, max_entries=1024, ttl=300):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, f'{digest}.json')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry['expires_at'] < time.time():
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry['value']
+
+    def set(self, key, value):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'expires_at': time.time() + self.ttl, 'value': value}, f)
+        os.replace(tmp_path, self._path(key))
+        self._evict()
+
+    def _evict(self):
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith('.json')]
+        except OSError:
+            return
+        excess = len(entries) - self.max_entries
+        if excess > 0:
+            entries.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in entries[:excess]:
+                self._remove(entry.path)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def delete(self, key):
+        self._remove(self._path(key))
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json'):
+                self._remove(entry.path)
+
+    def __len__(self):
+        return sum(1 for entry in os.scandir(self.directory) if entry.name.endswith('.json'))
+
+
+class VersionedCache:
+    """Cache whose entries are valid only for the data version they were computed at"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, version, compute):
+        entry = self.backend.get(key)
+        if entry is not None and entry['version'] == version:
+            with self._lock:
+                self.hits += 1
+            return entry['value']
+
+        with self._lock:
+            self.misses += 1
+        value = compute()
+        self.backend.set(key, {'version': version, 'value': value})
+        return value
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': type(self.backend).__name__,
+                'entries': len(self.backend),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def make_backend(app_config):
+    """Build the backend selected by CACHE_BACKEND ('memory' or 'file')"""
+    max_entries = app_config.get('CACHE_MAX_ENTRIES', 1024)
+    ttl = app_config.get('CACHE_TTL', 300)
+    if app_config.get('CACHE_BACKEND', 'memory') == 'file':
+        return FileBackend(app_config['CACHE_DIR'], max_entries, ttl)
+    return MemoryBackend(max_entries, ttl)
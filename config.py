@@ -4,6 +4,7 @@ Simple version without dotenv dependency
 """
 
 import os
+import tempfile
 
 class Config:
     """Base configuration class"""
@@ -14,6 +15,72 @@ class Config:
     
     # Application settings
     PORT = int(os.environ.get('PORT', 5000))
+    EXPENSES_PAGE_SIZE = int(os.environ.get('EXPENSES_PAGE_SIZE', 50))
+    EXPENSES_MAX_PAGE_SIZE = 500
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 500))
+    IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 20000))  # rows per transaction
+    BATCH_MAX_OPERATIONS = int(os.environ.get('BATCH_MAX_OPERATIONS', 500))  # per /api/expenses/batch call
+    TIMESERIES_MAX_POINTS = int(os.environ.get('TIMESERIES_MAX_POINTS', 366))  # per /api/analytics/timeseries series
+    TOMBSTONE_RETENTION_DAYS = int(os.environ.get('TOMBSTONE_RETENTION_DAYS', 30))  # deletes kept for delta sync
+    TOMBSTONE_PRUNE_INTERVAL = float(os.environ.get('TOMBSTONE_PRUNE_INTERVAL', 3600))  # seconds, per worker
+    
+    # SQLite storage, applied to every new connection
+    DATABASE_PATH = os.environ.get('DATABASE_PATH', 'expense_tracker.db')
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE', -16000))  # negative = KiB
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 128 * 1024 * 1024))
+    SQLITE_TEMP_STORE = os.environ.get('SQLITE_TEMP_STORE', 'MEMORY')
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))  # milliseconds
+    
+    # Result cache: 'memory' is per worker, 'file' is shared by every worker on the box
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+    CACHE_DIR = os.environ.get('CACHE_DIR', os.path.join(
+        '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'expense-tracker-cache'))
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+    CACHE_TTL = int(os.environ.get('CACHE_TTL', 300))  # seconds
+    
+    # Logged-in user lookups cached per worker
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 4096))
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))  # seconds
+    
+    # Password hashing process pool (per worker process); 0 workers hashes inline
+    HASH_WORKERS = int(os.environ.get('HASH_WORKERS', 2))
+    HASH_MAX_PENDING = int(os.environ.get('HASH_MAX_PENDING', 8))
+    HASH_TIMEOUT = float(os.environ.get('HASH_TIMEOUT', 10))  # seconds
+    
+    # Database threads used by the ASGI entry point (asgi.py)
+    ASYNC_DB_THREADS = int(os.environ.get('ASYNC_DB_THREADS', 4))
+    
+    # Group commit: queue writes and commit them together (opt-in)
+    WRITE_BATCHING = os.environ.get('WRITE_BATCHING', 'false').lower() in ('1', 'true', 'yes')
+    WRITE_BATCH_MAX_SIZE = int(os.environ.get('WRITE_BATCH_MAX_SIZE', 64))
+    WRITE_BATCH_MAX_DELAY_MS = float(os.environ.get('WRITE_BATCH_MAX_DELAY_MS', 1))
+    WRITE_BATCH_TIMEOUT = float(os.environ.get('WRITE_BATCH_TIMEOUT', 30))  # seconds a request waits for its batch
+    
+    # Request profiling: per-request timings, Server-Timing headers and /debug/profile
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN')  # /debug/profile is hidden without it
+    PROFILE_SAMPLE_EVERY = int(os.environ.get('PROFILE_SAMPLE_EVERY', 0))  # cProfile every Nth request, 0 = off
+    PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+    
+    # Prometheus metrics at /metrics (opt-in: the endpoint is unauthenticated, expose it only to the scraper);
+    # workers share snapshots through METRICS_DIR ('' = this worker only)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(
+        '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'expense-tracker-metrics'))
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1))  # seconds
+    
+    # Slow-query log: statements over SLOW_QUERY_MS with their plans (off unless a path is set)
+    SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG', '')
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+    SLOW_QUERY_LOG_MAX_BYTES = int(os.environ.get('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024))
+    SLOW_QUERY_LOG_BACKUPS = int(os.environ.get('SLOW_QUERY_LOG_BACKUPS', 5))
+    
+    # Database connection pool (per worker process)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+    DB_POOL_HEALTH_CHECK_INTERVAL = float(os.environ.get('DB_POOL_HEALTH_CHECK_INTERVAL', 30))
     
     @staticmethod
     def init_app(app):
@@ -28,6 +95,21 @@ class ProductionConfig(Config):
 class TestingConfig(Config):
     TESTING = True
 
+def storage_settings(source=Config):
+    """Database path and PRAGMAs from a config class or a Flask app.config"""
+    get = source.get if isinstance(source, dict) else lambda key: getattr(source, key)
+    return {
+        'database': get('DATABASE_PATH'),
+        'pragmas': [
+            ('busy_timeout', get('SQLITE_BUSY_TIMEOUT')),
+            ('journal_mode', get('SQLITE_JOURNAL_MODE')),
+            ('synchronous', get('SQLITE_SYNCHRONOUS')),
+            ('cache_size', get('SQLITE_CACHE_SIZE')),
+            ('mmap_size', get('SQLITE_MMAP_SIZE')),
+            ('temp_store', get('SQLITE_TEMP_STORE')),
+        ],
+    }
+
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
@@ -1,39 +1,38 @@
-import sqlite3
+import db_pool
 
 def get_db_connection():
-    connection = sqlite3.connect('expense_tracker.db')
-    connection.row_factory = sqlite3.Row
-    return connection
+    return db_pool.get_connection()
+
+def get_dedicated_connection():
+    """Connection not tied to the current request, for work that outlives it
+    (such as a streamed response); the caller must close() it"""
+    return db_pool.get_pool().connection()
+
+def get_read_only_connection():
+    """Read-only connection outside the pool, for streamed responses that may
+    outlive the request without tying up a pooled connection; the caller must close() it"""
+    return db_pool.get_pool().read_only_connection()
 
 def init_database():
+    from migrations import migrate
     connection = get_db_connection()
-    cursor = connection.cursor()
-    cursor.execute('''CREATE TABLE IF NOT EXISTS expenses (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        amount REAL NOT NULL,
-        category TEXT NOT NULL,
-        date TEXT NOT NULL,
-        description TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_date ON expenses(date)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_category ON expenses(category)")
-    connection.commit()
-    cursor.close()
+    migrate(connection)
     connection.close()
     print("Database initialized!")
 
-def test_connection():
+def test_connection(verbose=True):
     try:
         connection = get_db_connection()
         cursor = connection.cursor()
         cursor.execute("SELECT 1")
         cursor.close()
         connection.close()
-        print("Connection successful!")
+        if verbose:
+            print("Connection successful!")
         return True
     except Exception as e:
-        print(f"Connection failed: {e}")
+        if verbose:
+            print(f"Connection failed: {e}")
         return False
 
 if __name__ == "__main__":
@@ -0,0 +1,375 @@
+"""
+SQLite connection pool for Expense Tracker
+Keeps long-lived connections per worker process and checks one out per request
+"""
+
+import os
+import pathlib
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+
+from flask import g, has_app_context
+
+from config import Config, storage_settings
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the pool timeout"""
+
+
+def calling_function():
+    """module.qualname of the first frame outside this module, i.e. the code issuing the statement"""
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_globals.get('__name__') == __name__:
+        frame = frame.f_back
+    if frame is None:
+        return None
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class InstrumentedCursor:
+    """Cursor wrapper that times each statement, including fetching its rows,
+    and reports it to the query listeners once it is finished"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._statement = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    @property
+    def row_factory(self):
+        return self._cursor.row_factory
+
+    @row_factory.setter
+    def row_factory(self, row_factory):
+        self._cursor.row_factory = row_factory
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def _timed(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            if self._statement is not None:
+                self._statement[2] += time.perf_counter() - started
+
+    def _finish(self):
+        statement, self._statement = self._statement, None
+        if statement is not None:
+            for listener in list(_query_listeners):
+                listener(*statement)
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        # The caller is looked up now: by the time the statement is reported
+        # (on the next execute or close) the stack may belong to another function
+        self._statement = [sql, parameters, 0.0, calling_function()]
+        self._timed(self._cursor.execute, sql, parameters)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        seq_of_parameters = list(seq_of_parameters)
+        self._statement = [sql, seq_of_parameters, 0.0, calling_function()]
+        self._timed(self._cursor.executemany, sql, seq_of_parameters)
+        self._finish()
+        return self
+
+    def fetchone(self):
+        row = self._timed(self._cursor.fetchone)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(self._cursor.fetchmany, *(() if size is None else (size,)))
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(self._cursor.fetchall)
+        self._finish()
+        return rows
+
+    def close(self):
+        self._finish()
+        self._cursor.close()
+
+    def __del__(self):
+        self._finish()
+
+
+class PooledConnection:
+    """Checked-out connection that goes back to the pool instead of closing.
+
+    Connections checked out for a Flask app context ignore close(); they are
+    released once when the context is torn down.
+    """
+
+    def __init__(self, pool, connection, release_on_close=True):
+        self._pool = pool
+        self._connection = connection
+        self._release_on_close = release_on_close
+
+    def __getattr__(self, name):
+        connection = self.__dict__.get('_connection')
+        if connection is None:
+            raise sqlite3.ProgrammingError('Cannot operate on a released connection.')
+        return getattr(connection, name)
+
+    def cursor(self, *args):
+        cursor = self.__getattr__('cursor')(*args)
+        return InstrumentedCursor(cursor) if _query_listeners else cursor
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        """Return the connection to the pool (no-op for request-scoped connections)"""
+        if self._release_on_close:
+            self.release()
+
+    def release(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            self._pool.release(connection)
+
+
+class DedicatedConnection(PooledConnection):
+    """Connection opened outside the pool; close() closes it"""
+
+    def __init__(self, connection):
+        super().__init__(None, connection)
+
+    def release(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            connection.close()
+
+
+class ConnectionPool:
+    """Thread-safe pool of SQLite connections, reset after a worker fork"""
+
+    def __init__(self, database=Config.DATABASE_PATH, pragmas=(), size=5, timeout=10.0,
+                 health_check_interval=30.0):
+        self.database = database
+        self.pragmas = list(pragmas)
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._lock = threading.Condition()
+        self._reset()
+
+    def _reset(self):
+        # Connections inherited from a parent process are never touched again;
+        # sqlite3 handles must not be shared across a fork.
+        self._pid = os.getpid()
+        self._idle = deque()
+        self._last_used = {}
+        self._open = 0
+        self._in_use = 0
+        self._created_total = 0
+        self._discarded_total = 0
+
+    def _connect(self):
+        connection = sqlite3.connect(self.database, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        for name, value in self.pragmas:
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def read_only_connection(self):
+        """Open a read-only connection that does not count against the pool size
+
+        For readers that may outlive a request, such as a streamed export held
+        open by a slow client; the caller must close() it.
+        """
+        uri = pathlib.Path(self.database).resolve().as_uri() + '?mode=ro'
+        connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        for name, value in self.pragmas:
+            if name != 'journal_mode':  # set by the writers; a reader may not change it
+                connection.execute(f'PRAGMA {name} = {value}')
+        return DedicatedConnection(connection)
+
+    def _is_healthy(self, connection):
+        idle_for = time.monotonic() - self._last_used.get(id(connection), 0)
+        if idle_for < self.health_check_interval:
+            return True
+        try:
+            connection.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self):
+        """Check out a raw connection, opening a new one if the pool has room"""
+        deadline = time.monotonic() + self.timeout
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            while True:
+                if self._idle:
+                    connection = self._idle.pop()
+                    if self._is_healthy(connection):
+                        self._in_use += 1
+                        return connection
+                    self._discard(connection)
+                    continue
+                if self._open < self.size:
+                    self._open += 1
+                    self._in_use += 1
+                    self._created_total += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(
+                        f'No database connection available after {self.timeout}s '
+                        f'(pool size {self.size})')
+                self._lock.wait(remaining)
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self._open -= 1
+                self._in_use -= 1
+                self._lock.notify()
+            raise
+
+    def release(self, connection):
+        """Return a connection to the pool, rolling back any open transaction"""
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            self._in_use -= 1
+            try:
+                if connection.in_transaction:
+                    connection.rollback()
+            except sqlite3.Error:
+                self._discard(connection)
+            else:
+                self._last_used[id(connection)] = time.monotonic()
+                self._idle.append(connection)
+            self._lock.notify()
+
+    def _discard(self, connection):
+        self._open -= 1
+        self._discarded_total += 1
+        self._last_used.pop(id(connection), None)
+        try:
+            connection.close()
+        except sqlite3.Error:
+            pass
+
+    def connection(self, release_on_close=True):
+        return PooledConnection(self, self.acquire(), release_on_close)
+
+    def close_all(self):
+        """Close idle connections; checked-out ones are closed when released"""
+        with self._lock:
+            while self._idle:
+                self._discard(self._idle.pop())
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self.size,
+                'open': self._open,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'created_total': self._created_total,
+                'discarded_total': self._discarded_total,
+            }
+
+
+_query_listeners = []
+
+
+def add_query_listener(listener):
+    """Call listener(sql, parameters, seconds, caller) after every statement on pooled connections
+
+    caller is the module.qualname of the function that issued the statement.
+
+    Without listeners, cursors are plain sqlite3 cursors and cost nothing extra.
+    """
+    if listener not in _query_listeners:
+        _query_listeners.append(listener)
+
+
+def remove_query_listener(listener):
+    if listener in _query_listeners:
+        _query_listeners.remove(listener)
+
+
+_pool = None
+_pool_settings = dict(storage_settings(Config))
+_pool_lock = threading.Lock()
+
+
+def configure_pool(**settings):
+    """Replace the process-wide pool with one built from the given settings"""
+    global _pool
+    with _pool_lock:
+        _pool_settings.update(settings)
+        old_pool, _pool = _pool, None
+    if old_pool is not None:
+        old_pool.close_all()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(**_pool_settings)
+    return _pool
+
+
+def get_connection():
+    """Get a connection; inside a Flask app context it is shared for the request"""
+    if not has_app_context():
+        return get_pool().connection()
+    connection = g.get('_db_connection')
+    if connection is None:
+        connection = get_pool().connection(release_on_close=False)
+        g._db_connection = connection
+    return connection
+
+
+def release_request_connection(exception=None):
+    connection = g.pop('_db_connection', None)
+    if connection is not None:
+        connection.release()
+
+
+def init_app(app):
+    """Configure the pool from app.config and release connections on teardown"""
+    configure_pool(
+        **storage_settings(app.config),
+        size=app.config.get('DB_POOL_SIZE', 5),
+        timeout=app.config.get('DB_POOL_TIMEOUT', 10.0),
+        health_check_interval=app.config.get('DB_POOL_HEALTH_CHECK_INTERVAL', 30.0),
+    )
+    app.teardown_appcontext(release_request_connection)
+
+
+def _reset_after_fork():
+    global _pool
+    _pool = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,124 @@
+"""
+Password hashing off the request thread for Expense Tracker
+Hashes run in a small process pool with a cap on queued work, so a burst
+of logins is turned away early instead of starving normal page views
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from werkzeug import security
+
+from config import Config
+
+
+class HashingOverloaded(Exception):
+    """Raised when the hashing pool is saturated; retry after retry_after seconds"""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class HashingPool:
+    """Process pool for password hashing with admission control and latency stats
+
+    workers=0 hashes inline on the calling thread but keeps the same limits.
+    """
+
+    def __init__(self, workers=2, max_pending=8, timeout=10.0):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_seconds = 0.0
+        self._max_seconds = 0.0
+
+    def _get_executor(self):
+        # A forked gunicorn worker must not reuse its parent's pool processes
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def run(self, func, *args):
+        """Run func(*args) in the pool, or raise HashingOverloaded if the queue is full"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise HashingOverloaded('Too many password operations in progress')
+
+        started = time.perf_counter()
+        with self._lock:
+            self._in_flight += 1
+        if not self.workers:
+            try:
+                return func(*args)
+            finally:
+                self._release(started)
+
+        try:
+            future = self._get_executor().submit(func, *args)
+        except Exception:
+            self._release(started)
+            raise
+        # The slot is freed when the work really ends: a hash that timed out
+        # keeps its worker process busy, so it still counts against max_pending
+        future.add_done_callback(lambda _: self._release(started))
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise HashingOverloaded('Password hashing timed out', retry_after=int(self.timeout))
+
+    def _release(self, started):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+            self._total_seconds += elapsed
+            self._max_seconds = max(self._max_seconds, elapsed)
+        self._slots.release()
+
+    def generate_password_hash(self, password):
+        return self.run(security.generate_password_hash, password)
+
+    def check_password_hash(self, password_hash, password):
+        return self.run(security.check_password_hash, password_hash, password)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'in_flight': self._in_flight,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'total_seconds': round(self._total_seconds, 6),
+                'max_seconds': round(self._max_seconds, 6),
+                'avg_seconds': round(self._total_seconds / self._completed, 6) if self._completed else 0.0,
+            }
+
+
+hashing_pool = HashingPool(workers=Config.HASH_WORKERS,
+                           max_pending=Config.HASH_MAX_PENDING,
+                           timeout=Config.HASH_TIMEOUT)
+
+
+def generate_password_hash(password):
+    return hashing_pool.generate_password_hash(password)
+
+
+def check_password_hash(password_hash, password):
+    return hashing_pool.check_password_hash(password_hash, password)
@@ -0,0 +1,155 @@
+"""
+Bulk CSV import for Expense Tracker
+Streams a CSV file, validates each row and inserts valid rows with
+executemany in chunked transactions, reporting errors per row
+
+CSV columns: amount, category, date (YYYY-MM-DD), description (optional)
+Usage: python importer.py expenses.csv --user-id 1
+"""
+
+import argparse
+import csv
+import sys
+import time
+from datetime import date as Date
+
+from config import Config
+from database_sqlite import get_db_connection
+from models import CATEGORIES, bump_data_version, next_change_seq
+from money import to_minor
+from rollups import RollupDelta
+
+REQUIRED_COLUMNS = ('amount', 'category', 'date')
+VALID_CATEGORIES = frozenset(CATEGORIES)
+
+
+def parse_row(row, columns):
+    """Validate one CSV row; returns (amount_minor, category, date, description) or raises ValueError"""
+    try:
+        raw_amount = row[columns['amount']].strip()
+        category = row[columns['category']].strip()
+        date = row[columns['date']].strip()
+    except IndexError:
+        raise ValueError('Missing required columns')
+    description_column = columns.get('description')
+    description = ''
+    if description_column is not None and description_column < len(row):
+        description = row[description_column].strip()
+
+    amount = to_minor(raw_amount)
+    if amount < 0:
+        raise ValueError(f'Invalid amount {raw_amount!r}')
+    if category not in VALID_CATEGORIES:
+        raise ValueError(f'Unknown category {category!r}')
+    if len(date) != 10:
+        raise ValueError(f'Invalid date {date!r}, expected YYYY-MM-DD')
+    try:
+        Date.fromisoformat(date)
+    except ValueError:
+        raise ValueError(f'Invalid date {date!r}, expected YYYY-MM-DD')
+    return amount, category, date, description
+
+
+def _insert_chunk(connection, user_id, rows):
+    delta = RollupDelta()
+    for amount, category, date, _ in rows:
+        delta.add(user_id, category, date, amount)
+
+    # Inserting in index order keeps the date-leading index pages hot
+    rows = sorted(rows, key=lambda row: (row[2], row[1]))
+
+    cursor = connection.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        change_seq = next_change_seq(cursor, user_id)
+        # The write lock is held, so every id past the current maximum is this chunk's
+        cursor.execute('SELECT coalesce(max(id), 0) FROM expenses')
+        last_id = cursor.fetchone()[0]
+        # Skip the per-row search index trigger and index the chunk in one statement
+        cursor.execute('INSERT INTO expenses_fts_deferred DEFAULT VALUES')
+        cursor.executemany(
+            'INSERT INTO expenses (user_id, amount_minor, category, date, description, change_seq) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            [(user_id, *row, change_seq) for row in rows])
+        cursor.execute('DELETE FROM expenses_fts_deferred')
+        cursor.execute(
+            'INSERT INTO expenses_fts (rowid, description, category, user_id) '
+            'SELECT id, description, category, user_id FROM expenses WHERE id > ?', (last_id,))
+        delta.apply(cursor)
+        bump_data_version(cursor, user_id)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def import_csv(lines, user_id, chunk_size=Config.IMPORT_CHUNK_SIZE, max_errors=1000):
+    """Import expenses for a user from an iterable of CSV lines
+
+    Valid rows are committed chunk_size at a time; invalid rows are skipped
+    and reported. Returns {'imported', 'failed', 'errors'} where errors lists
+    at most max_errors {'row', 'error'} entries (row 1 is the header).
+    """
+    reader = csv.reader(lines)
+    try:
+        header = next(reader)
+    except StopIteration:
+        raise ValueError('CSV file is empty')
+    columns = {name.strip().lower(): index for index, name in enumerate(header)}
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise ValueError(f"CSV file is missing columns: {', '.join(missing)}")
+
+    imported = 0
+    failed = 0
+    errors = []
+    chunk = []
+    connection = get_db_connection()
+    try:
+        for row_number, row in enumerate(reader, start=2):
+            if not row:
+                continue
+            try:
+                chunk.append(parse_row(row, columns))
+            except ValueError as e:
+                failed += 1
+                if len(errors) < max_errors:
+                    errors.append({'row': row_number, 'error': str(e)})
+                continue
+            if len(chunk) >= chunk_size:
+                _insert_chunk(connection, user_id, chunk)
+                imported += len(chunk)
+                chunk = []
+        if chunk:
+            _insert_chunk(connection, user_id, chunk)
+            imported += len(chunk)
+    finally:
+        connection.close()
+
+    return {'imported': imported, 'failed': failed, 'errors': errors}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Import expenses from a CSV file')
+    parser.add_argument('path', help='CSV file with amount, category, date[, description] columns')
+    parser.add_argument('--user-id', type=int, required=True, help='Owner of the imported expenses')
+    parser.add_argument('--chunk-size', type=int, default=Config.IMPORT_CHUNK_SIZE, help='Rows per transaction')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    with open(args.path, newline='', encoding='utf-8-sig') as f:
+        report = import_csv(f, args.user_id, chunk_size=args.chunk_size)
+    elapsed = time.perf_counter() - started
+
+    for error in report['errors']:
+        print(f"❌ Row {error['row']}: {error['error']}")
+    rate = report['imported'] / elapsed if elapsed else 0
+    print(f"✅ Imported {report['imported']} expenses ({report['failed']} failed) "
+          f"in {elapsed:.2f}s - {rate:,.0f} rows/s")
+    return 1 if report['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,395 @@
+"""
+Prometheus metrics for Expense Tracker
+Request and SQL latency histograms plus pool, cache and hashing counters,
+served at /metrics in the text exposition format and summed across workers
+
+Each worker writes a snapshot of its metrics to METRICS_DIR at most every
+METRICS_FLUSH_INTERVAL seconds (and whenever it answers a scrape), so any
+worker can report for all of its siblings. Counters and histograms of
+workers that exited are folded into one retired snapshot per master and their
+files deleted; gauges are reported per live worker (pid label).
+"""
+
+import bisect
+import fcntl
+import json
+import os
+import threading
+import time
+
+from flask import Blueprint, Response, g, request
+
+import db_pool
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+               for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+class Counter:
+    """Monotonic count per label combination"""
+
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [('', dict(zip(self.labelnames, labels)), value) for labels, value in self._values.items()]
+
+
+class Histogram:
+    """Bucketed observations (e.g. latencies in seconds) per label combination"""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=REQUEST_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = [(labels, list(counts), total, count)
+                      for labels, (counts, total, count) in self._values.items()]
+        samples = []
+        for labels, counts, total, count in values:
+            labels = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                samples.append(('_bucket', {**labels, 'le': format_value(bound)}, cumulative))
+            samples.append(('_sum', labels, total))
+            samples.append(('_count', labels, count))
+        return samples
+
+
+class Collected:
+    """Counter or gauge whose samples are read from live objects at snapshot time"""
+
+    def __init__(self, name, documentation, type, collect):
+        self.name = name
+        self.documentation = documentation
+        self.type = type
+        self.collect = collect
+
+    def samples(self):
+        return [('', labels, value) for labels, value in self.collect()]
+
+
+class Registry:
+    """The metrics of one process"""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def collect(self, name, documentation, type='gauge'):
+        """Decorator registering a function that returns [(labels, value), ...]"""
+        def register(func):
+            self.register(Collected(name, documentation, type, func))
+            return func
+        return register
+
+    def snapshot(self):
+        return {
+            metric.name: {'type': metric.type, 'help': metric.documentation, 'samples': metric.samples()}
+            for metric in self.metrics.values()
+        }
+
+
+def merge_snapshots(snapshots):
+    """Combine {pid: snapshot}: counters and histograms are summed, gauges gain a pid label"""
+    merged = {}
+    for pid, snapshot in sorted(snapshots.items()):
+        for name, family in snapshot.items():
+            target = merged.setdefault(name, {'type': family['type'], 'help': family['help'], 'samples': {}})
+            for suffix, labels, value in family['samples']:
+                if family['type'] == 'gauge':
+                    labels = {**labels, 'pid': str(pid)}
+                key = (suffix, tuple(labels.items()))
+                target['samples'][key] = target['samples'].get(key, 0) + value
+    return merged
+
+
+def render(merged):
+    """Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    for name, family in merged.items():
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for (suffix, labels), value in family['samples'].items():
+            lines.append(f'{name}{suffix}{format_labels(dict(labels))} {format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SnapshotStore:
+    """Worker snapshot files named <parent pid>-<pid>.json, so that only siblings
+    under the same gunicorn master are summed; files of dead masters are removed.
+    Exited workers' totals move into <parent pid>-retired.json, so sums never
+    go backwards while the directory holds one file per live worker."""
+
+    def __init__(self, directory, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def flush(self, registry, force=False):
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_flush < self.flush_interval:
+                return
+            self._last_flush = now
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f'{os.getppid()}-{os.getpid()}.json')
+            with open(path + '.tmp', 'w') as f:
+                json.dump(registry.snapshot(), f, separators=(',', ':'))
+            os.replace(path + '.tmp', path)
+
+    def load(self):
+        group = str(os.getppid())
+        snapshots = {}
+        exited = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.lock'):
+                parent, rest = entry.name[:-5], 'lock'
+            else:
+                parent, _, rest = entry.name.partition('-')
+                if not rest.endswith('.json'):
+                    continue
+            if not parent.isdigit():
+                continue
+            if parent != group:
+                if not _alive(int(parent)):
+                    self._remove(entry.path)
+                continue
+            if not rest[:-5].isdigit():  # the lock and retired files
+                continue
+            pid = int(rest[:-5])
+            if not _alive(pid):
+                exited.append(entry.path)
+                continue
+            snapshot = self._read(entry.path)
+            if snapshot is not None:
+                snapshots[pid] = snapshot
+        # pid 0 sorts first and carries no gauges, so it never shows up as a label
+        snapshots[0] = self._retire(group, exited)
+        return snapshots
+
+    def _retire(self, group, paths):
+        """Fold exited workers' counters and histograms into the retired snapshot; returns it"""
+        retired_path = os.path.join(self.directory, f'{group}-retired.json')
+        if not paths:
+            return self._read(retired_path) or {}
+        with open(os.path.join(self.directory, f'{group}.lock'), 'a') as lock:
+            # Siblings answering scrapes at the same time must not fold a file twice
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            snapshots = {0: self._read(retired_path) or {}}
+            for index, path in enumerate(paths, start=1):
+                snapshot = self._read(path)
+                if snapshot is None:  # already retired by a sibling
+                    continue
+                # Gauges and per-worker series end with their worker
+                snapshots[index] = {
+                    name: {**family, 'samples': [sample for sample in family['samples'] if 'pid' not in sample[1]]}
+                    for name, family in snapshot.items() if family['type'] != 'gauge'
+                }
+            retired = {
+                name: {'type': family['type'], 'help': family['help'],
+                       'samples': [(suffix, dict(labels), value)
+                                   for (suffix, labels), value in family['samples'].items()]}
+                for name, family in merge_snapshots(snapshots).items()
+            }
+            with open(retired_path + '.tmp', 'w') as f:
+                json.dump(retired, f, separators=(',', ':'))
+            os.replace(retired_path + '.tmp', retired_path)
+            for path in paths:
+                self._remove(path)
+        return retired
+
+    def _read(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+registry = Registry()
+http_requests = registry.register(Counter(
+    'expense_tracker_http_requests_total', 'HTTP requests by route, method and status',
+    ('route', 'method', 'status')))
+http_request_duration = registry.register(Histogram(
+    'expense_tracker_http_request_duration_seconds', 'HTTP request latency by route',
+    ('route', 'method'), REQUEST_BUCKETS))
+db_query_duration = registry.register(Histogram(
+    'expense_tracker_db_query_duration_seconds', 'SQL statement latency, including fetching rows',
+    (), QUERY_BUCKETS))
+worker_requests = registry.register(Counter(
+    'expense_tracker_worker_requests_total', 'HTTP requests handled by each worker process', ('pid',)))
+_store = None
+_started_at = time.time()
+
+
+@registry.collect('expense_tracker_process_start_time_seconds', 'Start time of the worker process')
+def _process_start():
+    return [({}, _started_at)]
+
+
+@registry.collect('expense_tracker_db_pool_connections', 'Pooled SQLite connections by state')
+def _pool_connections():
+    stats = db_pool.get_pool().stats()
+    return [({'state': state}, stats[state]) for state in ('open', 'in_use', 'idle')]
+
+
+@registry.collect('expense_tracker_db_pool_connections_created_total',
+                  'SQLite connections opened by the pool', 'counter')
+def _pool_created():
+    return [({}, db_pool.get_pool().stats()['created_total'])]
+
+
+@registry.collect('expense_tracker_password_hashes_total',
+                  'Password hash operations by outcome', 'counter')
+def _password_hashes():
+    from hashing import hashing_pool
+    stats = hashing_pool.stats()
+    return [({'outcome': 'completed'}, stats['completed']), ({'outcome': 'rejected'}, stats['rejected'])]
+
+
+@registry.collect('expense_tracker_write_batches_total', 'Group-commit batches and the writes in them', 'counter')
+def _write_batches():
+    from write_queue import get_writer
+    writer = get_writer()
+    if writer is None:
+        return []
+    stats = writer.stats()
+    return [({'kind': 'batches'}, stats['batches']), ({'kind': 'operations'}, stats['operations'])]
+
+
+_caches = {}
+
+
+def watch_cache(name, cache):
+    """Export hits, misses and size of a cache (anything with hits/misses and a sized backend)"""
+    _caches[name] = cache
+
+
+@registry.collect('expense_tracker_cache_lookups_total', 'Cache lookups by cache and result', 'counter')
+def _cache_lookups():
+    samples = []
+    for name, cache in _caches.items():
+        samples.append(({'cache': name, 'result': 'hit'}, cache.hits))
+        samples.append(({'cache': name, 'result': 'miss'}, cache.misses))
+    return samples
+
+
+@registry.collect('expense_tracker_cache_entries', 'Entries held by each cache')
+def _cache_entries():
+    return [({'cache': name}, len(getattr(cache, 'backend', cache))) for name, cache in _caches.items()]
+
+
+def _start_request():
+    g._metrics_started = time.perf_counter()
+
+
+def _finish_request(response):
+    started = g.pop('_metrics_started', None)
+    if started is None:
+        return response
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    http_request_duration.observe(time.perf_counter() - started, route, request.method)
+    http_requests.inc(route, request.method, str(response.status_code))
+    worker_requests.inc(str(os.getpid()))
+    if _store is not None:
+        _store.flush(registry)
+    return response
+
+
+def _on_query(sql, parameters, seconds, caller):
+    db_query_duration.observe(seconds)
+
+
+metrics = Blueprint('metrics', __name__)
+
+
+@metrics.route('/metrics')
+def metrics_endpoint():
+    """All workers' metrics in the Prometheus text format"""
+    if _store is not None:
+        _store.flush(registry, force=True)
+        merged = merge_snapshots(_store.load())
+    else:
+        merged = merge_snapshots({os.getpid(): registry.snapshot()})
+    return Response(render(merged), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    """Collect metrics for app and serve them at /metrics if METRICS_ENABLED is set"""
+    global _store
+    if not app.config.get('METRICS_ENABLED'):
+        return
+    if app.config.get('METRICS_DIR'):
+        _store = SnapshotStore(app.config['METRICS_DIR'], app.config.get('METRICS_FLUSH_INTERVAL', 1.0))
+    import auth_models
+    watch_cache('users', auth_models._user_cache)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    db_pool.add_query_listener(_on_query)
+    app.register_blueprint(metrics)
@@ -0,0 +1,286 @@
+"""
+Versioned schema migrations for Expense Tracker
+Each migration runs once, in order, and the applied version is kept in
+PRAGMA user_version so every worker can safely call migrate() at startup
+"""
+
+import sys
+
+from database_sqlite import get_db_connection
+from money import to_minor
+from rollups import ROLLUP_TABLES, create_rollup_tables, rebuild_rollups
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Register a schema migration; versions must be consecutive"""
+    def register(func):
+        assert version == len(MIGRATIONS) + 1, f'Migration {version} is out of order'
+        MIGRATIONS.append((version, description, func))
+        return func
+    return register
+
+
+@migration(1, 'Users and expenses tables')
+def create_base_schema(cursor):
+    # IF NOT EXISTS: databases created before migrations were tracked already have these
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS expenses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            amount REAL NOT NULL,
+            category TEXT NOT NULL,
+            date TEXT NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """)
+
+
+@migration(2, 'Per-user monthly and category rollups')
+def create_rollups(cursor):
+    if create_rollup_tables(cursor):
+        rebuild_rollups(cursor, amount='amount')
+
+
+@migration(3, 'Composite indexes for per-user access patterns')
+def create_composite_indexes(cursor):
+    # Expense.get_page / get_all(user_id): filter on user, walk newest first
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_date_created ON expenses(user_id, date, created_at, id)")
+    # Expense.get_all() / get_by_date_range(): date range and order across users
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_date_created ON expenses(date, created_at)")
+    # Prefixes of the composite indexes above
+    cursor.execute("DROP INDEX IF EXISTS idx_user_id")
+    cursor.execute("DROP INDEX IF EXISTS idx_date")
+    cursor.execute("ANALYZE")
+
+
+@migration(4, 'Per-user data version counters')
+def create_data_versions(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_data_versions (
+            user_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+@migration(5, 'Drop index made redundant by rollups')
+def drop_rollup_source_index(cursor):
+    # Development builds of migration 3 created this covering index; analytics
+    # reads the rollup tables, so it only slowed every insert
+    cursor.execute("DROP INDEX IF EXISTS idx_user_category_date")
+
+
+@migration(6, 'Change sequence and tombstones for delta sync')
+def create_change_tracking(cursor):
+    cursor.execute("ALTER TABLE expenses ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0")
+    # Existing rows count as changed at their owner's current data version
+    cursor.execute("""
+        INSERT INTO user_data_versions (user_id, version)
+        SELECT DISTINCT user_id, 1 FROM expenses WHERE true
+        ON CONFLICT (user_id) DO UPDATE SET version = max(version, 1)
+    """)
+    cursor.execute("""
+        UPDATE expenses SET change_seq =
+            (SELECT version FROM user_data_versions WHERE user_data_versions.user_id = expenses.user_id)
+    """)
+    # Expense.get_changes: one user's rows past a (change_seq, id) position
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_change_seq ON expenses(user_id, change_seq)")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS expense_tombstones (
+            user_id INTEGER NOT NULL,
+            change_seq INTEGER NOT NULL,
+            expense_id INTEGER NOT NULL,
+            deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, change_seq, expense_id)
+        ) WITHOUT ROWID
+    """)
+
+
+@migration(7, 'Full-text search over descriptions and categories')
+def create_search_index(cursor):
+    # External content: the index stores only tokens, rows stay in expenses.
+    # user_id is indexed too so a search intersects with one user's postings
+    # instead of filtering every user's matches.
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS expenses_fts USING fts5(
+            description, category, user_id,
+            content='expenses', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS expenses_fts_insert AFTER INSERT ON expenses BEGIN
+            INSERT INTO expenses_fts (rowid, description, category, user_id)
+            VALUES (new.id, new.description, new.category, new.user_id);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS expenses_fts_delete AFTER DELETE ON expenses BEGIN
+            INSERT INTO expenses_fts (expenses_fts, rowid, description, category, user_id)
+            VALUES ('delete', old.id, old.description, old.category, old.user_id);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS expenses_fts_update AFTER UPDATE OF description, category, user_id ON expenses BEGIN
+            INSERT INTO expenses_fts (expenses_fts, rowid, description, category, user_id)
+            VALUES ('delete', old.id, old.description, old.category, old.user_id);
+            INSERT INTO expenses_fts (rowid, description, category, user_id)
+            VALUES (new.id, new.description, new.category, new.user_id);
+        END
+    """)
+    cursor.execute("INSERT INTO expenses_fts (expenses_fts) VALUES ('rebuild')")
+
+
+@migration(8, 'Per-user daily rollup by category')
+def create_daily_rollup(cursor):
+    # Time series read at most one row per (day, category) instead of every expense
+    create_rollup_tables(cursor)
+    rebuild_rollups(cursor, tables=['expense_daily_rollup'], amount='amount')
+
+
+@migration(9, 'Amounts as integer minor units')
+def store_minor_units(cursor):
+    # SQLite cannot change a column type in place, so the table is rebuilt.
+    # Ids are copied, so search index rowids, cursors and sync tokens stay valid;
+    # the indexes and triggers are recreated from their own definitions.
+    cursor.execute("""
+        SELECT sql FROM sqlite_master
+        WHERE tbl_name = 'expenses' AND type IN ('index', 'trigger') AND sql IS NOT NULL
+    """)
+    definitions = [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'expenses'")
+    row = cursor.fetchone()
+    last_id = row[0] if row else 0
+
+    cursor.connection.create_function('to_minor', 1, to_minor, deterministic=True)
+    cursor.execute("""
+        CREATE TABLE expenses_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            amount_minor INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            date TEXT NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            change_seq INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO expenses_new
+            (id, user_id, amount_minor, category, date, description, created_at, updated_at, change_seq)
+        SELECT id, user_id, to_minor(amount), category, date, description, created_at, updated_at, change_seq
+        FROM expenses ORDER BY id
+    """)
+    cursor.execute("DROP TABLE expenses")
+    cursor.execute("ALTER TABLE expenses_new RENAME TO expenses")
+    # Ids of deleted rows must never come back: tombstones still refer to them
+    cursor.execute("UPDATE sqlite_sequence SET seq = max(seq, ?) WHERE name = 'expenses'", (last_id,))
+    if cursor.rowcount == 0 and last_id:
+        cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('expenses', ?)", (last_id,))
+    for definition in definitions:
+        cursor.execute(definition)
+
+    for table in ROLLUP_TABLES:
+        cursor.execute(f"DROP TABLE {table}")
+    create_rollup_tables(cursor)
+    rebuild_rollups(cursor)
+    cursor.execute("ANALYZE")
+
+
+@migration(10, 'Cheaper bulk imports')
+def speed_up_bulk_imports(cursor):
+    # Databases created before the migrations existed have this index.
+    # Nothing filters on category alone any more (rollups and search cover
+    # it), so it only slowed every insert
+    cursor.execute("DROP INDEX IF EXISTS idx_category")
+    # While a row exists here the insert trigger is skipped: the importer adds
+    # the row inside its transaction, then indexes the whole chunk with one
+    # INSERT ... SELECT, which is several times faster than a trigger per row
+    cursor.execute("CREATE TABLE IF NOT EXISTS expenses_fts_deferred (deferred INTEGER)")
+    cursor.execute("DROP TRIGGER IF EXISTS expenses_fts_insert")
+    cursor.execute("""
+        CREATE TRIGGER expenses_fts_insert AFTER INSERT ON expenses
+        WHEN NOT EXISTS (SELECT 1 FROM expenses_fts_deferred) BEGIN
+            INSERT INTO expenses_fts (rowid, description, category, user_id)
+            VALUES (new.id, new.description, new.category, new.user_id);
+        END
+    """)
+
+
+@migration(11, 'Tombstone retention horizon')
+def add_tombstone_horizon(cursor):
+    # Position (change_seq, expense_id) of the newest pruned tombstone; sync
+    # tokens from before it may have missed deletes, so get_changes refuses them
+    cursor.execute("ALTER TABLE user_data_versions ADD COLUMN pruned_seq INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("ALTER TABLE user_data_versions ADD COLUMN pruned_id INTEGER NOT NULL DEFAULT 0")
+
+
+def latest_version():
+    return MIGRATIONS[-1][0]
+
+
+def current_version(cursor):
+    cursor.execute("PRAGMA user_version")
+    return cursor.fetchone()[0]
+
+
+def migrate(connection, target=None):
+    """Apply pending migrations up to target; returns the resulting version"""
+    target = latest_version() if target is None else target
+    cursor = connection.cursor()
+    try:
+        for version, description, func in MIGRATIONS:
+            if version > target or version <= current_version(cursor):
+                continue
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                # Another worker may have applied it while we waited for the lock
+                if version > current_version(cursor):
+                    func(cursor)
+                    cursor.execute(f"PRAGMA user_version = {version}")
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+        return current_version(cursor)
+    finally:
+        cursor.close()
+
+
+def main(argv):
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    try:
+        if len(argv) > 1 and argv[1] == 'status':
+            version = current_version(cursor)
+            for number, description, _ in MIGRATIONS:
+                state = 'applied' if number <= version else 'pending'
+                print(f"{number:>3}  {state:<8} {description}")
+            return 0
+        version = migrate(connection)
+        print(f"✅ Database schema at version {version}")
+        return 0
+    finally:
+        cursor.close()
+        connection.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -3,38 +3,157 @@ Models module for Expense Tracker - SQLite Version
 Contains Expense class and database operations
 """
 
-from datetime import datetime
-from database_sqlite import get_db_connection
+import base64
+import json
+import re
+from datetime import datetime, timezone
+from database_sqlite import get_db_connection, get_read_only_connection
+from money import average_minor, to_major, to_minor
+from rollups import RollupDelta
+from write_queue import run_write
+
+# Predefined expense categories
+CATEGORIES = [
+    'Food & Dining',
+    'Transportation',
+    'Shopping',
+    'Entertainment',
+    'Healthcare',
+    'Utilities',
+    'Rent',
+    'Education',
+    'Travel',
+    'Other'
+]
+
+def encode_cursor(expense):
+    """Opaque page token pointing just past the given expense row"""
+    key = json.dumps([expense['date'], expense['created_at'], expense['id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip('=')
+
+def decode_cursor(token):
+    """Decode a page token into its (date, created_at, id) sort key"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        date, created_at, expense_id = json.loads(base64.urlsafe_b64decode(padded))
+        return str(date), str(created_at), int(expense_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid page cursor')
+
+# Sorts after every id: a bare data version as a sync token means 'all of that version seen'
+SYNC_ID_MAX = 2 ** 63 - 1
+
+class SyncTokenExpired(Exception):
+    """Raised for a sync token older than the retained tombstones; the client must resync from scratch"""
+
+def encode_sync_token(change_seq, expense_id):
+    """Opaque delta-sync position just past the given change"""
+    key = json.dumps([change_seq, expense_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip('=')
+
+def decode_sync_token(token):
+    """Decode a delta-sync token into its (change_seq, id) position
+    
+    A bare integer is read as a data version: everything changed after it.
+    """
+    if token.isdigit():
+        return int(token), SYNC_ID_MAX
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        change_seq, expense_id = json.loads(base64.urlsafe_b64decode(padded))
+        return int(change_seq), int(expense_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid sync token')
+
+def search_terms(text):
+    """Turn free text into an FTS5 query: every word must match, as a prefix"""
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', text or ''))
+
+def next_change_seq(cursor, user_id):
+    """Change sequence for rows a write transaction touches; bump_data_version commits to it"""
+    cursor.execute("SELECT version FROM user_data_versions WHERE user_id = ?", (user_id,))
+    row = cursor.fetchone()
+    return (row[0] if row else 0) + 1
+
+def bump_data_version(cursor, user_id):
+    """Advance a user's data version inside the caller's write transaction"""
+    cursor.execute("""
+        INSERT INTO user_data_versions (user_id, version, updated_at) VALUES (?, 1, CURRENT_TIMESTAMP)
+        ON CONFLICT (user_id) DO UPDATE SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+    """, (user_id,))
 
 class Expense:
-    """Expense model class"""
+    """Expense model class
+    
+    amount is given in major units (rupees) and kept as integer amount_minor (paise).
+    """
     
     def __init__(self, amount, category, date, description="", expense_id=None):
         self.id = expense_id
-        self.amount = float(amount)
+        self.amount_minor = to_minor(amount)
         self.category = category
         self.date = date if isinstance(date, str) else date.strftime('%Y-%m-%d')
         self.description = description
     
-    def save(self):
-        """Save expense to database"""
-        connection = get_db_connection()
-        cursor = connection.cursor()
+    @classmethod
+    def from_minor(cls, amount_minor, category, date, description="", expense_id=None):
+        """Build an expense from an amount already in minor units"""
+        expense = cls(0, category, date, description, expense_id)
+        expense.amount_minor = amount_minor
+        return expense
+    
+    @property
+    def amount(self):
+        return to_major(self.amount_minor)
+    
+    def save(self, user_id=None):
+        """Save expense to database, keeping rollups in the same transaction
         
-        if self.id:
-            cursor.execute('UPDATE expenses SET amount=?, category=?, date=?, description=? WHERE id=?',
-                         (self.amount, self.category, self.date, self.description, self.id))
-        else:
+        New expenses belong to user_id, or to the logged-in user if it is not given.
+        """
+        if not self.id and user_id is None:
             from flask_login import current_user
             user_id = current_user.id if hasattr(current_user, 'id') else 1
-            cursor.execute('INSERT INTO expenses (user_id, amount, category, date, description) VALUES (?, ?, ?, ?, ?)',
-                         (user_id, self.amount, self.category, self.date, self.description))
-            self.id = cursor.lastrowid
         
-        connection.commit()
-        cursor.close()
-        connection.close()
-        return self.id
+        def write(cursor):
+            delta = RollupDelta()
+            changed_user = self._write(cursor, user_id, delta)
+            delta.apply(cursor)
+            if changed_user is not None:
+                bump_data_version(cursor, changed_user)
+            return self.id
+        
+        return run_write(write)
+    
+    def _write(self, cursor, user_id, delta):
+        """Insert or update this expense inside the caller's transaction
+        
+        Records the rollup changes in delta and returns the id of the user whose
+        data changed, or None if there was nothing to update.
+        """
+        if self.id:
+            cursor.execute('SELECT user_id, amount_minor, category, date FROM expenses WHERE id = ?', (self.id,))
+            old = cursor.fetchone()
+            if not old:
+                return None
+            cursor.execute("""
+                UPDATE expenses SET amount_minor=?, category=?, date=?, description=?,
+                    change_seq=?, updated_at=CURRENT_TIMESTAMP
+                WHERE id=?
+            """, (self.amount_minor, self.category, self.date, self.description,
+                  next_change_seq(cursor, old['user_id']), self.id))
+            delta.remove(old['user_id'], old['category'], old['date'], old['amount_minor'])
+            delta.add(old['user_id'], self.category, self.date, self.amount_minor)
+            return old['user_id']
+        
+        cursor.execute("""
+            INSERT INTO expenses (user_id, amount_minor, category, date, description, change_seq)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (user_id, self.amount_minor, self.category, self.date, self.description,
+              next_change_seq(cursor, user_id)))
+        self.id = cursor.lastrowid
+        delta.add(user_id, self.category, self.date, self.amount_minor)
+        return user_id
     
     @staticmethod
     def get_all(limit=None, offset=0, user_id=None):
@@ -44,20 +163,222 @@ class Expense:
         
         if user_id:
             query = 'SELECT * FROM expenses WHERE user_id = ? ORDER BY date DESC, created_at DESC'
-            if limit:
-                query += f' LIMIT {limit} OFFSET {offset}'
-            cursor.execute(query, (user_id,))
+            params = (user_id,)
         else:
             query = 'SELECT * FROM expenses ORDER BY date DESC, created_at DESC'
-            if limit:
-                query += f' LIMIT {limit} OFFSET {offset}'
-            cursor.execute(query)
+            params = ()
+        if limit:
+            query += ' LIMIT ? OFFSET ?'
+            params += (int(limit), int(offset))
+        cursor.execute(query, params)
         
         expenses = [dict(row) for row in cursor.fetchall()]
         cursor.close()
         connection.close()
         return expenses
     
+    @staticmethod
+    def get_page(user_id, limit=50, cursor=None):
+        """Get one page of a user's expenses, newest first
+        
+        Returns (expenses, next_cursor); next_cursor is None on the last page.
+        Pages are keyed on (date, created_at, id), so deep pages cost the same as the first.
+        """
+        connection = get_db_connection()
+        db_cursor = connection.cursor()
+        
+        if cursor:
+            db_cursor.execute("""
+                SELECT * FROM expenses
+                WHERE user_id = ? AND (date, created_at, id) < (?, ?, ?)
+                ORDER BY date DESC, created_at DESC, id DESC LIMIT ?
+            """, (user_id, *decode_cursor(cursor), limit + 1))
+        else:
+            db_cursor.execute("""
+                SELECT * FROM expenses WHERE user_id = ?
+                ORDER BY date DESC, created_at DESC, id DESC LIMIT ?
+            """, (user_id, limit + 1))
+        
+        expenses = [dict(row) for row in db_cursor.fetchall()]
+        db_cursor.close()
+        connection.close()
+        
+        next_cursor = None
+        if len(expenses) > limit:
+            expenses = expenses[:limit]
+            next_cursor = encode_cursor(expenses[-1])
+        return expenses, next_cursor
+    
+    @staticmethod
+    def get_changes(user_id, since=None, limit=500):
+        """Get what changed in a user's expenses after a sync token, oldest change first
+        
+        Returns (changed, deleted_ids, next_since, has_more). Rows carry their
+        change_seq; pass next_since back as since to continue. A missing since
+        starts from the beginning. Both sides are read through (user_id, change_seq)
+        indexes, so cost follows the number of changes, not the size of the history.
+        
+        Raises SyncTokenExpired if tombstones the token still needs were pruned.
+        """
+        change_seq, expense_id = decode_sync_token(since) if since else (0, SYNC_ID_MAX)
+        connection = get_db_connection()
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT * FROM (
+                SELECT 0 AS deleted, id, change_seq, amount_minor, category, date, description, created_at, updated_at
+                FROM expenses WHERE user_id = ? AND (change_seq, id) > (?, ?)
+                ORDER BY change_seq, id LIMIT ?
+            )
+            UNION ALL
+            SELECT * FROM (
+                SELECT 1, expense_id, change_seq, NULL, NULL, NULL, NULL, NULL, deleted_at
+                FROM expense_tombstones WHERE user_id = ? AND (change_seq, expense_id) > (?, ?)
+                ORDER BY change_seq, expense_id LIMIT ?
+            )
+            ORDER BY change_seq, id LIMIT ?
+        """, (user_id, change_seq, expense_id, limit + 1,
+              user_id, change_seq, expense_id, limit + 1, limit + 1))
+        rows = cursor.fetchall()
+        # Checked after the read: a prune that ran before it is always noticed
+        cursor.execute("SELECT pruned_seq, pruned_id FROM user_data_versions WHERE user_id = ?", (user_id,))
+        pruned = cursor.fetchone()
+        cursor.close()
+        connection.close()
+        if change_seq and pruned and (change_seq, expense_id) < tuple(pruned):
+            raise SyncTokenExpired('Sync token expired: deletes it needs were pruned; sync again without since')
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        changed = []
+        deleted_ids = []
+        for row in rows:
+            if row['deleted']:
+                deleted_ids.append(row['id'])
+            else:
+                expense = dict(row)
+                del expense['deleted']
+                expense['user_id'] = user_id
+                changed.append(expense)
+        
+        if rows:
+            next_since = encode_sync_token(rows[-1]['change_seq'], rows[-1]['id'])
+        else:
+            next_since = since or '0'
+        return changed, deleted_ids, next_since, has_more
+    
+    @staticmethod
+    def search(user_id, text=None, start_date=None, end_date=None, min_amount_minor=None, max_amount_minor=None,
+               limit=50, offset=0):
+        """Search a user's expenses by description/category words plus date and amount filters
+        
+        Returns (expenses, has_more). With search words, results are ranked by
+        relevance (each row carries its 'rank', lower is better) through the FTS5
+        index; without, they are filtered and listed newest first. Amount bounds
+        are in minor units.
+        """
+        conditions = ['e.user_id = ?']
+        params = [user_id]
+        for condition, value in (('e.date >= ?', start_date), ('e.date <= ?', end_date),
+                                 ('e.amount_minor >= ?', min_amount_minor),
+                                 ('e.amount_minor <= ?', max_amount_minor)):
+            if value is not None and value != '':
+                conditions.append(condition)
+                params.append(value)
+        
+        # Description matches outweigh category matches; user_id only scopes the search,
+        # so the words are matched against description and category alone
+        terms = search_terms(text)
+        match = f'user_id:"{int(user_id)}" AND {{description category}}: ({terms})'
+        if terms and len(conditions) == 1:
+            # Rank inside the index and join only the page that is returned
+            query = """
+                SELECT e.*, hits.rank FROM (
+                    SELECT rowid, bm25(expenses_fts, 10.0, 4.0, 0.0) AS rank
+                    FROM expenses_fts WHERE expenses_fts MATCH ?
+                    ORDER BY rank, rowid DESC LIMIT ? OFFSET ?
+                ) AS hits JOIN expenses e ON e.id = hits.rowid
+                ORDER BY hits.rank, e.id DESC
+            """
+            params = [match]
+        elif terms:
+            query = f"""
+                SELECT e.*, bm25(expenses_fts, 10.0, 4.0, 0.0) AS rank
+                FROM expenses_fts JOIN expenses e ON e.id = expenses_fts.rowid
+                WHERE expenses_fts MATCH ? AND {' AND '.join(conditions)}
+                ORDER BY rank, e.id DESC LIMIT ? OFFSET ?
+            """
+            params.insert(0, match)
+        else:
+            query = f"""
+                SELECT e.* FROM expenses e WHERE {' AND '.join(conditions)}
+                ORDER BY e.date DESC, e.created_at DESC, e.id DESC LIMIT ? OFFSET ?
+            """
+        params += [limit + 1, offset]
+        
+        connection = get_db_connection()
+        cursor = connection.cursor()
+        cursor.execute(query, params)
+        expenses = [dict(row) for row in cursor.fetchall()]
+        cursor.close()
+        connection.close()
+        return expenses[:limit], len(expenses) > limit
+    
+    @staticmethod
+    def get_analytics(user_id):
+        """Get spending totals per category and month from the rollup tables
+        
+        Amounts are integer minor units, exact and equal to calculate_analytics;
+        money.analytics_json converts them for output.
+        """
+        connection = get_db_connection()
+        cursor = connection.cursor()
+        cursor.execute('SELECT month, total, count FROM expense_monthly_rollup WHERE user_id = ? ORDER BY month',
+                       (user_id,))
+        monthly_rows = cursor.fetchall()
+        cursor.execute('SELECT category, total FROM expense_category_rollup WHERE user_id = ?', (user_id,))
+        category_rows = cursor.fetchall()
+        cursor.close()
+        connection.close()
+        
+        if not monthly_rows:
+            return {
+                'total_spending': 0,
+                'expense_count': 0,
+                'category_totals': {},
+                'monthly_totals': {},
+                'average_expense': 0
+            }
+        
+        total_spending = sum(row['total'] for row in monthly_rows)
+        expense_count = sum(row['count'] for row in monthly_rows)
+        
+        return {
+            'total_spending': total_spending,
+            'expense_count': expense_count,
+            'category_totals': {row['category']: row['total'] for row in category_rows},
+            'monthly_totals': {row['month']: row['total'] for row in monthly_rows},
+            'average_expense': average_minor(total_spending, expense_count)
+        }
+    
+    @staticmethod
+    def get_data_version(user_id):
+        """Get a user's data version; it changes whenever their expenses do"""
+        return Expense.get_data_state(user_id)[0]
+    
+    @staticmethod
+    def get_data_state(user_id):
+        """Get (version, updated_at) for a user's data; updated_at is a UTC datetime or None"""
+        connection = get_db_connection()
+        cursor = connection.cursor()
+        cursor.execute("SELECT version, updated_at FROM user_data_versions WHERE user_id = ?", (user_id,))
+        row = cursor.fetchone()
+        cursor.close()
+        connection.close()
+        if not row:
+            return 0, None
+        updated_at = datetime.strptime(row['updated_at'], '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+        return row['version'], updated_at
+    
     @staticmethod
     def get_by_id(expense_id):
         """Get expense by ID"""
@@ -72,28 +393,112 @@ class Expense:
     
     @staticmethod
     def delete(expense_id):
-        """Delete expense by ID"""
-        connection = get_db_connection()
-        cursor = connection.cursor()
+        """Delete expense by ID, keeping rollups in the same transaction"""
+        def write(cursor):
+            delta = RollupDelta()
+            changed_user = Expense._delete(cursor, expense_id, delta)
+            if changed_user is None:
+                return False
+            delta.apply(cursor)
+            bump_data_version(cursor, changed_user)
+            return True
+        
+        return run_write(write)
+    
+    @staticmethod
+    def _delete(cursor, expense_id, delta):
+        """Delete an expense inside the caller's transaction
+        
+        Records the rollup changes in delta and returns the owner's user id,
+        or None if no such expense exists.
+        """
+        cursor.execute('SELECT user_id, amount_minor, category, date FROM expenses WHERE id = ?', (expense_id,))
+        old = cursor.fetchone()
+        if not old:
+            return None
         cursor.execute("DELETE FROM expenses WHERE id = ?", (expense_id,))
-        connection.commit()
-        affected_rows = cursor.rowcount
-        cursor.close()
-        connection.close()
-        return affected_rows > 0
+        cursor.execute("INSERT INTO expense_tombstones (user_id, change_seq, expense_id) VALUES (?, ?, ?)",
+                       (old['user_id'], next_change_seq(cursor, old['user_id']), expense_id))
+        delta.remove(old['user_id'], old['category'], old['date'], old['amount_minor'])
+        return old['user_id']
     
     @staticmethod
-    def get_by_date_range(start_date, end_date):
-        """Get expenses within a date range"""
+    def prune_tombstones(retention_days):
+        """Delete tombstones older than retention_days; returns how many were removed
+        
+        Each user's tombstones are pruned up to the newest expired one, in sync
+        order, and that position is recorded as pruned_seq / pruned_id so sync
+        tokens from before it are refused instead of silently missing deletes.
+        """
+        def write(cursor):
+            cursor.execute("""
+                SELECT user_id, change_seq, expense_id FROM (
+                    SELECT user_id, change_seq, expense_id, row_number() OVER (
+                        PARTITION BY user_id ORDER BY change_seq DESC, expense_id DESC) AS newest
+                    FROM expense_tombstones WHERE deleted_at < datetime('now', ?)
+                ) WHERE newest = 1
+            """, (f'-{int(retention_days)} days',))
+            horizons = [tuple(row) for row in cursor.fetchall()]
+            cursor.executemany("""
+                UPDATE user_data_versions SET pruned_seq = ?2, pruned_id = ?3
+                WHERE user_id = ?1 AND (pruned_seq, pruned_id) < (?2, ?3)
+            """, horizons)
+            cursor.executemany("""
+                DELETE FROM expense_tombstones WHERE user_id = ?1 AND (change_seq, expense_id) <= (?2, ?3)
+            """, horizons)
+            return cursor.rowcount
+        
+        return run_write(write)
+    
+    @staticmethod
+    def get_by_date_range(start_date, end_date, user_id=None):
+        """Get expenses within a date range, optionally for one user"""
         connection = get_db_connection()
         cursor = connection.cursor()
-        query = "SELECT * FROM expenses WHERE date BETWEEN ? AND ? ORDER BY date DESC"
-        cursor.execute(query, (start_date, end_date))
+        if user_id:
+            query = "SELECT * FROM expenses WHERE user_id = ? AND date BETWEEN ? AND ? ORDER BY date DESC"
+            cursor.execute(query, (user_id, start_date, end_date))
+        else:
+            query = "SELECT * FROM expenses WHERE date BETWEEN ? AND ? ORDER BY date DESC"
+            cursor.execute(query, (start_date, end_date))
         expenses = [dict(row) for row in cursor.fetchall()]
         cursor.close()
         connection.close()
         return expenses
     
+    @staticmethod
+    def iter_batches(user_id, start_date=None, end_date=None, batch_size=500):
+        """Yield a user's expenses, newest first, as lists of at most batch_size dicts
+        
+        Rows are read with fetchmany on a read-only connection of their own, outside
+        the pool, so memory stays flat and iteration may continue after the request
+        that started it has ended without holding a pooled connection.
+        """
+        conditions = ['user_id = ?']
+        params = [user_id]
+        if start_date:
+            conditions.append('date >= ?')
+            params.append(start_date)
+        if end_date:
+            conditions.append('date <= ?')
+            params.append(end_date)
+        
+        connection = get_read_only_connection()
+        cursor = connection.cursor()
+        try:
+            cursor.execute(f"""
+                SELECT * FROM expenses WHERE {' AND '.join(conditions)}
+                ORDER BY date DESC, created_at DESC, id DESC
+            """, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [dict(row) for row in rows]
+        finally:
+            cursor.close()
+            connection.close()
+    
     @staticmethod
     def get_categories():
         """Get all unique categories"""
@@ -0,0 +1,67 @@
+"""
+Money amounts for Expense Tracker
+Amounts are stored and summed as integer minor units (paise); these helpers
+are where they are parsed from input and turned back into display values
+"""
+
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+MINOR_UNITS = 100
+# Largest amount accepted, in minor units; far inside SQLite's 64-bit integers,
+# so totals over millions of expenses cannot overflow either
+MAX_AMOUNT_MINOR = 10 ** 15
+
+
+def to_minor(amount):
+    """Parse an amount in major units (str, int, float or Decimal) into integer minor units
+
+    Floats are read through their shortest repr, so 0.1 + 0.2 becomes 30 rather
+    than 30.000000000000004 cents; sub-cent digits are rounded half up.
+    Raises ValueError for anything that is not a finite number.
+    """
+    try:
+        value = Decimal(repr(amount) if isinstance(amount, float) else str(amount).strip())
+    except InvalidOperation:
+        raise ValueError(f'Invalid amount {amount!r}')
+    if not value.is_finite():
+        raise ValueError(f'Invalid amount {amount!r}')
+    amount_minor = int((value * MINOR_UNITS).to_integral_value(rounding=ROUND_HALF_UP))
+    if abs(amount_minor) > MAX_AMOUNT_MINOR:
+        raise ValueError(f'Amount {amount!r} is too large')
+    return amount_minor
+
+
+def to_major(amount_minor):
+    """Minor units as a float in major units, for JSON; exact to the cent"""
+    return amount_minor / MINOR_UNITS
+
+
+def format_amount(amount_minor):
+    """Minor units as a fixed-point string, e.g. 1250 -> '12.50'"""
+    sign = '-' if amount_minor < 0 else ''
+    whole, cents = divmod(abs(amount_minor), MINOR_UNITS)
+    return f'{sign}{whole}.{cents:02d}'
+
+
+def average_minor(total_minor, count):
+    """Mean in whole minor units, rounded half up the same way on every aggregation path"""
+    return (2 * total_minor + count) // (2 * count)
+
+
+def expense_json(expense):
+    """Copy of an expense row for JSON output, with amount_minor turned into amount"""
+    expense = dict(expense)
+    if 'amount_minor' in expense:
+        amount_minor = expense.pop('amount_minor')
+        expense['amount'] = None if amount_minor is None else to_major(amount_minor)
+    return expense
+
+
+def analytics_json(analytics):
+    """Copy of an Expense.get_analytics result for JSON output, with its sums in major units"""
+    analytics = dict(analytics)
+    for key in ('total_spending', 'average_expense'):
+        analytics[key] = to_major(analytics[key])
+    for key in ('category_totals', 'monthly_totals'):
+        analytics[key] = {name: to_major(total) for name, total in analytics[key].items()}
+    return analytics
@@ -0,0 +1,194 @@
+"""
+Request profiling for Expense Tracker
+Times every request with its SQL statements, template rendering and JSON
+encoding, adds a Server-Timing header, and can cProfile every Nth request
+"""
+
+import cProfile
+import hmac
+import os
+import threading
+import time
+from collections import deque
+
+from flask import Blueprint, abort, current_app, g, has_request_context, jsonify, request
+from flask import before_render_template, template_rendered
+from flask.json.provider import DefaultJSONProvider
+
+import db_pool
+
+
+class RequestStats:
+    """Per-endpoint totals plus the most recent request records, shared by all threads"""
+
+    def __init__(self, recent=200):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=recent)
+        self._endpoints = {}
+
+    def record(self, entry):
+        with self._lock:
+            self._recent.append(entry)
+            totals = self._endpoints.setdefault(entry['endpoint'], {
+                'requests': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'queries': 0,
+                'sql_ms': 0.0, 'template_ms': 0.0, 'json_ms': 0.0,
+            })
+            totals['requests'] += 1
+            totals['total_ms'] += entry['total_ms']
+            totals['max_ms'] = max(totals['max_ms'], entry['total_ms'])
+            for key in ('queries', 'sql_ms', 'template_ms', 'json_ms'):
+                totals[key] += entry[key]
+
+    def summary(self):
+        with self._lock:
+            endpoints = {}
+            for endpoint, totals in self._endpoints.items():
+                count = totals['requests']
+                endpoints[endpoint] = {
+                    'requests': count,
+                    'avg_ms': round(totals['total_ms'] / count, 3),
+                    'max_ms': round(totals['max_ms'], 3),
+                    'avg_queries': round(totals['queries'] / count, 2),
+                    'avg_sql_ms': round(totals['sql_ms'] / count, 3),
+                    'avg_template_ms': round(totals['template_ms'] / count, 3),
+                    'avg_json_ms': round(totals['json_ms'] / count, 3),
+                }
+            return {'endpoints': endpoints, 'recent': list(self._recent)}
+
+    def clear(self):
+        with self._lock:
+            self._recent.clear()
+            self._endpoints.clear()
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Default JSON provider that adds its encoding time to the current request"""
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            _add('json_seconds', time.perf_counter() - started)
+
+
+request_stats = RequestStats()
+profiling = Blueprint('profiling', __name__)
+_counter_lock = threading.Lock()
+_request_counter = 0
+
+
+def _add(key, seconds):
+    if has_request_context() and '_profile' in g:
+        g._profile[key] += seconds
+
+
+def _on_query(sql, parameters, seconds, caller):
+    if has_request_context() and '_profile' in g:
+        g._profile['queries'] += 1
+        g._profile['sql_seconds'] += seconds
+
+
+def _on_template_start(sender, template, context, **extra):
+    if '_profile' in g:
+        g._profile['template_started'] = time.perf_counter()
+
+
+def _on_template_rendered(sender, template, context, **extra):
+    if '_profile' in g and g._profile['template_started'] is not None:
+        _add('template_seconds', time.perf_counter() - g._profile['template_started'])
+        g._profile['template_started'] = None
+
+
+def _should_sample(every):
+    global _request_counter
+    if not every:
+        return False
+    with _counter_lock:
+        _request_counter += 1
+        return _request_counter % every == 0
+
+
+def _start_request():
+    g._profile = {
+        'started': time.perf_counter(),
+        'queries': 0,
+        'sql_seconds': 0.0,
+        'template_seconds': 0.0,
+        'template_started': None,
+        'json_seconds': 0.0,
+        'profiler': None,
+    }
+    if _should_sample(current_app.config['PROFILE_SAMPLE_EVERY']):
+        profiler = cProfile.Profile()
+        profiler.enable()
+        g._profile['profiler'] = profiler
+
+
+def _finish_request(response):
+    profile = g.pop('_profile', None)
+    if profile is None:
+        return response
+    total = time.perf_counter() - profile['started']
+    endpoint = request.endpoint or 'unmatched'
+
+    if profile['profiler'] is not None:
+        profile['profiler'].disable()
+        directory = current_app.config['PROFILE_DIR']
+        os.makedirs(directory, exist_ok=True)
+        profile['profiler'].dump_stats(os.path.join(
+            directory, f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{endpoint}.prof'))
+
+    entry = {
+        'endpoint': endpoint,
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'total_ms': round(total * 1000, 3),
+        'queries': profile['queries'],
+        'sql_ms': round(profile['sql_seconds'] * 1000, 3),
+        'template_ms': round(profile['template_seconds'] * 1000, 3),
+        'json_ms': round(profile['json_seconds'] * 1000, 3),
+    }
+    request_stats.record(entry)
+    response.headers['Server-Timing'] = ', '.join([
+        f"app;dur={entry['total_ms']}",
+        f"db;dur={entry['sql_ms']};desc=\"{entry['queries']} queries\"",
+        f"tpl;dur={entry['template_ms']}",
+        f"json;dur={entry['json_ms']}",
+    ])
+    return response
+
+
+def _abandon_request(exception=None):
+    # after_request is skipped when a response could not be built
+    profile = g.pop('_profile', None)
+    if profile is not None and profile['profiler'] is not None:
+        profile['profiler'].disable()
+
+
+@profiling.route('/debug/profile', methods=['GET', 'DELETE'])
+def profile_summary():
+    """Per-endpoint timing summary; needs PROFILING_TOKEN as X-Profiling-Token or ?token="""
+    token = current_app.config.get('PROFILING_TOKEN')
+    given = request.headers.get('X-Profiling-Token') or request.args.get('token') or ''
+    if not token or not hmac.compare_digest(given.encode(), token.encode()):
+        abort(404)
+    if request.method == 'DELETE':
+        request_stats.clear()
+        return '', 204
+    return jsonify({'pid': os.getpid(), **request_stats.summary()})
+
+
+def init_app(app):
+    """Instrument app if PROFILING_ENABLED is set"""
+    if not app.config.get('PROFILING_ENABLED'):
+        return
+    app.json = TimedJSONProvider(app)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_abandon_request)
+    before_render_template.connect(_on_template_start, app)
+    template_rendered.connect(_on_template_rendered, app)
+    db_pool.add_query_listener(_on_query)
+    app.register_blueprint(profiling)
@@ -0,0 +1,180 @@
+"""
+Per-user spending rollups for Expense Tracker
+Running sums and counts by (user, month), (user, category) and (user, date,
+category), updated in the same transaction as every expense write so
+analytics and time series never rescan history
+"""
+
+import sys
+
+from database_sqlite import get_db_connection
+
+# table: ((key column, expression over expenses), ...)
+ROLLUP_TABLES = {
+    'expense_monthly_rollup': (('month', 'substr(date, 1, 7)'),),
+    'expense_category_rollup': (('category', 'category'),),
+    'expense_daily_rollup': (('date', 'date'), ('category', 'category')),
+}
+
+
+def key_columns(table):
+    return ', '.join(column for column, _ in ROLLUP_TABLES[table])
+
+
+def key_expressions(table):
+    return ', '.join(expression for _, expression in ROLLUP_TABLES[table])
+
+
+def create_rollup_tables(cursor):
+    """Create the rollup tables; returns True if they did not exist yet"""
+    cursor.execute(
+        f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ({', '.join('?' * len(ROLLUP_TABLES))})",
+        tuple(ROLLUP_TABLES))
+    existed = cursor.fetchone()[0] == len(ROLLUP_TABLES)
+    for table, keys in ROLLUP_TABLES.items():
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                user_id INTEGER NOT NULL,
+                {''.join(f'{column} TEXT NOT NULL, ' for column, _ in keys)}
+                total INTEGER NOT NULL DEFAULT 0,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, {key_columns(table)})
+            ) WITHOUT ROWID
+        """)
+    return not existed
+
+
+class RollupDelta:
+    """Pending rollup changes collected from one or more expense writes"""
+
+    def __init__(self):
+        self.monthly = {}
+        self.category = {}
+        self.daily = {}
+
+    def _bump(self, bucket, key, amount, count):
+        entry = bucket.setdefault(key, [0, 0])
+        entry[0] += amount
+        entry[1] += count
+
+    def add(self, user_id, category, date, amount):
+        """Count an expense that now exists (amount in minor units)"""
+        self._bump(self.monthly, (user_id, date[:7]), amount, 1)
+        self._bump(self.category, (user_id, category), amount, 1)
+        self._bump(self.daily, (user_id, date, category), amount, 1)
+
+    def remove(self, user_id, category, date, amount):
+        """Un-count an expense that was deleted or is about to change"""
+        self._bump(self.monthly, (user_id, date[:7]), -amount, -1)
+        self._bump(self.category, (user_id, category), -amount, -1)
+        self._bump(self.daily, (user_id, date, category), -amount, -1)
+
+    def _buckets(self):
+        return (('expense_monthly_rollup', self.monthly),
+                ('expense_category_rollup', self.category),
+                ('expense_daily_rollup', self.daily))
+
+    def merge(self, other):
+        for (_, bucket), (_, other_bucket) in zip(self._buckets(), other._buckets()):
+            for key, (amount, count) in other_bucket.items():
+                self._bump(bucket, key, amount, count)
+
+    def apply(self, cursor):
+        """Write the changes inside the caller's transaction"""
+        for table, bucket in self._buckets():
+            keys = key_columns(table)
+            changes = [(*key, amount, count) for key, (amount, count) in bucket.items() if count or amount]
+            if not changes:
+                continue
+            placeholders = ', '.join('?' * (len(ROLLUP_TABLES[table]) + 3))
+            cursor.executemany(f"""
+                INSERT INTO {table} (user_id, {keys}, total, count) VALUES ({placeholders})
+                ON CONFLICT (user_id, {keys}) DO UPDATE SET
+                    total = total + excluded.total,
+                    count = count + excluded.count
+            """, changes)
+            # Only keys whose count went down can have emptied out
+            emptied = [change[:-2] for change in changes if change[-1] < 0]
+            if emptied:
+                matches = ' AND '.join(f'{column} = ?' for column, _ in ROLLUP_TABLES[table])
+                cursor.executemany(
+                    f"DELETE FROM {table} WHERE user_id = ? AND {matches} AND count <= 0", emptied)
+
+
+def rebuild_rollups(cursor, user_id=None, tables=None, amount='amount_minor'):
+    """Recompute rollups from the raw expenses table (all users or one, all tables or some)
+
+    amount names the column to sum, for migrations that run before amount_minor exists.
+    """
+    where, params = ('WHERE user_id = ?', (user_id,)) if user_id is not None else ('', ())
+    for table in tables or ROLLUP_TABLES:
+        cursor.execute(f"DELETE FROM {table} {where}", params)
+        cursor.execute(f"""
+            INSERT INTO {table} (user_id, {key_columns(table)}, total, count)
+            SELECT user_id, {key_expressions(table)}, SUM({amount}), COUNT(*)
+            FROM expenses {where}
+            GROUP BY user_id, {key_expressions(table)}
+        """, params)
+
+
+def verify_rollups(cursor):
+    """Compare rollups with the raw expenses table; returns a list of mismatches
+
+    Totals are integer minor units, so they must match exactly.
+    """
+    mismatches = []
+    for table, keys in ROLLUP_TABLES.items():
+        cursor.execute(f"""
+            SELECT user_id, {key_expressions(table)}, SUM(amount_minor) AS total, COUNT(*) AS count
+            FROM expenses GROUP BY user_id, {key_expressions(table)}
+        """)
+        expected = {tuple(row[:-2]): (row[-2], row[-1]) for row in cursor.fetchall()}
+        cursor.execute(f"SELECT user_id, {key_columns(table)}, total, count FROM {table}")
+        actual = {tuple(row[:-2]): (row[-2], row[-1]) for row in cursor.fetchall()}
+
+        for user_key in expected.keys() | actual.keys():
+            want = expected.get(user_key, (0, 0))
+            got = actual.get(user_key, (0, 0))
+            if want != got:
+                mismatches.append({
+                    'table': table,
+                    'user_id': user_key[0],
+                    **{column: value for (column, _), value in zip(keys, user_key[1:])},
+                    'expected': {'total': want[0], 'count': want[1]},
+                    'actual': {'total': got[0], 'count': got[1]},
+                })
+    return mismatches
+
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else 'verify'
+    if command not in ('rebuild', 'verify'):
+        print("Usage: python rollups.py [rebuild|verify]")
+        return 2
+
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    try:
+        create_rollup_tables(cursor)
+        if command == 'rebuild':
+            cursor.execute('BEGIN IMMEDIATE')
+            rebuild_rollups(cursor)
+            connection.commit()
+            print("✅ Rollups rebuilt from expenses")
+            return 0
+
+        mismatches = verify_rollups(cursor)
+        for mismatch in mismatches:
+            print(f"❌ {mismatch}")
+        if mismatches:
+            print(f"{len(mismatches)} mismatched rollup rows - run 'python rollups.py rebuild'")
+            return 1
+        print("✅ Rollups match expenses")
+        return 0
+    finally:
+        cursor.close()
+        connection.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
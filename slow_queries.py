@@ -0,0 +1,178 @@
+"""
+Slow-query log for Expense Tracker
+Statements slower than SLOW_QUERY_MS are written to a rotating JSON-lines
+file with their normalized SQL, parameter shape, caller and query plan
+
+Usage: python slow_queries.py [slow_queries.log] [--top 20] [--sort total|count|max]
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+from logging.handlers import RotatingFileHandler
+
+import db_pool
+
+logger = logging.getLogger('expense_tracker.slow_queries')
+logger.propagate = False
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """Collapse whitespace and replace literals with ? so similar statements group together"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def parameter_shape(parameters):
+    """Types of the bound parameters, e.g. '(int, str)' or '250 x (int, str)' for executemany"""
+    def shape(values):
+        if isinstance(values, dict):
+            return '{' + ', '.join(f'{key}: {type(value).__name__}' for key, value in values.items()) + '}'
+        return '(' + ', '.join(type(value).__name__ for value in values) + ')'
+
+    if isinstance(parameters, list) and parameters and isinstance(parameters[0], (tuple, list, dict)):
+        return f'{len(parameters)} x {shape(parameters[0])}'
+    return shape(parameters or ())
+
+
+class SlowQueryLog:
+    """Query listener that logs statements over a threshold, with EXPLAIN QUERY PLAN output"""
+
+    def __init__(self, threshold_ms=100.0, max_plans=256):
+        self.threshold = threshold_ms / 1000
+        self.max_plans = max_plans
+        self._plans = {}
+        self._local = threading.local()
+
+    def _explain_connection(self, database):
+        # A connection of its own: the pool may be exhausted by the very request being logged
+        connections = self._local.__dict__.setdefault('connections', {})
+        if database not in connections:
+            connections[database] = sqlite3.connect(database, check_same_thread=False)
+        return connections[database]
+
+    def query_plan(self, sql, parameters):
+        normalized = normalize_sql(sql)
+        if normalized in self._plans:
+            return self._plans[normalized]
+        if isinstance(parameters, list):
+            parameters = parameters[0] if parameters else ()
+        try:
+            connection = self._explain_connection(db_pool.get_pool().database)
+            plan = [row[3] for row in connection.execute(f'EXPLAIN QUERY PLAN {sql}', parameters)]
+        except sqlite3.Error:
+            plan = None
+        if len(self._plans) >= self.max_plans:
+            self._plans.clear()
+        self._plans[normalized] = plan
+        return plan
+
+    def __call__(self, sql, parameters, seconds, caller):
+        if seconds < self.threshold:
+            return
+        logger.warning(json.dumps({
+            'sql': normalize_sql(sql),
+            'parameters': parameter_shape(parameters),
+            'duration_ms': round(seconds * 1000, 3),
+            'caller': caller,
+            'plan': self.query_plan(sql, parameters),
+        }))
+
+
+def configure_logging(path, max_bytes=10 * 1024 * 1024, backup_count=5):
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.WARNING)
+
+
+def init_app(app):
+    """Log slow statements if SLOW_QUERY_LOG is set"""
+    path = app.config.get('SLOW_QUERY_LOG')
+    if not path:
+        return None
+    configure_logging(path, max_bytes=app.config.get('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024),
+                      backup_count=app.config.get('SLOW_QUERY_LOG_BACKUPS', 5))
+    slow_log = SlowQueryLog(app.config.get('SLOW_QUERY_MS', 100))
+    db_pool.add_query_listener(slow_log)
+    return slow_log
+
+
+def log_files(path):
+    """The log and its rotated copies (path.1 is the newest), oldest first"""
+    rotated = [name for name in glob.glob(glob.escape(path) + '.*') if name.rsplit('.', 1)[1].isdigit()]
+    rotated.sort(key=lambda name: int(name.rsplit('.', 1)[1]), reverse=True)
+    return rotated + [path]
+
+
+def read_entries(path):
+    for file_path in log_files(path):
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def top_offenders(entries, sort='total', top=20):
+    """Group entries by statement and caller; returns the worst groups first"""
+    groups = {}
+    for entry in entries:
+        key = (entry['sql'], entry.get('caller'))
+        group = groups.setdefault(key, {
+            'sql': entry['sql'], 'caller': entry.get('caller'), 'count': 0,
+            'total_ms': 0.0, 'max_ms': 0.0, 'parameters': entry.get('parameters'), 'plan': entry.get('plan'),
+        })
+        group['count'] += 1
+        group['total_ms'] += entry['duration_ms']
+        group['max_ms'] = max(group['max_ms'], entry['duration_ms'])
+        group['plan'] = entry.get('plan') or group['plan']
+    key = {'total': 'total_ms', 'count': 'count', 'max': 'max_ms'}[sort]
+    return sorted(groups.values(), key=lambda group: group[key], reverse=True)[:top]
+
+
+def main(argv=None):
+    from config import Config
+
+    parser = argparse.ArgumentParser(description='Summarize the slow-query log')
+    parser.add_argument('path', nargs='?', default=Config.SLOW_QUERY_LOG or 'slow_queries.log')
+    parser.add_argument('--top', type=int, default=20, help='Number of statements to show')
+    parser.add_argument('--sort', choices=('total', 'count', 'max'), default='total')
+    args = parser.parse_args(argv)
+
+    offenders = top_offenders(read_entries(args.path), sort=args.sort, top=args.top)
+    if not offenders:
+        print(f"✅ No slow queries logged in {args.path}")
+        return 0
+    for rank, group in enumerate(offenders, start=1):
+        print(f"{rank:>3}. {group['count']}x  total {group['total_ms']:.1f} ms  "
+              f"avg {group['total_ms'] / group['count']:.1f} ms  max {group['max_ms']:.1f} ms")
+        print(f"     {group['caller']}  {group['parameters']}")
+        print(f"     {group['sql']}")
+        for step in group['plan'] or []:
+            print(f"       - {step}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+"""
+Shared fixtures for Expense Tracker tests
+"""
+
+import os
+import tempfile
+
+import pytest
+
+# Keep the app's import-time database setup away from the working copy
+os.environ.setdefault('DATABASE_PATH', os.path.join(tempfile.mkdtemp(), 'expense_tracker.db'))
+# Metrics are off by default; the metrics tests need them. Snapshots of
+# earlier test runs must not be summed into this one
+os.environ.setdefault('METRICS_ENABLED', 'true')
+os.environ.setdefault('METRICS_DIR', tempfile.mkdtemp())
+# ...nor mixed into the slow-query log of the working copy
+os.environ.setdefault('SLOW_QUERY_LOG', os.path.join(tempfile.mkdtemp(), 'slow_queries.log'))
+# Hash inline: spawning a process pool per test run only slows the suite down
+os.environ.setdefault('HASH_WORKERS', '0')
+
+import auth_models
+import db_pool
+from app import analytics_cache, app as flask_app
+from config import Config
+from database_auth import init_auth_database
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Point the connection pool at a fresh, initialized database file"""
+    db_pool.configure_pool(database=str(tmp_path / 'expense_tracker.db'), size=Config.DB_POOL_SIZE)
+    init_auth_database()
+    # Ids restart in every fresh database, so cached entries would leak between tests
+    auth_models._user_cache.clear()
+    analytics_cache.backend.clear()
+    yield
+    db_pool.configure_pool(database=Config.DATABASE_PATH, size=Config.DB_POOL_SIZE)
+
+
+@pytest.fixture
+def client(database):
+    """Test client logged in as a freshly signed-up user"""
+    client = flask_app.test_client()
+    client.post('/signup', data={
+        'username': 'tester',
+        'email': 'tester@example.com',
+        'password': 'secret',
+        'confirm_password': 'secret',
+    })
+    return client
@@ -0,0 +1,103 @@
+"""
+Tests for the columnar analytics engine
+"""
+
+import statistics
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import analytics_engine
+from analytics_engine import Columns, compute
+from models import Expense
+from money import analytics_json
+
+ROWS = [
+    ('2025-01-06', 'Food & Dining', 1000),   # Monday
+    ('2025-01-06', 'Shopping', 3000),
+    ('2025-01-31', 'Food & Dining', 2000),   # Friday
+    ('2025-03-01', 'Food & Dining', 4025),   # Saturday, after a month with no expenses
+]
+
+
+class TestAnalyticsEngine:
+    """Test cases for the vectorized statistics"""
+
+    def test_distributions_and_percentiles(self):
+        """Test weekday, day-of-month and percentile figures on hand-checked data"""
+        result = compute(Columns.from_rows(ROWS))
+
+        assert result['total_spending'] == 100.25
+        assert result['median_expense'] == 25.0
+        assert result['percentiles']['p25'] == round(statistics.quantiles(
+            [row[2] for row in ROWS], n=4, method='inclusive')[0]) / 100
+        assert result['weekday_totals']['Monday'] == {'total': 40.0, 'count': 2, 'average': 20.0}
+        assert result['weekday_totals']['Sunday'] == {'total': 0.0, 'count': 0, 'average': 0.0}
+        assert result['day_of_month_totals']['31'] == {'total': 20.0, 'count': 1}
+        assert result['day_of_month_totals']['1'] == {'total': 40.25, 'count': 1}
+
+    def test_months_rolling_spend_and_matrix(self):
+        """Test empty months count for month-over-month changes but not monthly_totals"""
+        result = compute(Columns.from_rows(ROWS))
+
+        assert result['monthly_totals'] == {'2025-01': 60.0, '2025-03': 40.25}
+        assert result['month_over_month']['2025-01'] == {'total': 60.0, 'change': None, 'change_percent': None}
+        assert result['month_over_month']['2025-02'] == {'total': 0.0, 'change': -60.0, 'change_percent': -100.0}
+        assert result['month_over_month']['2025-03']['change_percent'] is None
+
+        rolling = result['rolling_spend']
+        assert (rolling['start'], rolling['end']) == ('2025-01-06', '2025-03-01')
+        assert len(rolling['30_days']) == 55
+        assert rolling['30_days'][25] == 60.0    # Jan 31 still sees Jan 6
+        assert rolling['30_days'][30] == 20.0    # Feb 5 no longer does
+        assert rolling['90_days'][-1] == 100.25
+
+        matrix = result['category_month_matrix']
+        assert matrix['categories'] == ['Food & Dining', 'Shopping']
+        assert matrix['months'] == ['2025-01', '2025-02', '2025-03']
+        assert matrix['totals'] == [[30.0, 0.0, 40.25], [30.0, 0.0, 0.0]]
+
+    def test_matches_rollup_analytics(self, database):
+        """Test the engine agrees with the SQL rollups on the shared keys"""
+        for date, category, amount_minor in ROWS:
+            Expense.from_minor(amount_minor, category, date).save(1)
+
+        detailed = analytics_engine.get_detailed_analytics(1)
+        basic = analytics_json(Expense.get_analytics(1))
+
+        assert {key: detailed[key] for key in basic} == basic
+        assert detailed == compute(Columns.from_rows(ROWS))
+        assert compute(analytics_engine.load_columns(2))['expense_count'] == 0
+
+    def test_rolling_spend_covers_recent_days_only(self):
+        """Test the rolling series stays bounded however long the history is"""
+        rows = [('2020-01-01', 'Other', 500), ('2025-06-30', 'Other', 700), ('2025-06-01', 'Rent', 100)]
+
+        rolling = compute(Columns.from_rows(rows))['rolling_spend']
+
+        assert len(rolling['30_days']) == analytics_engine.ROLLING_DAYS
+        assert (rolling['start'], rolling['end']) == ('2025-01-02', '2025-06-30')
+        assert rolling['30_days'][-1] == 8.0
+
+    def test_sums_are_exact(self):
+        """Test many sub-unit amounts add up without floating-point drift"""
+        rows = [('2025-01-01', 'Other', 10)] * 1000 + [('2025-01-02', 'Other', 20)] * 1000
+
+        result = compute(Columns.from_rows(rows))
+
+        assert result['total_spending'] == 300.0
+        assert result['average_expense'] == 0.15
+        assert result['rolling_spend']['30_days'][-1] == 300.0
+
+    def test_api_detail_parameter(self, client):
+        """Test /api/analytics?detail=full adds statistics and rejects unknown levels"""
+        client.post('/add', data={'amount': '12.50', 'category': 'Other', 'date': '2025-02-03'})
+
+        basic = client.get('/api/analytics').get_json()
+        full = client.get('/api/analytics?detail=full').get_json()
+
+        assert 'percentiles' not in basic
+        assert full['median_expense'] == 12.5
+        assert full['weekday_totals']['Monday']['count'] == 1
+        assert client.get('/api/analytics?detail=everything').status_code == 400
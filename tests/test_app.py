@@ -0,0 +1,202 @@
+"""
+Route tests for Expense Tracker
+Run with: pytest tests/ -v
+"""
+
+import json
+from datetime import datetime, timedelta, timezone
+
+from database_sqlite import get_db_connection
+
+
+def add_expenses(client, count):
+    for day in range(1, count + 1):
+        client.post('/add', data={
+            'amount': '10',
+            'category': 'Food & Dining',
+            'date': f'2025-01-{day:02d}',
+        })
+
+
+def settle_data_version():
+    """Move every data version's timestamp into an earlier, finished second"""
+    connection = get_db_connection()
+    connection.execute("UPDATE user_data_versions SET updated_at = datetime('now', '-5 seconds')")
+    connection.commit()
+    connection.close()
+
+
+class TestExpensePages:
+    """Test cases for paginated expense listings"""
+
+    def test_api_expenses_pages_with_cursor(self, client):
+        """Test following next_cursor walks every expense exactly once"""
+        add_expenses(client, 5)
+
+        seen = []
+        url = '/api/expenses?limit=2'
+        while url:
+            body = client.get(url).get_json()
+            seen.extend(expense['date'] for expense in body['expenses'])
+            url = body['next_cursor'] and f"/api/expenses?limit=2&cursor={body['next_cursor']}"
+
+        assert seen == [f'2025-01-{day:02d}' for day in range(5, 0, -1)]
+
+    def test_api_expenses_rejects_bad_cursor(self, client):
+        """Test a malformed cursor is a client error"""
+        response = client.get('/api/expenses?cursor=not-a-cursor')
+
+        assert response.status_code == 400
+
+    def test_index_links_to_next_page(self, client, monkeypatch):
+        """Test the home page renders a link to older expenses"""
+        from app import app
+        monkeypatch.setitem(app.config, 'EXPENSES_PAGE_SIZE', 2)
+        add_expenses(client, 3)
+
+        page = client.get('/').get_data(as_text=True)
+
+        assert 'Older' in page
+        assert page.count('btn-edit') == 2
+
+
+class TestAnalyticsPages:
+    """Test cases for analytics output"""
+
+    def test_analytics_in_rupees(self, client):
+        """Test the API and pages show the paise sums in rupees"""
+        client.post('/add', data={'amount': '10.25', 'category': 'Rent', 'date': '2025-01-01'})
+        client.post('/add', data={'amount': '0.5', 'category': 'Rent', 'date': '2025-02-01'})
+
+        body = client.get('/api/analytics').get_json()
+
+        assert body['total_spending'] == 10.75
+        assert body['average_expense'] == 5.38
+        assert body['monthly_totals'] == {'2025-01': 10.25, '2025-02': 0.5}
+        assert '₹10.75' in client.get('/analytics').get_data(as_text=True)
+        assert '₹10.75' in client.get('/').get_data(as_text=True)
+
+
+class TestDeltaSync:
+    """Test cases for /api/expenses/changes"""
+
+    def test_expired_token_asks_for_resync(self, client):
+        """Test a since older than the retained deletes gets 410 instead of missing them"""
+        from models import Expense
+        add_expenses(client, 2)
+        since = client.get('/api/expenses/changes').get_json()['next_since']
+        client.post(f"/delete/{Expense.get_all(user_id=1)[0]['id']}")
+        connection = get_db_connection()
+        connection.execute("UPDATE expense_tombstones SET deleted_at = datetime('now', '-60 days')")
+        connection.commit()
+        connection.close()
+        Expense.prune_tombstones(30)
+
+        response = client.get(f'/api/expenses/changes?since={since}')
+
+        assert response.status_code == 410
+        assert response.get_json()['resync'] is True
+        assert len(client.get('/api/expenses/changes').get_json()['changed']) == 1
+
+
+class TestConditionalRequests:
+    """Test cases for ETag / Last-Modified handling on the JSON API"""
+
+    def test_matching_etag_returns_304(self, client):
+        """Test an unchanged resource is not re-sent"""
+        add_expenses(client, 1)
+        first = client.get('/api/expenses')
+
+        second = client.get('/api/expenses', headers={'If-None-Match': first.headers['ETag']})
+
+        assert first.status_code == 200
+        assert second.status_code == 304
+        assert second.get_data() == b''
+
+    def test_write_changes_etag(self, client):
+        """Test adding an expense invalidates the previous ETag"""
+        add_expenses(client, 1)
+        etag = client.get('/api/analytics').headers['ETag']
+        add_expenses(client, 1)
+
+        response = client.get('/api/analytics', headers={'If-None-Match': etag})
+
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+    def test_if_modified_since(self, client):
+        """Test Last-Modified round-trips through If-Modified-Since"""
+        add_expenses(client, 1)
+        settle_data_version()
+        last_modified = client.get('/api/expenses').headers['Last-Modified']
+
+        response = client.get('/api/expenses', headers={'If-Modified-Since': last_modified})
+
+        assert response.status_code == 304
+
+    def test_last_modified_waits_for_its_second_to_end(self):
+        """Test a timestamp another write may still share is not used as a validator"""
+        from app import settled_last_modified
+        this_second = datetime.now(timezone.utc).replace(microsecond=0)
+
+        assert settled_last_modified(this_second) is None
+        assert settled_last_modified(this_second - timedelta(seconds=1)) == this_second - timedelta(seconds=1)
+        assert settled_last_modified(None) is None
+
+
+class TestExport:
+    """Test cases for the streaming export"""
+
+    def test_ndjson_export_respects_date_range(self, client):
+        """Test NDJSON export emits one line per expense in range"""
+        add_expenses(client, 5)
+
+        response = client.get('/api/expenses/export?format=ndjson&start_date=2025-01-02&end_date=2025-01-04')
+        lines = response.get_data(as_text=True).splitlines()
+
+        assert response.mimetype == 'application/x-ndjson'
+        assert [json.loads(line)['date'] for line in lines] == ['2025-01-04', '2025-01-03', '2025-01-02']
+
+    def test_json_export_is_a_valid_array(self, client, monkeypatch):
+        """Test the JSON export stays valid across batch boundaries"""
+        from app import app
+        monkeypatch.setitem(app.config, 'EXPORT_BATCH_SIZE', 2)
+        add_expenses(client, 5)
+
+        body = json.loads(client.get('/api/expenses/export').get_data(as_text=True))
+
+        assert len(body) == 5
+
+    def test_streaming_export_leaves_the_pool_alone(self, client, monkeypatch):
+        """Test an export the client is still reading holds no pooled connection"""
+        import db_pool
+        from app import app
+        monkeypatch.setitem(app.config, 'EXPORT_BATCH_SIZE', 2)
+        add_expenses(client, 5)
+
+        response = client.get('/api/expenses/export?format=ndjson', buffered=False)
+        chunks = iter(response.response)
+        assert json.loads(next(chunks).splitlines()[0])['date'] == '2025-01-05'
+
+        assert db_pool.get_pool().stats()['in_use'] == 0
+        assert len(b''.join(chunks).splitlines()) == 3
+        response.close()
+
+    def test_export_of_empty_account(self, client):
+        """Test an account without expenses exports an empty array"""
+        assert client.get('/api/expenses/export').get_json() == []
+
+
+class TestSearch:
+    """Test cases for the search endpoint"""
+
+    def test_search_pages_with_offset(self, client):
+        """Test search results page with next_offset and reject bad filters"""
+        add_expenses(client, 5)
+
+        first = client.get('/api/expenses/search?q=food&limit=3').get_json()
+        second = client.get(f"/api/expenses/search?q=food&limit=3&offset={first['next_offset']}").get_json()
+
+        assert len(first['expenses']) == 3
+        assert len(second['expenses']) == 2 and second['next_offset'] is None
+        assert client.get('/api/expenses/search?q=x&min_amount=abc').status_code == 400
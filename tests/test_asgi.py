@@ -0,0 +1,109 @@
+"""
+Tests for the ASGI entry point
+"""
+
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip('asgiref')
+
+
+def asgi_get(path, headers=(), application=None):
+    """Call the ASGI app directly and return (status, headers, body)"""
+    return asyncio.run(asgi_request(path, headers, application))
+
+
+async def asgi_request(path, headers=(), application=None):
+    if application is None:
+        from asgi import application
+
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    path, _, query = path.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'server': ('testserver', 80),
+        'path': path, 'root_path': '', 'query_string': query.encode(),
+        'headers': [(key.lower().encode(), value.encode()) for key, value in headers],
+    }
+    await application(scope, receive, send)
+    start = messages[0]
+    body = b''.join(message.get('body', b'') for message in messages[1:])
+    return start['status'], {k.decode(): v.decode() for k, v in start['headers']}, body
+
+
+class TestAsgiApplication:
+    """Test cases for the native async routes"""
+
+    def test_native_route_matches_wsgi_response(self, client):
+        """Test /api/expenses answers identically, including the ETag"""
+        client.post('/add', data={'amount': '10', 'category': 'Rent', 'date': '2025-01-01'})
+        cookie = ('Cookie', f"session={client.get_cookie('session').value}")
+        wsgi_response = client.get('/api/expenses')
+
+        status, headers, body = asgi_get('/api/expenses', [cookie])
+
+        assert status == 200
+        assert headers['etag'] == wsgi_response.headers['ETag']
+        assert b'"Rent"' in body
+        assert asgi_get('/api/expenses', [cookie, ('If-None-Match', headers['etag'])])[0] == 304
+
+    def test_analytics_detail_levels(self, client, monkeypatch):
+        """Test detail=full is served natively, validated and tagged apart from basic"""
+        pytest.importorskip('numpy')
+        import analytics_engine
+        client.post('/add', data={'amount': '12.50', 'category': 'Other', 'date': '2025-02-03'})
+        cookie = ('Cookie', f"session={client.get_cookie('session').value}")
+
+        basic_status, basic_headers, basic_body = asgi_get('/api/analytics', [cookie])
+        status, headers, body = asgi_get('/api/analytics?detail=full', [cookie])
+
+        assert (basic_status, status) == (200, 200)
+        assert b'percentiles' in body and b'percentiles' not in basic_body
+        assert headers['etag'] != basic_headers['etag']
+        assert headers['etag'] == client.get('/api/analytics?detail=full').headers['ETag']
+        assert asgi_get('/api/analytics?detail=bogus', [cookie])[0] == 400
+        monkeypatch.setattr(analytics_engine, 'available', lambda: False)
+        assert asgi_get('/api/analytics?detail=full', [cookie])[0] == 501
+
+    def test_anonymous_request_falls_back_to_flask(self, database):
+        """Test requests without a session are handled by Flask-Login"""
+        status, headers, _ = asgi_get('/api/analytics')
+
+        assert status == 302
+        assert '/login' in headers['location']
+
+    def test_flask_routes_run_concurrently(self):
+        """Test slow requests on the WSGI fallback overlap instead of queueing on one thread"""
+        from flask import Flask
+
+        from asgi import ExpenseTrackerASGI
+
+        flask_app = Flask(__name__)
+        flask_app.config.update(SECRET_KEY='test', DB_POOL_SIZE=4)
+
+        @flask_app.route('/slow')
+        def slow():
+            time.sleep(0.3)
+            return 'done'
+
+        application = ExpenseTrackerASGI(flask_app)
+
+        async def two_requests():
+            return await asyncio.gather(*(asgi_request('/slow', application=application) for _ in range(2)))
+
+        started = time.perf_counter()
+        responses = asyncio.run(two_requests())
+        elapsed = time.perf_counter() - started
+        application.wsgi_executor.shutdown()
+
+        assert [(status, body) for status, _, body in responses] == [(200, b'done')] * 2
+        assert elapsed < 0.55
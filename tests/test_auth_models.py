@@ -0,0 +1,36 @@
+"""
+Tests for the User model and its identity cache
+"""
+
+from auth_models import User
+
+
+class TestUser:
+    """Test cases for User"""
+
+    def test_user_is_compact(self):
+        """Test users carry no per-instance __dict__"""
+        user = User(1, 'tester', 'tester@example.com', 'hash')
+
+        assert not hasattr(user, '__dict__')
+        assert user.get_id() == '1'
+        assert user.is_authenticated
+
+    def test_get_by_id_is_cached(self, database):
+        """Test repeated lookups are served from the cache"""
+        created = User.create_user('tester', 'tester@example.com', 'secret')
+
+        first = User.get_by_id(created.id)
+        second = User.get_by_id(created.id)
+
+        assert first is second
+        assert first == created
+
+    def test_invalidate_forces_reload(self, database):
+        """Test an invalidated user is read again from the database"""
+        created = User.create_user('tester', 'tester@example.com', 'secret')
+        first = User.get_by_id(created.id)
+
+        User.invalidate(created.id)
+
+        assert User.get_by_id(created.id) is not first
@@ -0,0 +1,94 @@
+"""
+Tests for the batch mutation API
+"""
+
+from batch import apply_batch
+from database_sqlite import get_db_connection
+from models import Expense
+from rollups import verify_rollups
+
+
+def rollups_consistent():
+    connection = get_db_connection()
+    mismatches = verify_rollups(connection.cursor())
+    connection.close()
+    return mismatches == []
+
+
+class TestApplyBatch:
+    """Test cases for apply_batch"""
+
+    def test_mixed_operations_report_per_operation(self, database):
+        """Test creates, updates and deletes apply together and failures stay isolated"""
+        kept = Expense(10, 'Travel', '2025-01-01').save(user_id=1)
+        doomed = Expense(5, 'Other', '2025-01-02').save(user_id=1)
+        version = Expense.get_data_version(1)
+
+        results = apply_batch(1, [
+            {'op': 'create', 'amount': 7.5, 'category': 'Shopping', 'date': '2025-02-01'},
+            {'op': 'update', 'id': kept, 'amount': 12},
+            {'op': 'delete', 'id': doomed},
+            {'op': 'create', 'amount': 1, 'category': 'Nope', 'date': '2025-02-01'},
+            {'op': 'rename', 'id': kept},
+        ])
+
+        assert [result['status'] for result in results] == ['created', 'updated', 'deleted', 'error', 'error']
+        assert Expense.get_by_id(kept)['amount_minor'] == 1200
+        assert Expense.get_by_id(kept)['category'] == 'Travel'
+        assert Expense.get_by_id(doomed) is None
+        assert Expense.get_analytics(1)['total_spending'] == 1950
+        assert Expense.get_data_version(1) == version + 1
+        assert rollups_consistent()
+
+    def test_other_users_rows_are_not_found(self, database):
+        """Test a batch cannot touch another user's expenses"""
+        foreign = Expense(10, 'Travel', '2025-01-01').save(user_id=2)
+
+        results = apply_batch(1, [{'op': 'delete', 'id': foreign}])
+
+        assert results[0]['status'] == 'error'
+        assert Expense.get_by_id(foreign) is not None
+
+    def test_atomic_batch_rolls_back_on_failure(self, database):
+        """Test atomic batches apply all operations or none"""
+        results = apply_batch(1, [
+            {'op': 'create', 'amount': 3, 'category': 'Travel', 'date': '2025-01-01'},
+            {'op': 'update', 'id': 999, 'amount': 1},
+            {'op': 'create', 'amount': 4, 'category': 'Travel', 'date': '2025-01-01'},
+        ], atomic=True)
+
+        assert [result['status'] for result in results] == ['rolled_back', 'error', 'rolled_back']
+        assert Expense.get_all(user_id=1) == []
+        assert Expense.get_data_version(1) == 0
+        assert rollups_consistent()
+
+    def test_oversized_amount_fails_only_its_operation(self, client):
+        """Test an amount too large to store is an error result, not a 500 for the batch"""
+        kept = Expense(10, 'Travel', '2025-01-01').save(user_id=1)
+
+        response = client.post('/api/expenses/batch', json={'operations': [
+            {'op': 'create', 'amount': 3, 'category': 'Travel', 'date': '2025-01-01'},
+            {'op': 'create', 'amount': 1e30, 'category': 'Travel', 'date': '2025-01-01'},
+            {'op': 'update', 'id': kept, 'amount': 10 ** 30},
+            {'op': 'update', 'id': kept, 'amount': 12},
+        ]})
+
+        assert response.status_code == 200
+        results = response.get_json()['results']
+        assert [result['status'] for result in results] == ['created', 'error', 'error', 'updated']
+        assert 'too large' in results[1]['error']
+        assert Expense.get_by_id(kept)['amount_minor'] == 1200
+        assert rollups_consistent()
+
+    def test_endpoint(self, client):
+        """Test the batch endpoint validates the body and returns counts"""
+        assert client.post('/api/expenses/batch', json={'ops': []}).status_code == 400
+
+        response = client.post('/api/expenses/batch', json={'operations': [
+            {'op': 'create', 'amount': 3, 'category': 'Travel', 'date': '2025-01-01'},
+            {'op': 'delete', 'id': 12345},
+        ]})
+
+        assert response.status_code == 200
+        body = response.get_json()
+        assert (body['applied'], body['failed']) == (1, 1)
@@ -0,0 +1,74 @@
+"""
+Tests for the benchmark data generator, baseline comparison and load test helpers
+"""
+
+import random
+
+import pytest
+
+from benchmarks.datagen import generate_expenses, populate
+from benchmarks.loadtest import flashed_messages, parse_mix, summarize
+from benchmarks.suite import compare
+from database_sqlite import get_db_connection
+from models import Expense
+from rollups import verify_rollups
+
+
+class TestBenchmarks:
+    """Test cases for the benchmark helpers"""
+
+    def test_generator_is_seeded(self):
+        """Test the same seed always yields the same expenses"""
+        first = list(generate_expenses(random.Random(7), 50))
+        second = list(generate_expenses(random.Random(7), 50))
+
+        assert first == second
+        assert first != list(generate_expenses(random.Random(8), 50))
+
+    def test_populate_keeps_derived_tables_consistent(self, database):
+        """Test generated data comes with matching rollups and data versions"""
+        connection = get_db_connection()
+        user_ids = populate(connection, users=2, expenses_per_user=200, seed=1)
+
+        assert len(Expense.get_all(user_id=user_ids[0])) == 200
+        assert Expense.get_analytics(user_ids[1])['expense_count'] == 200
+        assert Expense.get_data_version(user_ids[0]) == 1
+        assert verify_rollups(connection.cursor()) == []
+        connection.close()
+
+    def test_compare_flags_only_real_regressions(self):
+        """Test slowdowns past the tolerance are flagged, tiny absolute changes are not"""
+        baseline = {'results': {'1000': {'slow': {'median_ms': 10.0}, 'tiny': {'median_ms': 0.01},
+                                         'fine': {'median_ms': 5.0}}}}
+        current = {'results': {'1000': {'slow': {'median_ms': 13.0}, 'tiny': {'median_ms': 0.03},
+                                        'fine': {'median_ms': 5.5}, 'new': {'median_ms': 1.0}}}}
+
+        rows, regressions = compare(current, baseline, tolerance=0.2)
+
+        assert len(rows) == 3
+        assert [row['benchmark'] for row in regressions] == ['slow']
+
+    def test_flashed_messages_are_read_from_the_session_cookie(self, client):
+        """Test the load test sees errors the app only reports as flashes behind a redirect"""
+        response = client.post('/add', data={'amount': '1.50', 'category': 'Other', 'date': '2025-01-01'})
+        cookie = response.headers['Set-Cookie'].split(';')[0].split('=', 1)[1]
+
+        assert response.status_code == 302
+        assert flashed_messages(cookie)[-1] == ('success', 'Expense added successfully!')
+        assert flashed_messages('garbage') == []
+
+    def test_mix_and_summary(self):
+        """Test mix parsing and per-route percentiles, errors and locked counts"""
+        assert parse_mix('index=3,add') == {'index': 3.0, 'add': 1.0}
+        with pytest.raises(ValueError):
+            parse_mix('delete=1')
+
+        samples = [{'route': 'GET /', 'latency': n / 1000, 'error': None, 'locked': False} for n in range(1, 101)]
+        samples.append({'route': 'POST /add', 'latency': 0.5, 'error': 'database is locked', 'locked': True})
+        report = summarize(samples, elapsed=10)
+
+        assert report['GET /']['p50_ms'] == 51.0
+        assert report['GET /']['p99_ms'] == 100.0
+        assert report['ALL']['requests'] == 101
+        assert report['ALL']['throughput_rps'] == 10.1
+        assert report['POST /add']['database_locked'] == 1
@@ -0,0 +1,63 @@
+"""
+Tests for the result cache and its invalidation
+"""
+
+import time
+
+from cache import FileBackend, MemoryBackend, VersionedCache
+from models import Expense
+
+
+class TestCacheBackends:
+    """Test cases for the LRU/TTL backends"""
+
+    def test_memory_backend_evicts_least_recently_used(self):
+        """Test the oldest untouched entry is dropped when full"""
+        backend = MemoryBackend(max_entries=2)
+        backend.set('a', 1)
+        backend.set('b', 2)
+        backend.get('a')
+        backend.set('c', 3)
+
+        assert backend.get('a') == 1
+        assert backend.get('b') is None
+        assert backend.get('c') == 3
+
+    def test_memory_backend_expires_entries(self):
+        """Test entries older than the TTL are misses"""
+        backend = MemoryBackend(ttl=0.01)
+        backend.set('a', 1)
+        time.sleep(0.02)
+
+        assert backend.get('a') is None
+
+    def test_file_backend_is_shared_between_instances(self, tmp_path):
+        """Test two workers pointed at one directory see each other's entries"""
+        writer = FileBackend(str(tmp_path))
+        reader = FileBackend(str(tmp_path))
+        writer.set(('analytics', 1), {'total': 5})
+
+        assert reader.get(('analytics', 1)) == {'total': 5}
+        reader.delete(('analytics', 1))
+        assert writer.get(('analytics', 1)) is None
+
+
+class TestVersionedCache:
+    """Test cases for data-version invalidation"""
+
+    def test_write_invalidates_cached_analytics(self, database):
+        """Test saving an expense bumps the version and forces a recompute"""
+        cache = VersionedCache(MemoryBackend())
+
+        def cached():
+            version = Expense.get_data_version(1)
+            return cache.get_or_compute(('analytics', 1), version, lambda: Expense.get_analytics(1))
+
+        Expense(10, 'Rent', '2025-01-01').save()
+        assert cached()['total_spending'] == 1000
+        assert cached()['total_spending'] == 1000
+        Expense(5, 'Rent', '2025-01-02').save()
+
+        assert cached()['total_spending'] == 1500
+        assert cache.stats()['hits'] == 1
+        assert cache.stats()['misses'] == 2
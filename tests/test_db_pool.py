@@ -0,0 +1,70 @@
+"""
+Tests for the SQLite connection pool
+"""
+
+import pytest
+from config import Config, storage_settings
+from db_pool import ConnectionPool, PoolTimeout
+
+
+class TestConnectionPool:
+    """Test cases for ConnectionPool"""
+
+    def test_connections_are_reused(self, tmp_path):
+        """Test closing a checked-out connection returns it to the pool"""
+        pool = ConnectionPool(str(tmp_path / 'pool.db'), size=2)
+
+        first = pool.connection()
+        raw = first._connection
+        first.close()
+        second = pool.connection()
+
+        assert second._connection is raw
+        assert pool.stats()['created_total'] == 1
+
+    def test_pool_size_is_enforced(self, tmp_path):
+        """Test checkout times out once every connection is in use"""
+        pool = ConnectionPool(str(tmp_path / 'pool.db'), size=1, timeout=0.05)
+        pool.connection()
+
+        with pytest.raises(PoolTimeout):
+            pool.connection()
+
+    def test_release_rolls_back_open_transaction(self, tmp_path):
+        """Test uncommitted work is discarded when a connection is released"""
+        pool = ConnectionPool(str(tmp_path / 'pool.db'), size=1)
+        connection = pool.connection()
+        connection.execute('CREATE TABLE t (x INTEGER)')
+        connection.execute('INSERT INTO t VALUES (1)')
+        connection.close()
+
+        connection = pool.connection()
+        assert connection.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 0
+
+    def test_storage_pragmas_applied(self, tmp_path):
+        """Test every new connection gets WAL mode and a busy timeout"""
+        settings = storage_settings(Config)
+        settings['database'] = str(tmp_path / 'pool.db')
+        pool = ConnectionPool(**settings)
+        connection = pool.connection()
+
+        assert connection.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert connection.execute('PRAGMA busy_timeout').fetchone()[0] == Config.SQLITE_BUSY_TIMEOUT
+
+    def test_read_only_connection_is_outside_the_pool(self, tmp_path):
+        """Test readers for long streams neither wait for nor take a pooled connection"""
+        import sqlite3
+
+        pool = ConnectionPool(str(tmp_path / 'pool.db'), size=1, timeout=0.05)
+        writer = pool.connection()
+        writer.execute('CREATE TABLE t (x INTEGER)')
+        writer.execute('INSERT INTO t VALUES (1)')
+        writer.commit()
+
+        reader = pool.read_only_connection()
+        assert reader.execute('SELECT x FROM t').fetchone()[0] == 1
+        with pytest.raises(sqlite3.OperationalError):
+            reader.execute('INSERT INTO t VALUES (2)')
+        reader.close()
+
+        assert pool.stats()['in_use'] == 1
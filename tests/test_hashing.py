@@ -0,0 +1,82 @@
+"""
+Tests for the password hashing pool
+"""
+
+import threading
+
+import pytest
+
+from hashing import HashingOverloaded, HashingPool
+
+
+class TestHashingPool:
+    """Test cases for HashingPool"""
+
+    def test_hash_round_trip_in_worker_process(self):
+        """Test hashes made in the process pool verify correctly"""
+        pool = HashingPool(workers=1, max_pending=2)
+
+        password_hash = pool.generate_password_hash('secret')
+
+        assert pool.check_password_hash(password_hash, 'secret')
+        assert not pool.check_password_hash(password_hash, 'wrong')
+        assert pool.stats()['completed'] == 3
+
+    def test_rejects_work_beyond_queue_limit(self):
+        """Test a saturated pool sheds load instead of queueing"""
+        pool = HashingPool(workers=0, max_pending=1)
+        started, release = threading.Event(), threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+
+        worker = threading.Thread(target=pool.run, args=(slow,))
+        worker.start()
+        started.wait(5)
+        try:
+            with pytest.raises(HashingOverloaded):
+                pool.generate_password_hash('secret')
+        finally:
+            release.set()
+            worker.join()
+
+        assert pool.stats()['rejected'] == 1
+
+    def test_timed_out_hash_keeps_its_slot(self, monkeypatch):
+        """Test a hash that outlives its timeout still counts until it finishes"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        pool = HashingPool(workers=1, max_pending=1, timeout=0.05)
+        executor = ThreadPoolExecutor(1)
+        monkeypatch.setattr(pool, '_get_executor', lambda: executor)
+        release = threading.Event()
+
+        with pytest.raises(HashingOverloaded, match='timed out'):
+            pool.run(release.wait, 5)
+        assert pool.stats()['in_flight'] == 1
+        with pytest.raises(HashingOverloaded, match='in progress'):
+            pool.run(len, 'queued')
+
+        release.set()
+        executor.submit(int).result()  # the single worker has finished the timed-out hash
+        assert pool.stats()['in_flight'] == 0
+        assert pool.run(len, 'free') == 4
+        executor.shutdown()
+
+    def test_overload_returns_503(self, database, monkeypatch):
+        """Test the app answers 503 with Retry-After when hashing is saturated"""
+        from app import app
+        import auth_models
+
+        def overloaded(*args):
+            raise HashingOverloaded('busy', retry_after=2)
+
+        monkeypatch.setattr(auth_models, 'generate_password_hash', overloaded)
+        response = app.test_client().post('/signup', data={
+            'username': 'tester', 'email': 'tester@example.com',
+            'password': 'secret', 'confirm_password': 'secret',
+        })
+
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '2'
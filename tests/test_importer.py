@@ -0,0 +1,74 @@
+"""
+Tests for bulk CSV import
+"""
+
+import io
+
+import pytest
+
+from database_sqlite import get_db_connection
+from importer import import_csv
+from models import Expense
+from rollups import verify_rollups
+
+CSV = """amount,category,date,description
+12.50,Food & Dining,2025-01-03,Lunch
+abc,Food & Dining,2025-01-03,Bad amount
+30,Groceries,2025-01-04,Unknown category
+45,Transportation,2025-02-30,Impossible date
+8,Transportation,2025-01-05,
+"""
+
+
+class TestImportCsv:
+    """Test cases for import_csv"""
+
+    def test_valid_rows_imported_and_errors_reported(self, database):
+        """Test invalid rows are skipped with their row numbers"""
+        report = import_csv(io.StringIO(CSV), user_id=1, chunk_size=1)
+
+        assert report['imported'] == 2
+        assert report['failed'] == 3
+        assert [error['row'] for error in report['errors']] == [3, 4, 5]
+        assert Expense.get_analytics(1)['total_spending'] == 2050
+
+        connection = get_db_connection()
+        assert verify_rollups(connection.cursor()) == []
+        connection.close()
+
+    def test_oversized_amount_is_a_row_error(self, database):
+        """Test an amount beyond SQLite's integers is reported instead of aborting the import"""
+        csv = 'amount,category,date\n1e30,Other,2025-01-01\n5,Other,2025-01-02\n'
+
+        report = import_csv(io.StringIO(csv), user_id=1)
+
+        assert report['imported'] == 1
+        assert [(error['row'], error['error']) for error in report['errors']] == [(2, "Amount '1e30' is too large")]
+
+    def test_imported_rows_are_searchable(self, database):
+        """Test chunks are indexed for search in bulk and later saves still use the trigger"""
+        Expense(5, 'Shopping', '2025-01-01', 'Lunch box').save(1)
+        import_csv(io.StringIO(CSV), user_id=1, chunk_size=1)
+        Expense(9, 'Food & Dining', '2025-01-06', 'Lunch again').save(1)
+
+        results, _ = Expense.search(1, 'lunch')
+        assert sorted(row['description'] for row in results) == ['Lunch', 'Lunch again', 'Lunch box']
+        assert [row['amount_minor'] for row in Expense.search(1, 'transportation')[0]] == [800]
+
+        connection = get_db_connection()
+        assert connection.execute('SELECT COUNT(*) FROM expenses_fts_deferred').fetchone()[0] == 0
+        connection.close()
+
+    def test_missing_columns_rejected(self, database):
+        """Test a file without the required header is refused outright"""
+        with pytest.raises(ValueError, match='category'):
+            import_csv(io.StringIO('amount,date\n1,2025-01-01\n'), user_id=1)
+
+    def test_upload_endpoint(self, client):
+        """Test the import endpoint returns the report as JSON"""
+        response = client.post('/api/expenses/import', data={
+            'file': (io.BytesIO(CSV.encode()), 'expenses.csv'),
+        })
+
+        assert response.status_code == 200
+        assert response.get_json()['imported'] == 2
@@ -0,0 +1,70 @@
+"""
+Tests for the Prometheus metrics endpoint
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import metrics
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+class TestMetrics:
+    """Test cases for metrics collection and exposition"""
+
+    def test_metrics_endpoint_reports_requests_and_queries(self, client):
+        """Test /metrics exposes route histograms, SQL latency and pool gauges"""
+        client.get('/api/expenses')
+        client.get('/api/expenses')
+
+        response = client.get('/metrics')
+        body = response.get_data(as_text=True)
+
+        assert response.mimetype == 'text/plain'
+        assert '# TYPE expense_tracker_http_request_duration_seconds histogram' in body
+        assert 'expense_tracker_http_request_duration_seconds_bucket{route="/api/expenses",method="GET",le="+Inf"}' in body
+        assert 'expense_tracker_http_requests_total{route="/api/expenses",method="GET",status="200"}' in body
+        assert 'expense_tracker_db_query_duration_seconds_count ' in body
+        assert f'expense_tracker_db_pool_connections{{state="open",pid="{os.getpid()}"}}' in body
+        assert 'expense_tracker_cache_lookups_total{cache="users",result="hit"}' in body
+
+    def test_health_is_quiet(self, client, capsys):
+        """Test the health check no longer prints on every call"""
+        assert client.get('/health').status_code == 200
+        assert capsys.readouterr().out == ''
+
+    def test_workers_are_summed(self, tmp_path):
+        """Test counters and histograms add up across workers; gauges stay per live worker"""
+        registry = metrics.Registry()
+        requests = registry.register(metrics.Counter('requests_total', 'Requests', ('route',)))
+        latency = registry.register(metrics.Histogram('latency_seconds', 'Latency', buckets=(0.1, 1)))
+        registry.collect('open_connections', 'Open connections')(lambda: [({}, 3)])
+        requests.inc('/')
+        latency.observe(0.5)
+
+        store = metrics.SnapshotStore(str(tmp_path))
+        store.flush(registry, force=True)
+        exited = dead_pid()
+        sibling = (tmp_path / f'{os.getppid()}-{exited}.json')
+        sibling.write_text(json.dumps(registry.snapshot()))
+
+        body = metrics.render(metrics.merge_snapshots(store.load()))
+
+        assert 'requests_total{route="/"} 2' in body
+        assert 'latency_seconds_bucket{le="0.1"} 0' in body
+        assert 'latency_seconds_bucket{le="1"} 2' in body
+        assert 'latency_seconds_count 2' in body
+        assert f'open_connections{{pid="{os.getpid()}"}} 3' in body
+        assert f'pid="{exited}"' not in body
+
+        # The exited worker's file is gone, but its totals are not
+        assert not sibling.exists()
+        assert (tmp_path / f'{os.getppid()}-retired.json').exists()
+        assert 'requests_total{route="/"} 2' in metrics.render(metrics.merge_snapshots(store.load()))
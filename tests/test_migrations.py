@@ -0,0 +1,95 @@
+"""
+Tests for schema migrations and the query plans they enable
+"""
+
+import sqlite3
+
+import db_pool
+from database_sqlite import get_db_connection
+from migrations import current_version, latest_version, migrate
+from models import Expense, encode_cursor
+
+
+def query_plans(call):
+    """Run a model call and return the EXPLAIN QUERY PLAN text of each statement it issued"""
+    statements = []
+    connection = get_db_connection()
+    connection.set_trace_callback(statements.append)
+    connection.close()
+    try:
+        call()
+    finally:
+        connection = get_db_connection()
+        connection.set_trace_callback(None)
+
+    plans = []
+    for statement in statements:
+        rows = connection.execute(f'EXPLAIN QUERY PLAN {statement}').fetchall()
+        plans.append(' | '.join(row['detail'] for row in rows))
+    connection.close()
+    return plans
+
+
+class TestMigrations:
+    """Test cases for the migration runner"""
+
+    def test_fresh_database_reaches_latest_version(self, database):
+        """Test init applies every migration and re-running is a no-op"""
+        connection = get_db_connection()
+
+        assert current_version(connection.cursor()) == latest_version()
+        assert migrate(connection) == latest_version()
+        connection.close()
+
+    def test_amounts_move_to_minor_units(self, tmp_path):
+        """Test migration 9 converts REAL amounts and keeps ids, search and rollups working"""
+        connection = sqlite3.connect(tmp_path / 'old.db')
+        migrate(connection, target=8)
+        connection.executemany(
+            "INSERT INTO expenses (user_id, amount, category, date, description) VALUES (1, ?, 'Other', ?, ?)",
+            [(0.1 + 0.2, '2025-01-01', 'Coffee beans'), (19.999, '2025-01-02', 'Taxi'), (5, '2025-02-01', 'Gone')])
+        connection.execute('DELETE FROM expenses WHERE id = 3')
+        connection.commit()
+
+        assert migrate(connection) == latest_version()
+        assert connection.execute('SELECT id, amount_minor FROM expenses').fetchall() == [(1, 30), (2, 2000)]
+        assert connection.execute('SELECT total, count FROM expense_category_rollup').fetchall() == [(2030, 2)]
+        assert connection.execute("SELECT rowid FROM expenses_fts WHERE expenses_fts MATCH 'coffee'").fetchall() == [(1,)]
+        indexes = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {'idx_date_created', 'idx_user_date_created', 'idx_user_change_seq'} <= indexes
+        # The deleted row's id is not handed out again
+        connection.execute("INSERT INTO expenses (user_id, amount_minor, category, date) VALUES (1, 1, 'Other', '2025-03-01')")
+        assert connection.execute('SELECT max(id) FROM expenses').fetchone() == (4,)
+        connection.close()
+
+    def test_user_listing_uses_composite_index(self, database):
+        """Test paging a user's expenses walks the index without a sort"""
+        db_pool.configure_pool(size=1)
+        cursor = encode_cursor({'date': '2025-01-01', 'created_at': '2025-01-01 00:00:00', 'id': 1})
+
+        first_page, second_page = query_plans(lambda: (
+            Expense.get_page(1, limit=10),
+            Expense.get_page(1, limit=10, cursor=cursor),
+        ))
+
+        for plan in (first_page, second_page):
+            assert 'USING INDEX idx_user_date_created' in plan
+            assert 'TEMP B-TREE' not in plan
+
+    def test_date_range_uses_date_index(self, database):
+        """Test the cross-user date range query is index-driven"""
+        db_pool.configure_pool(size=1)
+
+        plans = query_plans(lambda: Expense.get_by_date_range('2025-01-01', '2025-01-31'))
+
+        assert 'USING INDEX idx_date_created (date>? AND date<?)' in plans[0]
+        assert 'TEMP B-TREE' not in plans[0]
+
+    def test_delta_sync_uses_change_indexes(self, database):
+        """Test both halves of the changes query seek on the change sequence"""
+        db_pool.configure_pool(size=1)
+
+        plans = query_plans(lambda: Expense.get_changes(1, since='3'))
+
+        assert 'USING INDEX idx_user_change_seq (user_id=? AND change_seq>?)' in plans[0]
+        assert 'expense_tombstones USING PRIMARY KEY (user_id=? AND (change_seq,expense_id)>(?,?))' in plans[0]
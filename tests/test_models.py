@@ -47,6 +47,138 @@ class TestExpense:
         assert isinstance(expense.amount, float)
         assert expense.amount == 75.25
 
+
+class TestExpenseQueries:
+    """Test cases for Expense database operations"""
+    
+    def test_get_analytics_matches_calculate_analytics(self, database):
+        """Test SQL aggregation returns the same numbers as the Python version"""
+        from app import calculate_analytics
+        
+        for amount, category, date in [
+            (100.10, "Food & Dining", "2025-01-05"),
+            (20.20, "Food & Dining", "2025-02-01"),
+            (5.05, "Transportation", "2025-02-14"),
+            (1200, "Rent", "2025-02-01"),
+        ]:
+            Expense(amount, category, date).save()
+        
+        expected = calculate_analytics(Expense.get_all(user_id=1))
+        
+        assert Expense.get_analytics(user_id=1) == expected
+        assert expected['total_spending'] == 132535
+        assert expected['category_totals']['Food & Dining'] == 12030
+        assert Expense.get_analytics(user_id=2) == calculate_analytics([])
+
+    def test_rollups_follow_edits_and_deletes(self, database):
+        """Test rollups stay consistent when an edit moves month and category"""
+        from app import calculate_analytics
+        from database_sqlite import get_db_connection
+        from rollups import verify_rollups
+        
+        kept = Expense(40, "Shopping", "2025-03-10").save()
+        moved = Expense(15, "Shopping", "2025-03-11").save()
+        removed = Expense(60, "Travel", "2025-04-01").save()
+        
+        Expense(25, "Entertainment", "2025-05-02", expense_id=moved).save()
+        Expense.delete(removed)
+        
+        analytics = Expense.get_analytics(user_id=1)
+        assert analytics == calculate_analytics(Expense.get_all(user_id=1))
+        assert analytics['monthly_totals'] == {'2025-03': 4000, '2025-05': 2500}
+        assert 'Travel' not in analytics['category_totals']
+        
+        connection = get_db_connection()
+        assert verify_rollups(connection.cursor()) == []
+        connection.close()
+
+    def test_changes_since_token(self, database):
+        """Test delta sync returns only later edits, deletes as tombstones"""
+        first = Expense(10, "Travel", "2025-01-01").save(user_id=1)
+        second = Expense(20, "Travel", "2025-01-02").save(user_id=1)
+        
+        changed, deleted, since, has_more = Expense.get_changes(1)
+        assert [row['id'] for row in changed] == [first, second]
+        assert (deleted, has_more) == ([], False)
+        
+        Expense(12, "Travel", "2025-01-01", expense_id=first).save()
+        Expense.delete(second)
+        third = Expense(30, "Rent", "2025-01-03").save(user_id=1)
+        
+        changed, deleted, since, has_more = Expense.get_changes(1, since=since)
+        assert [(row['id'], row['amount_minor']) for row in changed] == [(first, 1200), (third, 3000)]
+        assert changed[0]['updated_at'] is not None
+        assert deleted == [second]
+        assert Expense.get_changes(1, since=since) == ([], [], since, False)
+    
+    def test_changes_paginate_within_one_version(self, database):
+        """Test a sync page may end mid-version and resume without gaps"""
+        from batch import apply_batch
+        
+        apply_batch(1, [{'op': 'create', 'amount': n, 'category': 'Other', 'date': '2025-01-01'}
+                        for n in range(5)])
+        
+        seen = []
+        since, has_more = None, True
+        while has_more:
+            changed, _, since, has_more = Expense.get_changes(1, since=since, limit=2)
+            seen += [row['amount_minor'] for row in changed]
+        assert seen == [0, 100, 200, 300, 400]
+        assert Expense.get_changes(1, since='1') == ([], [], '1', False)
+
+    def test_pruned_tombstones_expire_old_tokens(self, database):
+        """Test pruning drops old deletes and refuses tokens that still needed them"""
+        from database_sqlite import get_db_connection
+        from models import SyncTokenExpired
+        
+        kept = Expense(10, "Travel", "2025-01-01").save(user_id=1)
+        old = Expense(20, "Travel", "2025-01-02").save(user_id=1)
+        _, _, stale_since, _ = Expense.get_changes(1)
+        Expense.delete(old)
+        _, _, current_since, _ = Expense.get_changes(1, since=stale_since)
+        connection = get_db_connection()
+        connection.execute("UPDATE expense_tombstones SET deleted_at = datetime('now', '-40 days')")
+        connection.commit()
+        connection.close()
+        recent = Expense(30, "Rent", "2025-01-03").save(user_id=1)
+        Expense.delete(recent)
+        
+        assert Expense.prune_tombstones(30) == 1
+        with pytest.raises(SyncTokenExpired):
+            Expense.get_changes(1, since=stale_since)
+        assert Expense.get_changes(1, since=current_since)[1] == [recent]
+        assert [row['id'] for row in Expense.get_changes(1)[0]] == [kept]
+        assert Expense.get_changes(1, since='0')[1] == [recent]
+        assert Expense.prune_tombstones(30) == 0
+
+    def test_search_ranks_and_filters(self, database):
+        """Test full-text search follows edits and deletes and combines filters"""
+        taxi = Expense(30, "Transportation", "2025-01-02", "Taxi to airport").save(user_id=1)
+        Expense(900, "Travel", "2025-01-03", "Flight to Lisbon, airport lounge").save(user_id=1)
+        Expense(12, "Food & Dining", "2025-01-04", "Airport coffee").save(user_id=2)
+        
+        results, has_more = Expense.search(1, 'airp')
+        assert len(results) == 2 and not has_more
+        assert Expense.search(1, 'airport', max_amount_minor=10000)[0][0]['id'] == taxi
+        assert Expense.search(1, 'airport', start_date='2025-01-03')[0][0]['amount_minor'] == 90000
+        assert [row['id'] for row in Expense.search(1, 'transportation')[0]] == [taxi]
+        
+        Expense(30, "Transportation", "2025-01-02", "Bus ticket", expense_id=taxi).save()
+        assert [row['id'] for row in Expense.search(1, 'bus')[0]] == [taxi]
+        assert len(Expense.search(1, 'airport')[0]) == 1
+        Expense.delete(taxi)
+        assert Expense.search(1, 'bus')[0] == []
+        assert Expense.search(1, '"*)(')[0] == Expense.search(1, None)[0]
+
+    def test_search_ignores_the_user_id_column(self, database):
+        """Test a query that is a digit of the user's id only matches text, not the scope"""
+        for day in range(1, 4):
+            Expense(10, "Shopping", f"2025-01-0{day}", "Groceries").save(user_id=12)
+        receipt = Expense(10, "Shopping", "2025-01-04", "Receipt 1042").save(user_id=12)
+        
+        assert [row['id'] for row in Expense.search(12, '1')[0]] == [receipt]
+        assert Expense.search(12, '12')[0] == []
+
 # Add more tests as needed
 # Example: Test database operations, API endpoints, etc.
 
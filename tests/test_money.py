@@ -0,0 +1,39 @@
+"""
+Tests for money amount parsing and formatting
+"""
+
+from decimal import Decimal
+
+import pytest
+
+from money import analytics_json, average_minor, expense_json, format_amount, to_minor
+
+
+class TestMoney:
+    """Test cases for minor-unit conversions"""
+
+    def test_to_minor_is_exact_and_rounds_half_up(self):
+        """Test floats, strings and Decimals convert without binary rounding error"""
+        assert to_minor(0.1 + 0.2) == 30
+        assert to_minor('12.5') == 1250
+        assert to_minor(' 7 ') == 700
+        assert to_minor(Decimal('0.005')) == 1
+        assert to_minor(1.005) == 101
+
+    @pytest.mark.parametrize('amount', ['abc', '', 'nan', 'inf', None, '1e30', -1e30])
+    def test_to_minor_rejects_non_numbers(self, amount):
+        """Test invalid and non-finite amounts raise ValueError"""
+        with pytest.raises(ValueError):
+            to_minor(amount)
+
+    def test_formatting_and_averages(self):
+        """Test display strings, rounded means and JSON rows"""
+        assert format_amount(1250) == '12.50'
+        assert format_amount(-5) == '-0.05'
+        assert average_minor(10, 4) == 3
+        assert average_minor(10, 3) == 3
+        assert expense_json({'id': 1, 'amount_minor': 1999}) == {'id': 1, 'amount': 19.99}
+        assert analytics_json({'total_spending': 2050, 'expense_count': 2, 'average_expense': 1025,
+                               'category_totals': {'Rent': 2050}, 'monthly_totals': {'2025-01': 2050}}) == {
+            'total_spending': 20.5, 'expense_count': 2, 'average_expense': 10.25,
+            'category_totals': {'Rent': 20.5}, 'monthly_totals': {'2025-01': 20.5}}
@@ -0,0 +1,59 @@
+"""
+Tests for request profiling
+"""
+
+import pytest
+from flask import Flask, jsonify, render_template_string
+
+import db_pool
+import profiling
+from database_sqlite import get_db_connection
+
+
+@pytest.fixture
+def profiled_app(database, tmp_path):
+    """A small app with profiling enabled and one route that queries and renders"""
+    app = Flask(__name__)
+    app.config.update(PROFILING_ENABLED=True, PROFILING_TOKEN='letmein',
+                      PROFILE_SAMPLE_EVERY=1, PROFILE_DIR=str(tmp_path / 'profiles'))
+    app.teardown_appcontext(db_pool.release_request_connection)
+    profiling.init_app(app)
+
+    @app.route('/work')
+    def work():
+        connection = get_db_connection()
+        for _ in range(3):
+            connection.execute('SELECT COUNT(*) FROM expenses').fetchone()
+        connection.close()
+        return render_template_string('{{ value }}', value=1)
+
+    @app.route('/data')
+    def data():
+        return jsonify({'values': list(range(100))})
+
+    profiling.request_stats.clear()
+    yield app
+    db_pool.remove_query_listener(profiling._on_query)
+
+
+class TestProfiling:
+    """Test cases for the profiling middleware"""
+
+    def test_server_timing_counts_queries(self, profiled_app, tmp_path):
+        """Test each response reports its SQL, template and JSON time"""
+        client = profiled_app.test_client()
+
+        timing = client.get('/work').headers['Server-Timing']
+        assert 'db;dur=' in timing and 'desc="3 queries"' in timing
+        assert 'json;dur=' in client.get('/data').headers['Server-Timing']
+        assert len(list((tmp_path / 'profiles').glob('*-work.prof'))) == 1
+
+    def test_summary_requires_token(self, profiled_app):
+        """Test /debug/profile is hidden without the token and aggregates per endpoint"""
+        client = profiled_app.test_client()
+        client.get('/work')
+
+        assert client.get('/debug/profile').status_code == 404
+        summary = client.get('/debug/profile', headers={'X-Profiling-Token': 'letmein'}).get_json()
+        assert summary['endpoints']['work']['avg_queries'] == 3
+        assert summary['endpoints']['work']['avg_template_ms'] > 0
@@ -0,0 +1,60 @@
+"""
+Tests for the slow-query log
+"""
+
+import json
+
+import pytest
+
+import db_pool
+import slow_queries
+from models import Expense
+
+
+@pytest.fixture
+def slow_log(database, tmp_path):
+    """Log every statement to a temporary file"""
+    path = tmp_path / 'slow.log'
+    slow_queries.configure_logging(str(path))
+    listener = slow_queries.SlowQueryLog(threshold_ms=0)
+    db_pool.add_query_listener(listener)
+    yield path
+    db_pool.remove_query_listener(listener)
+
+
+class TestSlowQueryLog:
+    """Test cases for slow-query logging and aggregation"""
+
+    def test_normalize_sql(self):
+        """Test literals and whitespace are normalized away"""
+        assert (slow_queries.normalize_sql("SELECT *\n  FROM expenses WHERE id = 42 AND category = 'it''s'")
+                == 'SELECT * FROM expenses WHERE id = ? AND category = ?')
+
+    def test_entries_carry_caller_shape_and_plan(self, slow_log):
+        """Test a logged statement names the model method and its query plan"""
+        Expense.get_page(1, limit=10)
+
+        entries = [json.loads(line) for line in slow_log.read_text().splitlines()]
+        page = next(entry for entry in entries if entry['caller'] == 'models.Expense.get_page')
+
+        assert page['parameters'] == '(int, int)'
+        assert any('idx_user_date_created' in step for step in page['plan'])
+
+    def test_each_statement_of_a_write_names_its_own_caller(self, slow_log):
+        """Test statements reported after the fact keep the function that issued them"""
+        Expense(12, 'Travel', '2025-01-01').save(user_id=1)
+
+        callers = {entry['sql'].split(' (')[0]: entry['caller']
+                   for entry in map(json.loads, slow_log.read_text().splitlines())}
+
+        assert callers['INSERT INTO expenses'] == 'models.Expense._write'
+        assert callers['BEGIN IMMEDIATE'] == 'write_queue.run_write'
+
+    def test_cli_aggregates_top_offenders(self, slow_log, capsys):
+        """Test the CLI groups repeated statements"""
+        for _ in range(3):
+            Expense.get_page(1, limit=10)
+
+        assert slow_queries.main([str(slow_log), '--sort', 'count', '--top', '50']) == 0
+        output = capsys.readouterr().out
+        assert '3x' in output and 'models.Expense.get_page' in output
@@ -0,0 +1,79 @@
+"""
+Tests for the bucketed spending time series
+"""
+
+from database_sqlite import get_db_connection
+from models import Expense
+from rollups import verify_rollups
+from timeseries import bucket_labels, get_timeseries
+
+
+def add_expenses(user_id=1):
+    for amount, category, date in [
+        (10.0, 'Food & Dining', '2025-01-06'),   # Monday
+        (5.5, 'Transportation', '2025-01-12'),   # Sunday, same week
+        (20.0, 'Food & Dining', '2025-01-13'),
+        (7.25, 'Shopping', '2025-03-02'),
+    ]:
+        Expense(amount, category, date).save(user_id)
+
+
+class TestTimeseries:
+    """Test cases for time series built from the daily rollup"""
+
+    def test_bucket_labels_include_empty_buckets(self):
+        """Test labels run continuously across years and months without data"""
+        assert bucket_labels('month', '2024-11', '2025-02') == ['2024-11', '2024-12', '2025-01', '2025-02']
+        assert bucket_labels('week', '2025-01-06', '2025-01-20') == ['2025-01-06', '2025-01-13', '2025-01-20']
+        assert bucket_labels('year', '2023', '2025') == ['2023', '2024', '2025']
+
+    def test_weeks_start_on_monday_and_split_by_category(self, database):
+        """Test week buckets, zero-filled gaps and per-category series"""
+        add_expenses()
+
+        series = get_timeseries(1, 'week', by_category=True)
+
+        assert series['labels'][:3] == ['2025-01-06', '2025-01-13', '2025-01-20']
+        assert series['labels'][-1] == '2025-02-24'
+        assert series['totals'][:3] == [15.5, 20.0, 0.0]
+        assert series['counts'][:2] == [2, 1]
+        assert series['categories']['Food & Dining'][:2] == [10.0, 20.0]
+        assert series['categories']['Shopping'][-1] == 7.25
+
+    def test_downsampling_preserves_totals(self, database):
+        """Test capping the points merges neighbouring buckets without losing spend"""
+        add_expenses()
+
+        full = get_timeseries(1, 'day')
+        capped = get_timeseries(1, 'day', max_points=10)
+
+        assert len(full['labels']) == 56
+        assert capped['group_size'] == 6
+        assert len(capped['labels']) == 10
+        assert capped['labels'][1] == '2025-01-12'
+        assert capped['totals'][:2] == [10.0, 25.5]
+        assert sum(capped['totals']) == sum(full['totals']) == 42.75
+
+    def test_rollup_follows_edits_and_deletes(self, database):
+        """Test the daily rollup moves with changed and deleted expenses"""
+        add_expenses()
+        expense = Expense.get_all(user_id=1)[0]
+        Expense(1.0, 'Other', '2025-02-01', expense_id=expense['id']).save(1)
+        Expense.delete(Expense.get_all(user_id=1)[-1]['id'])
+
+        assert verify_rollups(get_db_connection().cursor()) == []
+        assert get_timeseries(1, 'month', start_date='2025-02-01')['totals'] == [1.0]
+
+    def test_api_validates_and_caps(self, client, monkeypatch):
+        """Test the endpoint rejects unknown buckets and clamps max_points"""
+        from app import app
+        monkeypatch.setitem(app.config, 'TIMESERIES_MAX_POINTS', 2)
+        client.post('/add', data={'amount': '3.00', 'category': 'Other', 'date': '2025-02-03'})
+        client.post('/add', data={'amount': '4.00', 'category': 'Other', 'date': '2025-02-05'})
+
+        response = client.get('/api/analytics/timeseries?bucket=day&max_points=1000')
+
+        assert response.get_json() == {'bucket': 'day', 'group_size': 2, 'labels': ['2025-02-03', '2025-02-05'],
+                                       'totals': [3.0, 4.0], 'counts': [1, 1]}
+        assert client.get('/api/analytics/timeseries?bucket=hour').status_code == 400
+        assert client.get('/api/analytics/timeseries?start_date=03-02-2025').status_code == 400
@@ -0,0 +1,105 @@
+"""
+Tests for the group-commit writer
+"""
+
+import threading
+
+import pytest
+
+import write_queue
+from database_sqlite import get_db_connection
+from models import Expense
+from rollups import verify_rollups
+
+
+@pytest.fixture
+def writer(database):
+    write_queue.configure_writer(True, max_batch=64, max_delay=0.05)
+    yield write_queue.get_writer()
+    write_queue.configure_writer(False)
+
+
+class TestGroupCommitWriter:
+    """Test cases for GroupCommitWriter"""
+
+    def test_concurrent_saves_share_commits(self, writer):
+        """Test concurrent writes are committed in fewer batches than writes"""
+        ids = []
+        barrier = threading.Barrier(16)
+
+        def save(day):
+            barrier.wait()
+            ids.append(Expense(10, 'Rent', f'2025-01-{day:02d}').save(user_id=1))
+
+        threads = [threading.Thread(target=save, args=(day,)) for day in range(1, 17)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(ids) == list(range(1, 17))
+        assert writer.stats()['operations'] == 16
+        assert writer.stats()['batches'] < 16
+        assert Expense.get_analytics(1)['expense_count'] == 16
+
+        connection = get_db_connection()
+        assert verify_rollups(connection.cursor()) == []
+        connection.close()
+
+    def test_failed_operation_does_not_undo_batch(self, writer):
+        """Test a failing write is rolled back alone and reported to its caller"""
+        def broken(cursor):
+            cursor.execute("INSERT INTO expenses (user_id, amount_minor, category, date) VALUES (1, 500, 'Rent', '2025-01-01')")
+            raise RuntimeError('boom')
+
+        with pytest.raises(RuntimeError):
+            writer.submit(broken)
+        expense_id = Expense(10, 'Rent', '2025-01-02').save(user_id=1)
+
+        assert Expense.delete(expense_id) is True
+        assert Expense.get_all(user_id=1) == []
+
+    def test_writer_survives_a_broken_connection(self, writer, monkeypatch):
+        """Test an error outside any operation fails its batch without killing the thread"""
+        import db_pool
+        pool = db_pool.get_pool()
+        real_connection = pool.connection
+
+        class Broken:
+            def __init__(self):
+                self.connection = real_connection()
+                self.calls = 0
+
+            def cursor(self):
+                self.calls += 1
+                if self.calls == 1:
+                    raise RuntimeError('cursor unavailable')
+                return self.connection.cursor()
+
+            def __getattr__(self, name):
+                return getattr(self.connection, name)
+
+        monkeypatch.setattr(pool, 'connection', Broken)
+
+        with pytest.raises(RuntimeError, match='cursor unavailable'):
+            writer.submit(lambda cursor: None, timeout=5)
+        assert writer.submit(lambda cursor: 42, timeout=5) == 42
+
+    def test_submit_times_out_and_drops_the_write(self, writer):
+        """Test a caller stops waiting after the timeout and its write never runs"""
+        started, release, ran = threading.Event(), threading.Event(), []
+
+        def slow(cursor):
+            started.set()
+            release.wait(5)
+
+        blocker = threading.Thread(target=writer.submit, args=(slow,))
+        blocker.start()
+        started.wait(5)
+        with pytest.raises(write_queue.FutureTimeout):
+            writer.submit(lambda cursor: ran.append(True), timeout=0.05)
+        release.set()
+        blocker.join()
+
+        assert writer.submit(lambda cursor: 'ok') == 'ok'
+        assert ran == []
@@ -0,0 +1,114 @@
+"""
+Spending time series for Expense Tracker
+Sums the daily rollup into day, week, month or year buckets, optionally per
+category, and merges neighbouring buckets so a chart gets at most max_points
+"""
+
+import math
+from datetime import date as Date, timedelta
+
+from database_sqlite import get_db_connection
+from money import to_major
+
+# SQL expression for the label of the bucket containing a date
+BUCKETS = {
+    'day': 'date',
+    'week': "date(date, 'weekday 0', '-6 days')",  # the Monday starting the week
+    'month': 'substr(date, 1, 7)',
+    'year': 'substr(date, 1, 4)',
+}
+
+
+def bucket_labels(bucket, first, last):
+    """Every bucket label from first to last inclusive, empty buckets included"""
+    if bucket == 'year':
+        return [str(year) for year in range(int(first), int(last) + 1)]
+    if bucket == 'month':
+        year, month = int(first[:4]), int(first[5:7])
+        labels = []
+        while True:
+            label = f'{year:04d}-{month:02d}'
+            labels.append(label)
+            if label >= last:
+                return labels
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    step = timedelta(days=7 if bucket == 'week' else 1)
+    day, end = Date.fromisoformat(first), Date.fromisoformat(last)
+    labels = []
+    while day <= end:
+        labels.append(day.isoformat())
+        day += step
+    return labels
+
+
+def load_buckets(user_id, bucket, start_date=None, end_date=None, by_category=False):
+    """(label, category or None, total, count) rows from the daily rollup, ordered by label"""
+    conditions, params = ['user_id = ?'], [user_id]
+    if start_date:
+        conditions.append('date >= ?')
+        params.append(start_date)
+    if end_date:
+        conditions.append('date <= ?')
+        params.append(end_date)
+    category = 'category' if by_category else 'NULL'
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    cursor.execute(f"""
+        SELECT {BUCKETS[bucket]} AS label, {category}, SUM(total), SUM(count)
+        FROM expense_daily_rollup
+        WHERE {' AND '.join(conditions)}
+        GROUP BY label, {category}
+        ORDER BY label
+    """, params)
+    rows = [tuple(row) for row in cursor.fetchall()]
+    cursor.close()
+    connection.close()
+    return rows
+
+
+def downsample(values, group_size):
+    """Sum consecutive runs of group_size values (the last run may be shorter)"""
+    return [sum(values[start:start + group_size]) for start in range(0, len(values), group_size)]
+
+
+def get_timeseries(user_id, bucket='month', start_date=None, end_date=None, by_category=False, max_points=366):
+    """Spending per bucket from the first to the last bucket with expenses
+
+    When there are more buckets than max_points, each point sums group_size
+    consecutive buckets and is labelled with the first of them, so totals
+    are preserved.
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(BUCKETS)}")
+
+    rows = load_buckets(user_id, bucket, start_date, end_date, by_category)
+    labels = bucket_labels(bucket, rows[0][0], rows[-1][0]) if rows else []
+    position = {label: index for index, label in enumerate(labels)}
+    totals = [0] * len(labels)
+    counts = [0] * len(labels)
+    categories = {}
+    for label, category, total, count in rows:
+        index = position[label]
+        totals[index] += total
+        counts[index] += count
+        if by_category:
+            categories.setdefault(category, [0] * len(labels))[index] += total
+
+    group_size = max(1, math.ceil(len(labels) / max_points))
+    if group_size > 1:
+        labels = labels[::group_size]
+        totals = downsample(totals, group_size)
+        counts = downsample(counts, group_size)
+        categories = {name: downsample(values, group_size) for name, values in categories.items()}
+
+    series = {
+        'bucket': bucket,
+        'group_size': group_size,
+        'labels': labels,
+        'totals': [to_major(value) for value in totals],
+        'counts': counts,
+    }
+    if by_category:
+        series['categories'] = {name: [to_major(value) for value in values]
+                                for name, values in categories.items()}
+    return series
@@ -0,0 +1,206 @@
+"""
+Group commit for Expense Tracker writes
+With WRITE_BATCHING on, writes from concurrent requests are queued to one
+writer thread that commits them together in short time- or size-bounded
+batches, so a burst of N writes costs one commit (one fsync) instead of N.
+
+Durability: a caller's write returns only after the batch holding it has
+committed, so an acknowledged write is as durable as a normal commit under
+the configured SQLITE_SYNCHRONOUS. Use FULL if acknowledged writes must
+survive power loss; batching is what keeps that affordable. Each write runs
+in its own SAVEPOINT, so one failing write does not undo the rest of its batch.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeout
+
+import db_pool
+from database_sqlite import get_db_connection
+
+
+class GroupCommitWriter:
+    """Single writer thread that applies queued operations in batched transactions"""
+
+    def __init__(self, max_batch=64, max_delay=0.001, timeout=30.0):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._batches = 0
+        self._operations = 0
+        self._failed = 0
+        self._largest_batch = 0
+        self._commit_seconds = 0.0
+
+    def submit(self, operation, timeout=None):
+        """Queue operation(cursor) and wait for its batch to commit; returns its result
+
+        Waits at most timeout seconds (default: the writer's timeout), then
+        raises TimeoutError. A write that has not started by then is dropped;
+        one that has started may still commit.
+        """
+        self._ensure_running()
+        future = Future()
+        self._queue.put((operation, future))
+        try:
+            return future.result(self.timeout if timeout is None else timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise
+
+    def _ensure_running(self):
+        # The writer thread does not survive a fork into a gunicorn worker
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._thread = None
+                self._pid = os.getpid()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='group-commit-writer', daemon=True)
+                self._thread.start()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        # A connection of its own, outside any request, held for the thread's lifetime
+        try:
+            connection = db_pool.get_pool().connection()
+        except Exception as e:
+            # Fail whatever is waiting; the next submit starts a fresh thread
+            while not self._queue.empty():
+                self._queue.get_nowait()[1].set_exception(e)
+            return
+        while True:
+            batch = self._next_batch()
+            try:
+                self._commit_batch(connection, batch)
+            except Exception as e:
+                # Whatever went wrong, no caller is left waiting and the thread
+                # stays up for the next batch
+                for _, future in batch:
+                    _fail(future, e)
+
+    def _commit_batch(self, connection, batch):
+        # Callers that gave up waiting have cancelled their futures: skip those
+        batch = [(operation, future) for operation, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        started = time.perf_counter()
+        outcomes = []
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            for operation, future in batch:
+                cursor.execute('SAVEPOINT operation')
+                try:
+                    outcomes.append((future, operation(cursor), None))
+                    cursor.execute('RELEASE operation')
+                except Exception as e:
+                    cursor.execute('ROLLBACK TO operation')
+                    cursor.execute('RELEASE operation')
+                    outcomes.append((future, None, e))
+            connection.commit()
+        except Exception as e:
+            try:
+                connection.rollback()
+            except Exception:
+                pass
+            outcomes = [(future, None, e) for _, future in batch]
+        finally:
+            if cursor is not None:
+                cursor.close()
+
+        with self._lock:
+            self._batches += 1
+            self._operations += len(batch)
+            self._failed += sum(1 for _, _, error in outcomes if error is not None)
+            self._largest_batch = max(self._largest_batch, len(batch))
+            self._commit_seconds += time.perf_counter() - started
+
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'batches': self._batches,
+                'operations': self._operations,
+                'failed': self._failed,
+                'largest_batch': self._largest_batch,
+                'avg_batch': round(self._operations / self._batches, 2) if self._batches else 0.0,
+                'commit_seconds': round(self._commit_seconds, 6),
+            }
+
+
+def _fail(future, error):
+    if not future.done():
+        try:
+            future.set_exception(error)
+        except InvalidStateError:  # cancelled or resolved in the meantime
+            pass
+
+
+_writer = None
+
+
+def configure_writer(enabled, max_batch=64, max_delay=0.001, timeout=30.0):
+    """Turn group commit on or off for this process"""
+    global _writer
+    _writer = GroupCommitWriter(max_batch, max_delay, timeout) if enabled else None
+
+
+def get_writer():
+    return _writer
+
+
+def init_app(app):
+    configure_writer(app.config.get('WRITE_BATCHING', False),
+                     max_batch=app.config.get('WRITE_BATCH_MAX_SIZE', 64),
+                     max_delay=app.config.get('WRITE_BATCH_MAX_DELAY_MS', 1) / 1000,
+                     timeout=app.config.get('WRITE_BATCH_TIMEOUT', 30))
+
+
+def run_write(operation):
+    """Run operation(cursor) in a write transaction and return its result
+
+    With group commit enabled the operation is queued for the writer thread;
+    otherwise it commits on its own on this thread's connection.
+    """
+    writer = get_writer()
+    if writer is not None:
+        return writer.submit(operation)
+
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        result = operation(cursor)
+        connection.commit()
+        return result
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+        connection.close()